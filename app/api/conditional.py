@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+import hashlib
+from typing import Any
+
+from fastapi import Request, Response
+
+
+def make_etag(*parts: Any) -> str:
+    # Parts must come from persisted, shared state so every worker (and a
+    # restarted one) computes the same tag for the same content.
+    digest = hashlib.blake2b(repr(parts).encode("utf-8"), digest_size=12).hexdigest()
+    return f'"{digest}"'
+
+
+def _opaque(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def not_modified(request: Request, etag: str) -> bool:
+    # Weak comparison: compressed responses carry W/ versions of our tags.
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return _opaque(etag) in {_opaque(candidate) for candidate in header.split(",")}
+
+
+def not_modified_response(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+
+def set_validator(response: Response, etag: str) -> None:
+    # no-cache: browsers keep the body but revalidate on every fetch.
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
@@ -1,24 +1,52 @@
 ﻿from __future__ import annotations
 
+import csv
+import io
+import json
 from pathlib import Path
-from typing import Optional
-
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import FileResponse, HTMLResponse, RedirectResponse
+from typing import Any, Dict, Iterator, List, Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import (
+    FileResponse,
+    HTMLResponse,
+    JSONResponse,
+    PlainTextResponse,
+    RedirectResponse,
+    StreamingResponse,
+)
 from pydantic import BaseModel
 
-from ..config import ping_once
+from ..core import metrics
 from ..core.settings import get_settings
-from ..services.logs import log_event, read_logs
-from ..services.power import execute_target_command, wake_target
+from ..services.discovery import discover_hosts
+from ..services.events import stream_events
+from ..services.groups import run_group_action
+from ..services.jobs import get_job, list_jobs, submit_command_job
+from ..services.logs import log_generation, query_logs
+from ..services.power import (
+    execute_target_command,
+    prepare_target_command,
+    stream_target_command,
+)
+from ..services.status import check_targets, get_status
 from ..services.targets import (
+    EXPORT_FIELDS,
     create_target,
     delete_target,
     get_target_or_404,
+    bulk_apply,
+    export_targets,
+    import_targets,
+    list_groups,
     list_targets,
-    record_status,
+    targets_generation,
     update_target,
 )
+from ..services.wake_verify import wake_with_verification
+
+from .conditional import make_etag, not_modified, not_modified_response, set_validator
 
 router = APIRouter()
 
@@ -57,12 +85,64 @@ class TargetCreateBody(BaseModel):
     name: str
     ip: str
     mac: Optional[str] = None
+    tags: Optional[List[str]] = None
+    probe: Optional[str] = None
+    probe_ports: Optional[List[int]] = None
 
 
 class TargetUpdateBody(BaseModel):
     name: Optional[str] = None
     ip: Optional[str] = None
     mac: Optional[str] = None
+    tags: Optional[List[str]] = None
+    probe: Optional[str] = None
+    probe_ports: Optional[List[int]] = None
+
+
+class ImportTargetBody(BaseModel):
+    ip: str
+    name: Optional[str] = None
+    mac: Optional[str] = None
+    tags: Optional[List[str]] = None
+    probe: Optional[str] = None
+    probe_ports: Optional[List[int]] = None
+
+
+class TargetImportBody(BaseModel):
+    targets: List[ImportTargetBody]
+
+
+class BulkTargetBody(BaseModel):
+    name: str
+    ip: Optional[str] = None
+    mac: Optional[str] = None
+    tags: Optional[List[str]] = None
+    probe: Optional[str] = None
+    probe_ports: Optional[List[int]] = None
+
+
+class TargetBulkBody(BaseModel):
+    upsert: List[BulkTargetBody] = []
+    delete: List[str] = []
+
+
+def _export_jsonl(targets: List[Dict[str, Any]]) -> Iterator[str]:
+    for target in targets:
+        yield json.dumps(target, ensure_ascii=False) + "\n"
+
+
+def _export_csv(targets: List[Dict[str, Any]]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    for target in targets:
+        row = dict(target)
+        row["tags"] = ",".join(target.get("tags", ()))
+        row["probe_ports"] = ",".join(str(port) for port in target.get("probe_ports", ()))
+        writer.writerow([row.get(column) or "" for column in EXPORT_FIELDS])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
 
 
 @router.get("/", response_class=HTMLResponse)
@@ -84,55 +164,178 @@ async def legacy_wol_redirect() -> RedirectResponse:
 
 
 @router.get("/api/targets")
-async def list_targets_api():
-    return {"targets": list_targets()}
+async def list_targets_api(request: Request, response: Response, max_age: Optional[float] = None):
+    if max_age is not None:
+        await check_targets(max_age=max_age)
+    # Store reads (SQLite with that backend) run in the threadpool, as in def routes.
+    etag = make_etag("targets", await run_in_threadpool(targets_generation))
+    if not_modified(request, etag):
+        return not_modified_response(etag)
+    set_validator(response, etag)
+    return {"targets": await run_in_threadpool(list_targets)}
 
 
 @router.post("/api/targets")
-async def create_target_api(body: TargetCreateBody):
+def create_target_api(body: TargetCreateBody):
     target = create_target(body.model_dump())
     return {"target": target}
 
 
+@router.post("/api/targets/bulk")
+def bulk_targets_api(body: TargetBulkBody):
+    # exclude_unset keeps "field omitted" (leave as is) apart from "field: null" (clear).
+    upserts = [item.model_dump(exclude_unset=True) for item in body.upsert]
+    return bulk_apply(upserts, body.delete)
+
+
+@router.get("/api/targets/export")
+def export_targets_api(format: str = Query("jsonl", pattern="^(jsonl|csv)$")):
+    targets = export_targets()
+    if format == "csv":
+        return StreamingResponse(
+            _export_csv(targets),
+            media_type="text/csv; charset=utf-8",
+            headers={"Content-Disposition": 'attachment; filename="targets.csv"'},
+        )
+    return StreamingResponse(
+        _export_jsonl(targets),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="targets.jsonl"'},
+    )
+
+
 @router.patch("/api/targets/{name}")
-async def update_target_api(name: str, body: TargetUpdateBody):
+def update_target_api(name: str, body: TargetUpdateBody):
     target = update_target(name, {k: v for k, v in body.model_dump().items() if v is not None})
     return {"target": target}
 
 
 @router.delete("/api/targets/{name}")
-async def delete_target_api(name: str):
+def delete_target_api(name: str):
     delete_target(name)
     return {"ok": True}
 
 
 @router.get("/api/status")
-async def status(target: str, silent: bool = False):
-    info = get_target_or_404(target)
-    ip = info.get("ip") or ""
-    online = ping_once(ip)
-    record_status(info["name"], online, ip)
-    if not silent:
-        log_event({"evt": "status", "target": target, "online": online})
-    return {"target": info["name"], "online": online}
+async def status(target: str, silent: bool = False, max_age: Optional[float] = None):
+    info = await run_in_threadpool(get_target_or_404, target)
+    return await get_status(info, max_age=max_age, silent=silent)
+
+
+@router.get("/api/status/all")
+async def status_all(
+    target: Optional[List[str]] = Query(None),
+    silent: bool = True,
+    max_age: Optional[float] = None,
+):
+    names = None
+    if target:
+        names = [name for value in target for name in value.split(",")]
+    return {"statuses": await check_targets(names, silent=silent, max_age=max_age, cached=True)}
+
+
+@router.get("/api/events")
+async def events():
+    return StreamingResponse(
+        stream_events(list_targets),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.post("/api/wake")
-async def wake(body: WakeBody):
-    return wake_target(body.target)
+async def wake(body: WakeBody, verify: Optional[bool] = None):
+    return await wake_with_verification(body.target, verify)
+
+
+async def _run_command(name: str, action: str, stream: bool, background: bool):
+    if background:
+        return JSONResponse(submit_command_job(name, action), status_code=202)
+    if not stream:
+        return await execute_target_command(name, action)
+    spec = prepare_target_command(name, action)
+    return StreamingResponse(
+        stream_target_command(name, action, spec),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.post("/api/shutdown")
-async def shutdown(body: TargetActionBody):
-    return execute_target_command(body.target, "shutdown")
+async def shutdown(
+    body: TargetActionBody,
+    stream: bool = False,
+    background: bool = Query(False, alias="async"),
+):
+    return await _run_command(body.target, "shutdown", stream, background)
 
 
 @router.post("/api/reboot")
-async def reboot(body: TargetActionBody):
-    return execute_target_command(body.target, "reboot")
+async def reboot(
+    body: TargetActionBody,
+    stream: bool = False,
+    background: bool = Query(False, alias="async"),
+):
+    return await _run_command(body.target, "reboot", stream, background)
+
+
+@router.get("/api/discovery")
+async def discovery(cidr: Optional[str] = None, timeout: Optional[float] = Query(None, gt=0, le=10)):
+    return await discover_hosts(cidr, timeout)
+
+
+@router.post("/api/discovery/import")
+def discovery_import(body: TargetImportBody):
+    return import_targets([item.model_dump() for item in body.targets])
+
+
+@router.get("/api/groups")
+def groups():
+    return {"groups": list_groups()}
+
+
+@router.post("/api/groups/{tag}/{action}")
+async def group_action(
+    tag: str,
+    action: str,
+    concurrency: Optional[int] = Query(None, ge=1),
+    stagger: Optional[float] = Query(None, ge=0),
+):
+    return await run_group_action(tag, action, concurrency=concurrency, stagger=stagger)
+
+
+@router.get("/api/jobs")
+async def jobs(target: Optional[str] = None, state: Optional[str] = None):
+    return {"jobs": list_jobs(target, state)}
+
+
+@router.get("/api/jobs/{job_id}")
+async def job(job_id: str):
+    return get_job(job_id)
+
+
+@router.get("/metrics", include_in_schema=False)
+def prometheus_metrics() -> PlainTextResponse:
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 
 @router.get("/api/logs")
-async def get_logs(limit: int = 200):
-    return {"logs": read_logs(limit)}
+def get_logs(
+    request: Request,
+    response: Response,
+    limit: int = 200,
+    target: Optional[str] = None,
+    evt: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    cursor: Optional[str] = None,
+):
+    generation = log_generation()
+    if generation is not None:
+        etag = make_etag("logs", generation, limit, target, evt, since, until, cursor)
+        if not_modified(request, etag):
+            return not_modified_response(etag)
+        set_validator(response, etag)
+    # log_generation() already flushed and pruned the store for this request.
+    return query_logs(limit, target=target, evt=evt, since=since, until=until, cursor=cursor, settle=False)
 
@@ -1,7 +1,9 @@
 from __future__ import annotations
-import os, json, pathlib, platform, subprocess
+import os, json, pathlib
 from typing import Dict, Optional
 
+from .services.pinger import DEFAULT_TIMEOUT, ping_host, ping_host_blocking
+
 ROOT = pathlib.Path(__file__).resolve().parents[1]
 APP_DIR = ROOT / "app"
 STATIC_DIR = APP_DIR / "static"
@@ -10,16 +12,19 @@ TARGETS_FILE = APP_DIR / "targets.json"
 def env(key: str, default: Optional[str]=None) -> Optional[str]:
     return os.getenv(key, default)
 
-def ping_once(ip: str) -> bool:
+def ping_once(ip: str, timeout: float = DEFAULT_TIMEOUT) -> bool:
+    if not ip:
+        return False
+    try:
+        return ping_host_blocking(ip, timeout) is not None
+    except Exception:
+        return False
+
+async def ping_once_async(ip: str, timeout: float = DEFAULT_TIMEOUT) -> bool:
     if not ip:
         return False
-    system = platform.system().lower()
-    if "windows" in system:
-        cmd = ["ping", "-n", "1", "-w", "1000", ip]
-    else:
-        cmd = ["ping", "-c", "1", "-W", "1", ip]
     try:
-        return subprocess.call(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL) == 0
+        return await ping_host(ip, timeout) is not None
     except Exception:
         return False
 
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import gzip
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # optional; gzip only
+    brotli = None  # type: ignore[assignment]
+
+# Compresses complete JSON and text responses only. SSE and NDJSON command streams
+# pass through untouched so every chunk still reaches the client at once.
+COMPRESSIBLE_TYPES = ("application/json", "text/plain")
+
+
+def _quality(params: str) -> float:
+    for param in params.split(";"):
+        key, _, value = param.partition("=")
+        if key.strip().lower() == "q":
+            try:
+                return float(value)
+            except ValueError:
+                return 0.0
+    return 1.0
+
+
+def _choose_encoding(accept: str) -> Optional[str]:
+    # Highest q wins (br over gzip on a tie); q=0 refuses an encoding.
+    weights = {}
+    for part in accept.split(","):
+        name, _, params = part.partition(";")
+        name = name.strip().lower()
+        if name:
+            weights[name] = _quality(params)
+    best, best_q = None, 0.0
+    for encoding in (("br",) if brotli is not None else ()) + ("gzip",):
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def _compress(body: bytes, encoding: str, level: int) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=min(level, 11))
+    return gzip.compress(body, compresslevel=level, mtime=0)
+
+
+class JSONCompressionMiddleware:
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, level: int = 6) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.level = level
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = _choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[Message] = None
+        passthrough = False
+
+        async def _send(message: Message) -> None:
+            nonlocal start, passthrough
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                content_type = headers.get("content-type", "").split(";")[0].strip()
+                if content_type in COMPRESSIBLE_TYPES and "content-encoding" not in headers:
+                    start = message
+                    return
+                passthrough = True
+                await send(message)
+                return
+            if passthrough or start is None or message["type"] != "http.response.body":
+                await send(message)
+                return
+            initial, start = start, None
+            body = message.get("body", b"")
+            if message.get("more_body", False) or len(body) < self.minimum_size:
+                passthrough = True
+                await send(initial)
+                await send(message)
+                return
+            compressed = _compress(body, encoding, self.level)
+            headers = MutableHeaders(raw=initial["headers"])
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                # The encoded bytes differ from the identity body.
+                headers["ETag"] = "W/" + etag
+            headers.add_vary_header("Accept-Encoding")
+            await send(initial)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, _send)
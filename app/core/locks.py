@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import os
+import threading
+from pathlib import Path
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process deployments only.
+    fcntl = None  # type: ignore[assignment]
+
+
+class FileLock:
+    # Exclusive advisory lock (flock) on ``path`` shared by every process
+    # that opens the same file; serializes workers of one deployment.
+    # flock is per open file, so threads of this process also take
+    # ``_local`` first. Not reentrant.
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._fd: Optional[int] = None
+        self._guard = threading.Lock()
+        self._local = threading.Lock()
+
+    def _open(self) -> int:
+        with self._guard:
+            if self._fd is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            return self._fd
+
+    def acquire(self, blocking: bool = True) -> bool:
+        if not self._local.acquire(blocking):
+            return False
+        if fcntl is None:
+            return True
+        flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+        try:
+            fcntl.flock(self._open(), flags)
+        except BlockingIOError:
+            self._local.release()
+            return False
+        except BaseException:
+            self._local.release()
+            raise
+        return True
+
+    def release(self) -> None:
+        if fcntl is not None and self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self._local.release()
+
+    def close(self) -> None:
+        with self._guard:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+    def __enter__(self) -> "FileLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.release()
@@ -3,8 +3,9 @@
 from dataclasses import dataclass
 from functools import lru_cache
 from pathlib import Path
+from typing import Tuple
 
-from ..config import STATIC_DIR, env
+from ..config import STATIC_DIR, TARGETS_FILE, env
 
 
 def _env_int(key: str, default: int) -> int:
@@ -17,17 +18,81 @@ def _env_int(key: str, default: int) -> int:
         return default
 
 
+def _env_float(key: str, default: float) -> float:
+    raw = env(key)
+    if raw is None:
+        return default
+    try:
+        return float(raw)
+    except (TypeError, ValueError):
+        return default
+
+
+def _env_bool(key: str, default: bool) -> bool:
+    raw = env(key)
+    if raw is None:
+        return default
+    return raw.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _env_ports(key: str, default: Tuple[int, ...]) -> Tuple[int, ...]:
+    raw = env(key)
+    if raw is None:
+        return default
+    ports = []
+    for item in raw.split(","):
+        item = item.strip()
+        if item.isdigit() and 0 < int(item) < 65536:
+            ports.append(int(item))
+    return tuple(ports) or default
+
+
 @dataclass(frozen=True)
 class Settings:
     lan_iface: str
     broadcast: str
     wol_method: str
+    wol_ports: Tuple[int, ...]
+    wol_repeats: int
+    wol_spacing: float
+    wake_verify: bool
+    wake_verify_timeout: float
+    wake_verify_resend: float
     log_path: Path
     log_retention_days: int
     log_max_limit: int
+    log_queue_size: int
+    log_batch_size: int
+    log_flush_interval: float
+    log_fsync: str
+    log_fsync_interval: float
     host: str
     port: int
     static_dir: Path
+    storage_backend: str
+    targets_path: Path
+    sqlite_path: Path
+    runtime_backend: str
+    ping_timeout: float
+    probe_method: str
+    probe_ports: Tuple[int, ...]
+    status_concurrency: int
+    status_interval: float
+    status_max_interval: float
+    status_fast_interval: float
+    status_fast_window: float
+    status_jitter: float
+    status_max_age: float
+    neigh_cache_ttl: float
+    mac_verify_interval: float
+    command_concurrency: int
+    coalesce_window: float
+    job_history: int
+    job_ttl: float
+    group_concurrency: int
+    group_stagger: float
+    discovery_concurrency: int
+    discovery_max_hosts: int
 
 
 @lru_cache()
@@ -38,10 +103,45 @@ def get_settings() -> Settings:
         lan_iface=env("LAN_IFACE", "eno1"),
         broadcast=env("BROADCAST", "192.168.219.255"),
         wol_method=env("WOL_METHOD", "python").lower(),
+        wol_ports=_env_ports("WOL_PORTS", (9,)),
+        wol_repeats=_env_int("WOL_REPEATS", 1),
+        wol_spacing=_env_float("WOL_SPACING", 0.0),
+        wake_verify=_env_bool("WAKE_VERIFY", False),
+        wake_verify_timeout=_env_float("WAKE_VERIFY_TIMEOUT", 300.0),
+        wake_verify_resend=_env_float("WAKE_VERIFY_RESEND", 60.0),
         log_path=log_path,
         log_retention_days=_env_int("LOG_RETENTION_DAYS", 7),
         log_max_limit=_env_int("LOG_MAX_LIMIT", 500),
+        log_queue_size=_env_int("LOG_QUEUE_SIZE", 10000),
+        log_batch_size=_env_int("LOG_BATCH_SIZE", 512),
+        log_flush_interval=_env_float("LOG_FLUSH_INTERVAL", 0.2),
+        log_fsync=env("LOG_FSYNC", "none").lower(),
+        log_fsync_interval=_env_float("LOG_FSYNC_INTERVAL", 1.0),
         host=env("HOST", "127.0.0.1"),
         port=_env_int("PORT", 8000),
         static_dir=STATIC_DIR,
+        storage_backend=env("STORAGE_BACKEND", "files").lower(),
+        targets_path=Path(env("TARGETS_PATH", str(TARGETS_FILE))),
+        sqlite_path=Path(env("SQLITE_PATH", "data/wol-web.db")),
+        runtime_backend=env("RUNTIME_BACKEND", "memory").lower(),
+        ping_timeout=_env_float("PING_TIMEOUT", 1.0),
+        probe_method=env("PROBE_METHOD", "icmp").lower(),
+        probe_ports=_env_ports("PROBE_PORTS", (22, 3389, 445)),
+        status_concurrency=_env_int("STATUS_CONCURRENCY", 64),
+        status_interval=_env_float("STATUS_INTERVAL", 15.0),
+        status_max_interval=_env_float("STATUS_MAX_INTERVAL", 240.0),
+        status_fast_interval=_env_float("STATUS_FAST_INTERVAL", 2.0),
+        status_fast_window=_env_float("STATUS_FAST_WINDOW", 180.0),
+        status_jitter=_env_float("STATUS_JITTER", 0.1),
+        status_max_age=_env_float("STATUS_MAX_AGE", 30.0),
+        neigh_cache_ttl=_env_float("NEIGH_CACHE_TTL", 2.0),
+        mac_verify_interval=_env_float("MAC_VERIFY_INTERVAL", 3600.0),
+        command_concurrency=_env_int("COMMAND_CONCURRENCY", 4),
+        coalesce_window=_env_float("COALESCE_WINDOW", 2.0),
+        job_history=_env_int("JOB_HISTORY", 200),
+        job_ttl=_env_float("JOB_TTL", 3600.0),
+        group_concurrency=_env_int("GROUP_CONCURRENCY", 16),
+        group_stagger=_env_float("GROUP_STAGGER", 0.0),
+        discovery_concurrency=_env_int("DISCOVERY_CONCURRENCY", 256),
+        discovery_max_hosts=_env_int("DISCOVERY_MAX_HOSTS", 1024),
     )
@@ -1,19 +1,54 @@
 ﻿from __future__ import annotations
 
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator
+
 from dotenv import load_dotenv
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.staticfiles import StaticFiles
 
 from .api.routes import router
+from .core.compression import JSONCompressionMiddleware
+from .core.locks import FileLock
 from .core.settings import get_settings
+from .services.jobs import cancel_jobs
+from .services.logs import stop_log_writer
+from .services.monitor import StatusMonitor
+from .services.pinger import close_pinger
+from .services.wake_verify import cancel_wake_verifications
+from .services.wol import get_sender
 
 # Load .env if present before evaluating settings
 load_dotenv()
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    settings = get_settings()
+    leader_lock = None
+    if settings.runtime_backend == "sqlite":
+        # Workers share runtime state, so one of them probes for all.
+        leader_lock = FileLock(Path(str(settings.sqlite_path) + ".monitor.lock"))
+    monitor = StatusMonitor(settings.status_interval, leader_lock)
+    app.state.monitor = monitor
+    monitor.start()
+    try:
+        yield
+    finally:
+        await monitor.stop()
+        await cancel_jobs()
+        await cancel_wake_verifications()
+        close_pinger()
+        get_sender().close()
+        await run_in_threadpool(stop_log_writer)
+
+
 def create_app() -> FastAPI:
     settings = get_settings()
-    app = FastAPI(title="WOL-Web", version="1.0.0")
+    app = FastAPI(title="WOL-Web", version="1.0.0", lifespan=lifespan)
+    app.add_middleware(JSONCompressionMiddleware)
     app.include_router(router)
 
     static_dir = settings.static_dir
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import asyncio
+import ipaddress
+import time
+from typing import Any, Dict, List, Optional
+
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+
+from ..core.metrics import timed
+from ..core.settings import get_settings
+from .logs import log_event
+from .neighbors import get_neighbor_table, lookup_mac
+from .probes import probe_host
+from .targets import list_targets, suggest_name
+
+
+def default_subnet() -> str:
+    # Derived from BROADCAST: each trailing .255 octet is one host byte.
+    broadcast = get_settings().broadcast
+    try:
+        octets = ipaddress.IPv4Address(broadcast).packed
+    except ValueError:
+        raise HTTPException(400, detail="cidr is required; BROADCAST is not an IPv4 address") from None
+    host_bytes = 0
+    for octet in reversed(octets):
+        if octet != 255:
+            break
+        host_bytes += 1
+    prefix = 32 - 8 * max(host_bytes, 1)
+    return str(ipaddress.IPv4Network(f"{broadcast}/{prefix}", strict=False))
+
+
+def _parse_network(cidr: Optional[str]) -> ipaddress.IPv4Network:
+    try:
+        network = ipaddress.ip_network((cidr or default_subnet()).strip(), strict=False)
+    except ValueError as exc:
+        raise HTTPException(400, detail="invalid cidr") from exc
+    if network.version != 4:
+        raise HTTPException(400, detail="ipv4 cidr required")
+    limit = get_settings().discovery_max_hosts
+    if network.num_addresses > limit + 2:
+        raise HTTPException(400, detail=f"cidr too large; at most {limit} hosts per sweep")
+    return network
+
+
+async def _harvest_macs(online: List[str]) -> Dict[str, str]:
+    # One read of the neighbour table covers the whole sweep; the per-IP
+    # command fallback only runs where /proc/net/arp is missing.
+    entries = await run_in_threadpool(get_neighbor_table().snapshot, 0.0)
+    if entries is not None:
+        return dict(entries)
+    macs: Dict[str, str] = {}
+    for ip in online:
+        mac = await run_in_threadpool(lookup_mac, ip)
+        if mac:
+            macs[ip] = mac
+    return macs
+
+
+async def discover_hosts(cidr: Optional[str] = None, timeout: Optional[float] = None) -> Dict[str, Any]:
+    settings = get_settings()
+    network = _parse_network(cidr)
+    hosts = [str(ip) for ip in network.hosts()]
+    wait = settings.ping_timeout if timeout is None else max(timeout, 0.05)
+    semaphore = asyncio.Semaphore(max(settings.discovery_concurrency, 1))
+
+    async def _probe(ip: str) -> Dict[str, Any]:
+        async with semaphore:
+            rtt_ms, method = await probe_host(ip, settings.probe_method, settings.probe_ports, wait)
+        return {"ip": ip, "online": rtt_ms is not None, "rtt_ms": rtt_ms, "method": method}
+
+    started = time.perf_counter()
+    with timed("discovery"):
+        results = await asyncio.gather(*(_probe(ip) for ip in hosts))
+        macs = await _harvest_macs([result["ip"] for result in results if result["online"]])
+    known = {target["ip"]: target["name"] for target in await run_in_threadpool(list_targets)}
+    candidates = []
+    for result in results:
+        mac = macs.get(result["ip"])
+        # Hosts that answered ARP but not the probe are still on the segment.
+        if not result["online"] and not mac:
+            continue
+        candidates.append({
+            **result,
+            "mac": mac,
+            "name": known.get(result["ip"]) or suggest_name(result["ip"]),
+            "known": result["ip"] in known,
+        })
+    duration_ms = round((time.perf_counter() - started) * 1000.0, 1)
+    log_event({
+        "evt": "discovery",
+        "cidr": str(network),
+        "scanned": len(hosts),
+        "found": len(candidates),
+        "duration_ms": duration_ms,
+    })
+    return {"cidr": str(network), "scanned": len(hosts), "duration_ms": duration_ms, "candidates": candidates}
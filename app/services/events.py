@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+from collections import deque
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional, Set
+
+from fastapi.concurrency import run_in_threadpool
+
+KEEPALIVE_SECONDS = 15.0
+SUBSCRIBER_QUEUE_SIZE = 256
+# Events waiting to be relayed to other workers; older ones are dropped first.
+OUTBOX_SIZE = 1024
+
+
+class Subscription:
+    def __init__(self, loop: asyncio.AbstractEventLoop) -> None:
+        self.loop = loop
+        self.queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue(SUBSCRIBER_QUEUE_SIZE)
+
+    def push(self, event: Dict[str, Any]) -> None:
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # A slow consumer lost deltas; make it reload a full snapshot instead.
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({"type": "resync"})
+
+
+class EventBus:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._subscribers: Set[Subscription] = set()
+        # Set by enable_relay() when other workers share the runtime store.
+        self._outbox: Optional[Deque[Dict[str, Any]]] = None
+
+    def enable_relay(self) -> None:
+        with self._lock:
+            if self._outbox is None:
+                self._outbox = deque(maxlen=OUTBOX_SIZE)
+
+    def drain_outbox(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            if not self._outbox:
+                return []
+            events = list(self._outbox)
+            self._outbox.clear()
+            return events
+
+    def subscribe(self) -> Subscription:
+        subscription = Subscription(asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(self, event: Dict[str, Any], relay: bool = True) -> None:
+        # ``relay=False`` for events that arrived from another worker.
+        with self._lock:
+            if relay and self._outbox is not None:
+                self._outbox.append(dict(event))
+            subscribers = list(self._subscribers)
+        if not subscribers:
+            return
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.push, dict(event))
+            except RuntimeError:
+                # The subscriber's loop has been closed.
+                self.unsubscribe(subscription)
+
+
+_BUS = EventBus()
+
+
+def get_event_bus() -> EventBus:
+    return _BUS
+
+
+def publish(event_type: str, **payload: Any) -> None:
+    _BUS.publish({"type": event_type, **payload})
+
+
+def _format_sse(event_type: str, data: Any) -> str:
+    return f"event: {event_type}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def stream_events(snapshot: Callable[[], List[Dict[str, Any]]]) -> AsyncIterator[str]:
+    subscription = _BUS.subscribe()
+    try:
+        yield _format_sse("snapshot", {"type": "snapshot", "targets": await run_in_threadpool(snapshot)})
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if event.get("type") == "resync":
+                yield _format_sse("snapshot", {"type": "snapshot", "targets": await run_in_threadpool(snapshot)})
+                continue
+            yield _format_sse(event["type"], event)
+    finally:
+        _BUS.unsubscribe(subscription)
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Dict, List, Optional
+
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+
+from ..core.settings import get_settings
+from .logs import log_event
+from .power import prepare_target_command, run_target_command, wake_target, wake_targets
+from .targets import get_group_members
+
+GROUP_ACTIONS = ("wake", "shutdown", "reboot")
+
+
+async def _run_member(name: str, action: str) -> Dict[str, Any]:
+    try:
+        if action == "wake":
+            result = await run_in_threadpool(wake_target, name)
+        else:
+            spec = prepare_target_command(name, action)
+            result = await run_target_command(name, action, spec)
+            result.pop("stdout", None)
+            result.pop("stderr", None)
+    except HTTPException as exc:
+        return {"target": name, "ok": False, "status_code": exc.status_code, "error": exc.detail}
+    except Exception as exc:
+        return {"target": name, "ok": False, "status_code": 500, "error": str(exc)}
+    result["target"] = name
+    return result
+
+
+async def run_group_action(
+    tag: str,
+    action: str,
+    concurrency: Optional[int] = None,
+    stagger: Optional[float] = None,
+) -> Dict[str, Any]:
+    if action not in GROUP_ACTIONS:
+        raise HTTPException(404, detail="unknown group action")
+    settings = get_settings()
+    members = get_group_members(tag)
+    limit = max(concurrency or settings.group_concurrency, 1)
+    spacing = max(settings.group_stagger if stagger is None else stagger, 0.0)
+    semaphore = asyncio.Semaphore(limit)
+
+    async def _bounded(index: int, name: str) -> Dict[str, Any]:
+        # Members start at least ``spacing`` seconds apart (power-on inrush),
+        # and no more than ``limit`` of them are in flight at once.
+        if spacing:
+            await asyncio.sleep(index * spacing)
+        async with semaphore:
+            return await _run_member(name, action)
+
+    results: List[Dict[str, Any]]
+    if action == "wake" and not spacing:
+        # Unstaggered wakes go out as one batch over the shared sockets.
+        results = await run_in_threadpool(wake_targets, members)
+    else:
+        results = await asyncio.gather(*(_bounded(index, name) for index, name in enumerate(members)))
+    succeeded = sum(1 for result in results if result.get("ok"))
+    log_event({
+        "evt": f"group-{action}",
+        "target": tag,
+        "from": "api",
+        "members": members,
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded,
+    })
+    return {
+        "group": tag,
+        "action": action,
+        "total": len(results),
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded,
+        "results": results,
+    }
@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from fastapi import HTTPException
+
+from ..core.settings import get_settings
+from .events import publish
+from .power import CommandSpec, prepare_target_command, run_target_command, trim_text
+from .targets import _normalize_name, _now_ts
+
+OUTPUT_LIMIT = 16000
+FINISHED_STATES = ("succeeded", "failed")
+
+# Jobs are only touched from the event loop, so plain dicts are enough.
+_JOBS: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_TASKS: Dict[str, "asyncio.Task[None]"] = {}
+
+
+def _expire(now: float) -> None:
+    # Running jobs are never evicted; finished ones go after JOB_TTL seconds
+    # or once more than JOB_HISTORY of them are kept, oldest first.
+    settings = get_settings()
+    finished = [job_id for job_id, job in _JOBS.items() if job["state"] in FINISHED_STATES]
+    overflow = max(len(finished) - settings.job_history, 0)
+    for index, job_id in enumerate(finished):
+        job = _JOBS[job_id]
+        if index < overflow or now - job["_finished"] > settings.job_ttl:
+            del _JOBS[job_id]
+
+
+def _public(job: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: value for key, value in job.items() if not key.startswith("_")}
+
+
+def _finish(job: Dict[str, Any], state: str, **fields: Any) -> None:
+    finished = time.monotonic()
+    job.update(fields)
+    job["state"] = state
+    job["finished_at"] = _now_ts()
+    job["duration_ms"] = round((finished - job["_started"]) * 1000.0, 1)
+    job["_finished"] = finished
+    publish("job", job=_public(job))
+
+
+def _mark_running(job: Dict[str, Any]) -> None:
+    job["state"] = "running"
+    job["started_at"] = _now_ts()
+    job["_started"] = time.monotonic()
+
+
+async def _run(job: Dict[str, Any], spec: CommandSpec) -> None:
+    # Queued jobs wait on the same concurrency gate as synchronous requests.
+    job["_started"] = time.monotonic()
+    try:
+        result = await run_target_command(
+            job["target"], job["action"], spec, on_start=lambda: _mark_running(job)
+        )
+    except asyncio.CancelledError:
+        _finish(job, "failed", error="cancelled")
+        raise
+    except HTTPException as exc:
+        _finish(job, "failed", error=exc.detail)
+    except Exception as exc:
+        _finish(job, "failed", error=str(exc))
+    else:
+        _finish(
+            job,
+            "succeeded" if result["ok"] else "failed",
+            returncode=result["returncode"],
+            stdout=trim_text(result["stdout"], OUTPUT_LIMIT),
+            stderr=trim_text(result["stderr"], OUTPUT_LIMIT),
+        )
+    finally:
+        _TASKS.pop(job["id"], None)
+
+
+def submit_command_job(name: str, action: str) -> Dict[str, Any]:
+    # Validation runs before the job exists so bad requests still get a 4xx.
+    spec = prepare_target_command(name, action)
+    name = _normalize_name(name)
+    _expire(time.monotonic())
+    for job in _JOBS.values():
+        # Repeat submissions join the job that has not finished yet.
+        if job["target"] == name and job["action"] == action and job["state"] not in FINISHED_STATES:
+            return {**_public(job), "coalesced": True}
+    job_id = uuid.uuid4().hex
+    job: Dict[str, Any] = {
+        "id": job_id,
+        "action": action,
+        "target": name,
+        "command": spec[3],
+        "state": "queued",
+        "created_at": _now_ts(),
+        "started_at": None,
+        "finished_at": None,
+        "duration_ms": None,
+        "returncode": None,
+        "stdout": None,
+        "stderr": None,
+        "error": None,
+    }
+    _JOBS[job_id] = job
+    _TASKS[job_id] = asyncio.get_running_loop().create_task(_run(job, spec))
+    return _public(job)
+
+
+def get_job(job_id: str) -> Dict[str, Any]:
+    _expire(time.monotonic())
+    job = _JOBS.get(job_id)
+    if job is None:
+        raise HTTPException(404, "job not found")
+    return _public(job)
+
+
+def list_jobs(target: Optional[str] = None, state: Optional[str] = None) -> List[Dict[str, Any]]:
+    _expire(time.monotonic())
+    return [
+        _public(job)
+        for job in reversed(_JOBS.values())
+        if (target is None or job["target"] == target) and (state is None or job["state"] == state)
+    ]
+
+
+async def cancel_jobs() -> None:
+    tasks = list(_TASKS.values())
+    for task in tasks:
+        task.cancel()
+    if tasks:
+        await asyncio.gather(*tasks, return_exceptions=True)
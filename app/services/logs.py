@@ -1,108 +1,274 @@
 ﻿from __future__ import annotations
 
+import asyncio
+import atexit
 import json
+import logging
+import queue
 import threading
 import time
 from datetime import datetime, timedelta, timezone
-from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Hashable, List, Optional
 
+from fastapi import HTTPException
+
+from ..core.metrics import Counter, Gauge, TimedLock, register, timed
 from ..core.settings import get_settings
+from ..storage import EventStore, LogQuery, LogRecord, decode_cursor, encode_cursor, get_event_store, parse_ts
 
-_LOG_LOCK = threading.Lock()
-_LAST_PRUNE_TS = 0.0
+logger = logging.getLogger(__name__)
 
+_LOG_LOCK = TimedLock("log")
+_LAST_PRUNE_TS = 0.0
+WRITE_ATTEMPTS = 3
+# High-volume events that may be shed when the queue is full; power actions
+# and target changes are never dropped, their callers wait for room instead.
+SHEDDABLE_EVENTS = frozenset({"status"})
 
-def _current_ts() -> str:
-    return datetime.now(timezone.utc).astimezone().isoformat(timespec="seconds")
+DROPPED = register(
+    Counter(
+        "wol_log_events_dropped_total",
+        "Events that never reached the event log.",
+        labels=("reason",),
+    )
+)
 
 
-def _parse_ts(value: Optional[str]) -> Optional[datetime]:
+def _parse_bound(value: Optional[str], field: str) -> Optional[datetime]:
     if not value:
         return None
-    for fmt in ("%Y-%m-%dT%H:%M:%S%z", "%Y-%m-%dT%H:%M:%S.%f%z"):
-        try:
-            parsed = datetime.strptime(value, fmt)
-            return parsed.astimezone(timezone.utc)
-        except ValueError:
-            continue
-    try:
-        parsed = datetime.fromisoformat(value)
-    except ValueError:
-        return None
-    if parsed.tzinfo is None:
-        parsed = parsed.replace(tzinfo=timezone.utc)
-    return parsed.astimezone(timezone.utc)
+    parsed = parse_ts(value)
+    if parsed is None:
+        raise HTTPException(400, detail=f"invalid {field} timestamp")
+    return parsed
 
 
-def _prune_logs_locked(log_path: Path, cutoff: datetime) -> None:
-    if not log_path.exists():
-        return
-    kept_lines: List[str] = []
-    with log_path.open("r", encoding="utf-8") as stream:
-        for raw_line in stream:
-            line = raw_line.strip()
-            if not line:
-                continue
-            try:
-                data = json.loads(line)
-            except Exception:
-                continue
-            ts = _parse_ts(data.get("ts"))
-            if ts is None or ts >= cutoff:
-                if ts is not None:
-                    data["ts"] = ts.astimezone().isoformat(timespec="seconds")
-                kept_lines.append(json.dumps(data, ensure_ascii=False))
-    output = "\n".join(kept_lines)
-    if output:
-        output += "\n"
-    log_path.write_text(output, encoding="utf-8")
-
-
-def _maybe_prune_locked(now_epoch: float, retention_days: int, log_path: Path) -> None:
+@timed("log_prune")
+def _prune_logs_locked(store: EventStore, cutoff: Optional[datetime]) -> None:
+    store.prune(cutoff)
+
+
+def _maybe_prune_locked(now_epoch: float, retention_days: int, store: EventStore) -> None:
     global _LAST_PRUNE_TS
-    if retention_days <= 0:
-        return
     if _LAST_PRUNE_TS and now_epoch - _LAST_PRUNE_TS < 600:
         return
     _LAST_PRUNE_TS = now_epoch
-    cutoff = datetime.now(timezone.utc) - timedelta(days=retention_days)
-    _prune_logs_locked(log_path, cutoff)
+    cutoff = None
+    if retention_days > 0:
+        cutoff = datetime.now(timezone.utc) - timedelta(days=retention_days)
+    _prune_logs_locked(store, cutoff)
 
 
-def log_event(evt: Dict[str, Any]) -> None:
+@timed("log_write")
+def _write_batch(batch: List[LogRecord], fsync: bool = False) -> None:
     settings = get_settings()
-    log_path = settings.log_path
-    evt["ts"] = _current_ts()
-    line = json.dumps(evt, ensure_ascii=False)
-    now_epoch = time.time()
+    store = get_event_store()
     with _LOG_LOCK:
-        log_path.parent.mkdir(parents=True, exist_ok=True)
-        with log_path.open("a", encoding="utf-8") as stream:
-            stream.write(line + "\n")
-        _maybe_prune_locked(now_epoch, settings.log_retention_days, log_path)
+        store.prepare()
+        store.append(batch, fsync=fsync)
+        _maybe_prune_locked(time.time(), settings.log_retention_days, store)
 
 
-def read_logs(limit: int) -> List[Dict[str, Any]]:
-    settings = get_settings()
-    log_path = settings.log_path
-    with _LOG_LOCK:
-        _maybe_prune_locked(time.time(), settings.log_retention_days, log_path)
-        if not log_path.exists():
-            return []
-        raw_lines = log_path.read_text(encoding="utf-8").splitlines()
-    entries: List[Tuple[datetime, Dict[str, Any]]] = []
-    for line in raw_lines:
-        if not line.strip():
-            continue
+class _Marker:
+    def __init__(self, stop: bool = False) -> None:
+        self.stop = stop
+        self.done = threading.Event()
+
+
+class _LogWriter:
+    # Bounded queue drained by one background thread that group-commits
+    # everything queued within LOG_FLUSH_INTERVAL (or LOG_BATCH_SIZE lines)
+    # into a single append to the event store.
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._queue: Optional["queue.Queue[Any]"] = None
+        self._thread: Optional[threading.Thread] = None
+        self._last_fsync = 0.0
+        self._last_drop_warning = 0.0
+
+    def _ensure_started(self) -> "queue.Queue[Any]":
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._queue = queue.Queue(max(get_settings().log_queue_size, 1))
+                self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+                self._thread.start()
+            assert self._queue is not None
+            return self._queue
+
+    def submit(self, record: LogRecord) -> None:
+        pending = self._ensure_started()
+        try:
+            pending.put_nowait(record)
+            return
+        except queue.Full:
+            pass
+        if record.evt in SHEDDABLE_EVENTS:
+            self._drop()
+            return
         try:
-            data = json.loads(line)
-        except Exception:
-            continue
-        ts = _parse_ts(data.get("ts"))
-        if ts is not None:
-            data["ts"] = ts.astimezone().isoformat(timespec="seconds")
-        entries.append((ts or datetime.fromtimestamp(0, tz=timezone.utc), data))
-    entries.sort(key=lambda item: item[0], reverse=True)
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Backpressure: worker threads wait for the writer to make room.
+            self._put_blocking(pending, record)
+            return
+        # Never block the event loop; an executor thread waits instead.
+        loop.run_in_executor(None, self._put_blocking, pending, record)
+
+    def _put_blocking(self, pending: "queue.Queue[Any]", record: LogRecord) -> None:
+        while True:
+            try:
+                pending.put(record, timeout=1.0)
+                return
+            except queue.Full:
+                if self._queue is not pending:
+                    # The writer was stopped meanwhile; write it ourselves.
+                    _write_batch([record])
+                    return
+
+    def _drop(self) -> None:
+        DROPPED.inc("queue_full")
+        now = time.monotonic()
+        if now - self._last_drop_warning >= 10.0:
+            self._last_drop_warning = now
+            logger.warning("event log queue full; dropping status events")
+
+    def flush(self, stop: bool = False) -> None:
+        with self._lock:
+            pending, thread = self._queue, self._thread
+            if stop:
+                self._queue = self._thread = None
+        if pending is None or thread is None or not thread.is_alive():
+            return
+        marker = _Marker(stop=stop)
+        pending.put(marker)
+        marker.done.wait()
+        if stop:
+            thread.join()
+
+    def _should_fsync(self) -> bool:
+        settings = get_settings()
+        if settings.log_fsync == "batch":
+            return True
+        if settings.log_fsync == "interval":
+            now = time.monotonic()
+            if now - self._last_fsync >= settings.log_fsync_interval:
+                self._last_fsync = now
+                return True
+        return False
+
+    def _write(self, batch: List[LogRecord]) -> None:
+        fsync = self._should_fsync()
+        for attempt in range(1, WRITE_ATTEMPTS + 1):
+            try:
+                _write_batch(batch, fsync=fsync)
+                return
+            except Exception:
+                if attempt == WRITE_ATTEMPTS:
+                    logger.exception("dropping %d log events after %d failed writes", len(batch), attempt)
+                    DROPPED.inc("write_error", amount=len(batch))
+                    return
+                logger.warning("log write failed (attempt %d), retrying", attempt, exc_info=True)
+                time.sleep(0.2 * attempt)
+
+    def _run(self) -> None:
+        pending = self._queue
+        assert pending is not None
+        while True:
+            item = pending.get()
+            settings = get_settings()
+            batch: List[LogRecord] = []
+            markers: List[_Marker] = []
+            deadline = time.monotonic() + settings.log_flush_interval
+            while True:
+                if isinstance(item, _Marker):
+                    markers.append(item)
+                    break
+                batch.append(item)
+                if len(batch) >= settings.log_batch_size:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = pending.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if batch:
+                self._write(batch)
+            for marker in markers:
+                marker.done.set()
+            if any(marker.stop for marker in markers):
+                return
+
+
+_WRITER = _LogWriter()
+
+
+def flush_logs() -> None:
+    _WRITER.flush()
+
+
+def stop_log_writer() -> None:
+    _WRITER.flush(stop=True)
+
+
+atexit.register(stop_log_writer)
+
+
+@timed("log_event")
+def log_event(evt: Dict[str, Any]) -> None:
+    now = datetime.now(timezone.utc).astimezone()
+    evt["ts"] = now.isoformat(timespec="seconds")
+    _WRITER.submit(LogRecord(now, json.dumps(evt, ensure_ascii=False), evt.get("evt"), evt.get("target")))
+
+
+def _settled_store() -> EventStore:
+    # Everything queued so far is on disk and retention has been applied.
+    store = get_event_store()
+    flush_logs()
+    with _LOG_LOCK:
+        store.prepare()
+        _maybe_prune_locked(time.time(), get_settings().log_retention_days, store)
+    return store
+
+
+def log_generation() -> Optional[Hashable]:
+    return _settled_store().generation()
+
+
+@timed("log_query")
+def query_logs(
+    limit: int,
+    target: Optional[str] = None,
+    evt: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    cursor: Optional[str] = None,
+    settle: bool = True,
+) -> Dict[str, Any]:
+    # ``settle=False`` when the caller already settled the store this request.
+    settings = get_settings()
+    store = _settled_store() if settle else get_event_store()
     limit = settings.log_max_limit if limit <= 0 else min(limit, settings.log_max_limit)
-    return [item[1] for item in entries[:limit]]
+    try:
+        resume = decode_cursor(cursor) if cursor else None
+        entries, next_cursor = store.query(
+            LogQuery(
+                limit=limit,
+                target=target,
+                evt=evt,
+                since=_parse_bound(since, "since"),
+                until=_parse_bound(until, "until"),
+                cursor=resume,
+            )
+        )
+    except ValueError as exc:
+        raise HTTPException(400, detail="invalid cursor") from exc
+    return {"logs": entries, "next_cursor": encode_cursor(next_cursor) if next_cursor else None}
+
+
+register(Gauge("wol_event_log_bytes", "On-disk size of the event log.", lambda: get_event_store().size_bytes()))
+
+
+def read_logs(limit: int) -> List[Dict[str, Any]]:
+    return query_logs(limit)["logs"]
@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+from ..core.locks import FileLock
+from ..core.settings import get_settings
+from ..storage import get_runtime_store
+from .events import get_event_bus
+from .scheduler import ProbeScheduler
+from .status import check_target
+from .targets import list_probe_targets, record_probe_interval
+
+logger = logging.getLogger(__name__)
+
+# How often events are exchanged with the other workers.
+RELAY_INTERVAL = 1.0
+# Upper bound on the leader's sleep, so fast windows opened by a wake or a
+# power command in another worker are noticed promptly.
+TICK = 1.0
+
+
+class StatusMonitor:
+    # With ``leader_lock`` only the worker holding it sweeps, and every
+    # worker relays its published events (status, target, wake, ...) through
+    # the shared runtime store to the SSE clients of the others.
+    def __init__(self, interval: float, leader_lock: Optional[FileLock] = None) -> None:
+        settings = get_settings()
+        self.interval = interval
+        self.scheduler = ProbeScheduler(
+            interval,
+            settings.status_max_interval,
+            settings.status_fast_interval,
+            settings.status_jitter,
+        )
+        self.leader_lock = leader_lock
+        self._task: Optional[asyncio.Task] = None
+        self._leader = leader_lock is None
+        self._origin = uuid.uuid4().hex
+        self._relay_after: Optional[int] = None
+        # Last interval shared per target; written only when it changes.
+        self._shared_intervals: Dict[str, float] = {}
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def leader(self) -> bool:
+        return self._leader
+
+    def start(self) -> None:
+        if self.running or (self.interval <= 0 and self.leader_lock is None):
+            return
+        if self.leader_lock is not None:
+            get_event_bus().enable_relay()
+        self._task = asyncio.create_task(self._run(), name="status-monitor")
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        if self.leader_lock is not None:
+            if self._leader:
+                self.leader_lock.release()
+                self._leader = False
+            self.leader_lock.close()
+
+    async def sweep(self) -> None:
+        # Probes only the targets the scheduler says are due.
+        loop = asyncio.get_running_loop()
+        try:
+            targets = await run_in_threadpool(list_probe_targets)
+        except Exception:
+            logger.exception("status sweep failed")
+            return
+        now, wall = loop.time(), time.time()
+        names = {target["name"] for target in targets}
+        self.scheduler.sync(names, now)
+        for name in set(self._shared_intervals) - names:
+            del self._shared_intervals[name]
+        fast = {target["name"] for target in targets if target["fast_until"] > wall}
+        due = set(self.scheduler.due(now, fast))
+        if not due:
+            return
+        semaphore = asyncio.Semaphore(max(get_settings().status_concurrency, 1))
+
+        async def _probe(target: Dict[str, Any]) -> None:
+            async with semaphore:
+                try:
+                    result = await check_target(target, silent=True)
+                except Exception:
+                    logger.exception("status probe failed for %s", target["name"])
+                    result = {"online": None}
+            name = target["name"]
+            interval = self.scheduler.observe(name, result["online"], loop.time(), name in fast)
+            if self._shared_intervals.get(name) != interval:
+                # Lets every worker's status endpoints judge freshness by it.
+                try:
+                    await run_in_threadpool(record_probe_interval, name, interval)
+                except Exception:
+                    logger.exception("recording probe interval failed for %s", name)
+                else:
+                    self._shared_intervals[name] = interval
+
+        selected: List[Dict[str, Any]] = [target for target in targets if target["name"] in due]
+        await asyncio.gather(*(_probe(target) for target in selected))
+
+    async def relay(self) -> None:
+        bus = get_event_bus()
+        outgoing = bus.drain_outbox()
+        try:
+            incoming, self._relay_after = await run_in_threadpool(
+                get_runtime_store().relay, self._origin, outgoing, self._relay_after
+            )
+        except Exception:
+            logger.exception("event relay failed")
+            return
+        for event in incoming:
+            bus.publish(event, relay=False)
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            if self.leader_lock is not None:
+                await self.relay()
+                if not self._leader and self.interval > 0:
+                    # Non-blocking, so a follower takes over when the leader exits.
+                    self._leader = self.leader_lock.acquire(blocking=False)
+                    if self._leader:
+                        logger.info("status monitor elected leader")
+            if self._leader:
+                await self.sweep()
+                next_due = self.scheduler.next_due()
+                delay = TICK if next_due is None else min(max(next_due - loop.time(), 0.0), TICK)
+            else:
+                delay = max(RELAY_INTERVAL - (loop.time() - started), 0.0)
+            await asyncio.sleep(delay)
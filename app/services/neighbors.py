@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import platform
+import re
+import subprocess
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from ..core.metrics import SUBPROCESS_SPAWNS
+from ..core.settings import get_settings
+
+PROC_ARP = Path("/proc/net/arp")
+MAC_SEARCH = re.compile(r"([0-9A-Fa-f]{2}:){5}[0-9A-Fa-f]{2}")
+ATF_COM = 0x02
+MISS_REFRESH_SECONDS = 0.5
+
+
+def parse_proc_arp(text: str) -> Dict[str, str]:
+    table: Dict[str, str] = {}
+    for line in text.splitlines()[1:]:
+        fields = line.split()
+        if len(fields) < 4:
+            continue
+        ip, _hw_type, flags, mac = fields[:4]
+        try:
+            complete = int(flags, 16) & ATF_COM
+        except ValueError:
+            continue
+        if not complete or mac == "00:00:00:00:00:00":
+            continue
+        table[ip] = mac.upper()
+    return table
+
+
+def _discover_with_commands(ip: str) -> Optional[str]:
+    system = platform.system().lower()
+    commands: List[List[str]] = []
+    if "windows" in system:
+        commands.append(["arp", "-a", ip])
+    else:
+        commands.append(["ip", "neigh", "show", ip])
+        commands.append(["arp", "-n", ip])
+    for cmd in commands:
+        SUBPROCESS_SPAWNS.inc("neighbor")
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True, check=False, timeout=3)
+        except Exception:
+            continue
+        output = f"{result.stdout}\n{result.stderr}".replace("-", ":").strip()
+        match = MAC_SEARCH.search(output)
+        if match:
+            return match.group(0).upper()
+    return None
+
+
+class NeighborTable:
+    # ip -> MAC snapshot of the kernel neighbour table, read from
+    # /proc/net/arp at most once per TTL no matter how many IPs are looked up.
+    def __init__(self, source: Path = PROC_ARP) -> None:
+        self.source = source
+        self._lock = threading.Lock()
+        self._entries: Dict[str, str] = {}
+        self._loaded_at = 0.0
+        self._available: Optional[bool] = None
+
+    @property
+    def available(self) -> bool:
+        if self._available is None:
+            self._available = self.source.is_file()
+        return self._available
+
+    def snapshot(self, max_age: Optional[float] = None) -> Optional[Dict[str, str]]:
+        if not self.available:
+            return None
+        if max_age is None:
+            max_age = get_settings().neigh_cache_ttl
+        with self._lock:
+            if self._loaded_at and time.monotonic() - self._loaded_at <= max_age:
+                return self._entries
+            try:
+                text = self.source.read_text(encoding="utf-8", errors="ignore")
+            except OSError:
+                self._available = False
+                return None
+            self._entries = parse_proc_arp(text)
+            self._loaded_at = time.monotonic()
+            return self._entries
+
+    def lookup(self, ip: str) -> Optional[str]:
+        entries = self.snapshot()
+        if entries is None:
+            return _discover_with_commands(ip)
+        mac = entries.get(ip)
+        if mac is None:
+            # The entry may have been resolved after the snapshot was taken.
+            entries = self.snapshot(max_age=MISS_REFRESH_SECONDS)
+            mac = entries.get(ip) if entries is not None else None
+        return mac
+
+
+_TABLE = NeighborTable()
+
+
+def get_neighbor_table() -> NeighborTable:
+    return _TABLE
+
+
+def lookup_mac(ip: str) -> Optional[str]:
+    return _TABLE.lookup(ip)
@@ -0,0 +1,290 @@
+from __future__ import annotations
+
+import asyncio
+import math
+import os
+import platform
+import re
+import socket
+import struct
+import subprocess
+import time
+import weakref
+from typing import Dict, Iterable, Optional, Tuple
+
+from ..core.metrics import SUBPROCESS_SPAWNS, timed
+
+ICMP_ECHO_REPLY = 0
+ICMP_ECHO_REQUEST = 8
+DEFAULT_TIMEOUT = 1.0
+
+_PAYLOAD = b"wol-web-ping" + b"\x00" * 20
+_RTT_PATTERN = re.compile(r"[=<]\s*([0-9]+(?:\.[0-9]+)?)\s*ms", re.IGNORECASE)
+
+
+def _checksum(data: bytes) -> int:
+    if len(data) % 2:
+        data += b"\x00"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+def _build_echo(ident: int, seq: int) -> bytes:
+    header = struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, 0, ident, seq)
+    checksum = _checksum(header + _PAYLOAD)
+    return struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, checksum, ident, seq) + _PAYLOAD
+
+
+def _subprocess_command(ip: str, timeout: float) -> list:
+    if "windows" in platform.system().lower():
+        return ["ping", "-n", "1", "-w", str(max(int(timeout * 1000), 1)), ip]
+    return ["ping", "-c", "1", "-W", str(max(math.ceil(timeout), 1)), ip]
+
+
+def _parse_subprocess_rtt(output: bytes, started: float) -> float:
+    match = _RTT_PATTERN.search(output.decode("utf-8", errors="ignore"))
+    if match:
+        return float(match.group(1))
+    return (time.perf_counter() - started) * 1000.0
+
+
+async def _subprocess_ping(ip: str, timeout: float) -> Optional[float]:
+    cmd = _subprocess_command(ip, timeout)
+    started = time.perf_counter()
+    SUBPROCESS_SPAWNS.inc("ping")
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            *cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+        )
+    except NotImplementedError:
+        # Event loops without subprocess support (e.g. selector loop on Windows).
+        return await asyncio.get_running_loop().run_in_executor(None, _blocking_ping, cmd, timeout)
+    except OSError:
+        return None
+    try:
+        stdout, _ = await asyncio.wait_for(proc.communicate(), timeout + 1)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        return None
+    if proc.returncode != 0:
+        return None
+    return round(_parse_subprocess_rtt(stdout or b"", started), 3)
+
+
+def _blocking_ping(cmd: list, timeout: float) -> Optional[float]:
+    started = time.perf_counter()
+    try:
+        result = subprocess.run(cmd, capture_output=True, check=False, timeout=timeout + 1)
+    except Exception:
+        return None
+    if result.returncode != 0:
+        return None
+    return round(_parse_subprocess_rtt(result.stdout or b"", started), 3)
+
+
+class Pinger:
+    # One ICMP socket per event loop: unprivileged SOCK_DGRAM first, then
+    # SOCK_RAW, and the system ping binary only when neither is permitted.
+    def __init__(self) -> None:
+        self._sock: Optional[socket.socket] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._mode: Optional[str] = None
+        self._ident = os.getpid() & 0xFFFF
+        self._seq = 0
+        self._pending: Dict[Tuple[str, int], Tuple[float, asyncio.Future]] = {}
+
+    @property
+    def mode(self) -> Optional[str]:
+        return self._mode
+
+    def _open_socket(self, loop: asyncio.AbstractEventLoop) -> None:
+        if self._mode is not None:
+            return
+        for kind, mode in ((socket.SOCK_DGRAM, "dgram"), (socket.SOCK_RAW, "raw")):
+            try:
+                sock = socket.socket(socket.AF_INET, kind, socket.IPPROTO_ICMP)
+            except (OSError, AttributeError):
+                continue
+            sock.setblocking(False)
+            try:
+                loop.add_reader(sock.fileno(), self._on_readable)
+            except (NotImplementedError, RuntimeError):
+                sock.close()
+                break
+            self._sock = sock
+            self._loop = loop
+            self._mode = mode
+            return
+        self._mode = "subprocess"
+
+    def close(self) -> None:
+        # Drops the reader and the socket; a later ping reopens them.
+        sock, loop = self._sock, self._loop
+        self._sock = self._loop = None
+        self._mode = None
+        for _sent, future in self._pending.values():
+            if not future.done():
+                future.cancel()
+        self._pending.clear()
+        if sock is None:
+            return
+        if loop is not None and not loop.is_closed():
+            try:
+                loop.remove_reader(sock.fileno())
+            except (NotImplementedError, RuntimeError, ValueError):
+                pass
+        sock.close()
+
+    def _next_seq(self, ip: str) -> int:
+        for _ in range(0x10000):
+            self._seq = (self._seq + 1) & 0xFFFF
+            if (ip, self._seq) not in self._pending:
+                return self._seq
+        raise RuntimeError("too many outstanding echo requests")
+
+    def _on_readable(self) -> None:
+        sock = self._sock
+        if sock is None:
+            return
+        while True:
+            try:
+                data, addr = sock.recvfrom(2048)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                return
+            received = time.perf_counter()
+            if self._mode == "raw":
+                if len(data) < 20:
+                    continue
+                data = data[(data[0] & 0x0F) * 4:]
+            if len(data) < 8:
+                continue
+            icmp_type, _code, _checksum_value, ident, seq = struct.unpack("!BBHHH", data[:8])
+            if icmp_type != ICMP_ECHO_REPLY:
+                continue
+            # Datagram sockets rewrite the identifier to the local port; the
+            # kernel already filters replies for us in that mode.
+            if self._mode == "raw" and ident != self._ident:
+                continue
+            waiter = self._pending.pop((addr[0], seq), None)
+            if waiter is None:
+                continue
+            sent, future = waiter
+            if not future.done():
+                future.set_result(round((received - sent) * 1000.0, 3))
+
+    async def _send(self, packet: bytes, ip: str, deadline: float) -> bool:
+        assert self._sock is not None
+        while True:
+            try:
+                self._sock.sendto(packet, (ip, 0))
+                return True
+            except (BlockingIOError, InterruptedError):
+                if time.perf_counter() >= deadline:
+                    return False
+                await asyncio.sleep(0.001)
+            except OSError:
+                return False
+
+    async def ping(self, ip: str, timeout: float = DEFAULT_TIMEOUT) -> Optional[float]:
+        if not ip:
+            return None
+        with timed("ping"):
+            return await self._ping(ip, timeout)
+
+    async def _ping(self, ip: str, timeout: float) -> Optional[float]:
+        loop = asyncio.get_running_loop()
+        self._open_socket(loop)
+        if self._mode == "subprocess":
+            return await _subprocess_ping(ip, timeout)
+        seq = self._next_seq(ip)
+        key = (ip, seq)
+        future = loop.create_future()
+        started = time.perf_counter()
+        self._pending[key] = (started, future)
+        try:
+            if not await self._send(_build_echo(self._ident, seq), ip, started + timeout):
+                return None
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            self._pending.pop(key, None)
+
+    async def ping_many(
+        self,
+        ips: Iterable[str],
+        timeout: float = DEFAULT_TIMEOUT,
+        concurrency: Optional[int] = None,
+    ) -> Dict[str, Optional[float]]:
+        unique = list(dict.fromkeys(ip for ip in ips if ip))
+        if not unique:
+            return {}
+        if concurrency is None or concurrency <= 0:
+            results = await asyncio.gather(*(self.ping(ip, timeout) for ip in unique))
+            return dict(zip(unique, results))
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def _bounded(ip: str) -> Optional[float]:
+            async with semaphore:
+                return await self.ping(ip, timeout)
+
+        results = await asyncio.gather(*(_bounded(ip) for ip in unique))
+        return dict(zip(unique, results))
+
+
+_PINGERS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Pinger]" = weakref.WeakKeyDictionary()
+
+
+def _close_stale_pingers() -> None:
+    # asyncio has no loop-close hook; release sockets of loops that ended.
+    for loop in [loop for loop in list(_PINGERS) if loop.is_closed()]:
+        pinger = _PINGERS.pop(loop, None)
+        if pinger is not None:
+            pinger.close()
+
+
+def get_pinger() -> Pinger:
+    loop = asyncio.get_running_loop()
+    pinger = _PINGERS.get(loop)
+    if pinger is None:
+        _close_stale_pingers()
+        pinger = Pinger()
+        _PINGERS[loop] = pinger
+    return pinger
+
+
+def close_pinger() -> None:
+    # Called from the app lifespan before its event loop goes away.
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    pinger = _PINGERS.pop(loop, None)
+    if pinger is not None:
+        pinger.close()
+    _close_stale_pingers()
+
+
+def ping_host_blocking(ip: str, timeout: float = DEFAULT_TIMEOUT) -> Optional[float]:
+    # For synchronous callers outside any event loop.
+    if not ip:
+        return None
+    SUBPROCESS_SPAWNS.inc("ping")
+    return _blocking_ping(_subprocess_command(ip, timeout), timeout)
+
+
+async def ping_host(ip: str, timeout: float = DEFAULT_TIMEOUT) -> Optional[float]:
+    return await get_pinger().ping(ip, timeout)
+
+
+async def ping_hosts(
+    ips: Iterable[str],
+    timeout: float = DEFAULT_TIMEOUT,
+    concurrency: Optional[int] = None,
+) -> Dict[str, Optional[float]]:
+    return await get_pinger().ping_many(ips, timeout, concurrency)
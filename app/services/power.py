@@ -1,21 +1,37 @@
 ﻿from __future__ import annotations
 
-import socket
+import asyncio
+import codecs
+import json
+import os
+import signal
 import subprocess
-from typing import Any, Dict, List, Optional, Tuple, Union
+import time
+import weakref
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple, Union
 
 from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
 
+from ..core.metrics import SUBPROCESS_SPAWNS, timed
 from ..core.settings import get_settings
+from .events import publish
 from .logs import log_event
+from .singleflight import get_flight
 from .targets import (
+    _normalize_name,
     discover_mac_for_ip,
+    expect_transition,
     get_target_or_404,
     record_wake,
     set_target_mac,
 )
+from .wol import etherwake, get_sender
 
 CommandType = Union[str, List[str], Dict[str, Any]]
+CommandSpec = Tuple[Union[List[str], str], bool, Optional[float], str]
+
+STREAM_CHUNK_SIZE = 4096
 
 
 def trim_text(value: str, limit: int = 4000) -> str:
@@ -62,36 +78,49 @@ def normalize_command_spec(spec: CommandType) -> Tuple[Union[List[str], str], bo
 
 
 def send_magic_packet(mac: str, broadcast: str) -> None:
-    mac_bytes = bytes.fromhex(mac.replace(":", "").replace("-", ""))
-    packet = b"\xff" * 6 + mac_bytes * 16
-    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    try:
-        sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
-        sock.sendto(packet, (broadcast, 9))
-    finally:
-        sock.close()
+    settings = get_settings()
+    get_sender().send_udp([mac], broadcast, settings.wol_ports, settings.wol_repeats, settings.wol_spacing)
 
 
-def wake_target(name: str) -> Dict[str, Any]:
+@timed("wake_send")
+def _send_wake(macs: List[str]) -> str:
+    # Returns the method used. "raw" and "etherwake" both send an ethertype
+    # 0x0842 frame from a reusable AF_PACKET socket; the etherwake binary is
+    # only spawned when that socket cannot be opened (no CAP_NET_RAW, non-Linux).
     settings = get_settings()
+    sender = get_sender()
+    if settings.wol_method in ("raw", "etherwake"):
+        try:
+            sender.send_raw(macs, settings.lan_iface, settings.wol_repeats, settings.wol_spacing)
+            return "raw"
+        except (AttributeError, OSError) as exc:
+            if settings.wol_method == "raw":
+                raise HTTPException(500, "raw magic packet send failed") from exc
+        try:
+            etherwake(macs, settings.lan_iface)
+        except OSError as exc:
+            raise HTTPException(500, "etherwake failed") from exc
+        return "etherwake"
+    try:
+        sender.send_udp(macs, settings.broadcast, settings.wol_ports, settings.wol_repeats, settings.wol_spacing)
+    except OSError as exc:
+        raise HTTPException(500, "magic packet send failed") from exc
+    return "magic-packet"
+
+
+def _resolve_wake_mac(name: str) -> str:
     target = get_target_or_404(name)
     mac = target.get("mac")
     if not mac and target.get("ip"):
         discovered = discover_mac_for_ip(target["ip"])
         if discovered:
-            updated = set_target_mac(name, discovered)
-            mac = updated.get("mac")
-            target = updated
+            mac = set_target_mac(name, discovered).get("mac")
     if not mac:
         raise HTTPException(400, detail={"error": "no mac for target", "target": name})
-    if settings.wol_method == "etherwake":
-        rc = subprocess.call(["/usr/sbin/etherwake", "-i", settings.lan_iface, mac])
-        if rc != 0:
-            raise HTTPException(500, "etherwake failed")
-        method = "etherwake"
-    else:
-        send_magic_packet(mac, settings.broadcast)
-        method = "magic-packet"
+    return mac
+
+
+def _wake_sent(name: str, mac: str, method: str) -> Dict[str, Any]:
     log_event({
         "evt": "wake",
         "target": name,
@@ -99,80 +128,276 @@ def wake_target(name: str) -> Dict[str, Any]:
         "from": "api",
         "method": method,
     })
-    record_wake(name)
-    return {"ok": True, "sent": method, "target": name}
+    runtime = record_wake(name)
+    return {"ok": True, "sent": method, "target": name, "woke_at": runtime["last_wake_at"]}
+
+
+def wake_target(name: str) -> Dict[str, Any]:
+    mac = _resolve_wake_mac(name)
+    return _wake_sent(name, mac, _send_wake([mac]))
+
+
+def resend_wake(name: str) -> str:
+    # Follow-up packet from wake verification; does not reset last_wake_at.
+    mac = _resolve_wake_mac(name)
+    method = _send_wake([mac])
+    log_event({
+        "evt": "wake",
+        "target": name,
+        "mac": mac,
+        "from": "verify",
+        "method": method,
+    })
+    return method
+
+
+def wake_targets(names: List[str]) -> List[Dict[str, Any]]:
+    # Resolves every MAC first, then sends all packets in one pass over the
+    # shared sockets. Results keep the order of ``names``.
+    results: Dict[str, Dict[str, Any]] = {}
+    macs: Dict[str, str] = {}
+    for name in names:
+        try:
+            macs[name] = _resolve_wake_mac(name)
+        except HTTPException as exc:
+            results[name] = {"target": name, "ok": False, "status_code": exc.status_code, "error": exc.detail}
+    if macs:
+        try:
+            method = _send_wake(list(macs.values()))
+        except HTTPException as exc:
+            for name in macs:
+                results[name] = {"target": name, "ok": False, "status_code": exc.status_code, "error": exc.detail}
+        else:
+            for name, mac in macs.items():
+                results[name] = _wake_sent(name, mac, method)
+    return [results[name] for name in names]
+
+
+class _CommandGate:
+    # Global cap on concurrently running commands plus one lock per target so
+    # a target never runs two power commands at once.
+    def __init__(self, limit: int) -> None:
+        self.semaphore = asyncio.Semaphore(max(limit, 1))
+        self.locks: Dict[str, asyncio.Lock] = {}
+
+    def lock_for(self, name: str) -> asyncio.Lock:
+        lock = self.locks.get(name)
+        if lock is None:
+            lock = self.locks[name] = asyncio.Lock()
+        return lock
 
 
-def execute_target_command(name: str, action: str) -> Dict[str, Any]:
+_GATES: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _CommandGate]" = weakref.WeakKeyDictionary()
+
+
+def _get_gate() -> _CommandGate:
+    loop = asyncio.get_running_loop()
+    gate = _GATES.get(loop)
+    if gate is None:
+        gate = _GATES[loop] = _CommandGate(get_settings().command_concurrency)
+    return gate
+
+
+def prepare_target_command(name: str, action: str) -> CommandSpec:
     target = get_target_or_404(name)
     spec = target.get(action)
     if spec is None:
         raise HTTPException(400, f"no {action} command configured for target")
     try:
-        cmd, use_shell, timeout, description = normalize_command_spec(spec)
+        return normalize_command_spec(spec)
     except ValueError as exc:
         raise HTTPException(400, detail=f"invalid {action} command: {exc}") from exc
-    try:
-        result = subprocess.run(
-            cmd,
-            shell=use_shell,
-            timeout=timeout,
-            check=False,
-            capture_output=True,
-            text=True,
-        )
-    except subprocess.TimeoutExpired as exc:
-        log_event({
-            "evt": action,
-            "target": name,
-            "from": "api",
-            "command": description,
-            "error": "timeout",
-            "timeout": timeout,
-        })
-        raise HTTPException(504, detail=f"{action} command timed out") from exc
-    except OSError as exc:
-        log_event({
-            "evt": action,
-            "target": name,
-            "from": "api",
-            "command": description,
-            "error": "oserror",
-            "message": str(exc),
-        })
-        raise HTTPException(500, detail=f"{action} command failed to start") from exc
-
-    stdout = result.stdout or ""
-    stderr = result.stderr or ""
+
+
+async def _spawn(cmd: Union[List[str], str], use_shell: bool) -> asyncio.subprocess.Process:
+    # A new session makes the command the leader of its own process group,
+    # so a timeout can take down everything it forked (ssh, sudo, ...).
+    SUBPROCESS_SPAWNS.inc("command")
+    options: Dict[str, Any] = {"stdout": subprocess.PIPE, "stderr": subprocess.PIPE}
+    if os.name == "posix":
+        options["start_new_session"] = True
+    if use_shell:
+        assert isinstance(cmd, str)
+        return await asyncio.create_subprocess_shell(cmd, **options)
+    return await asyncio.create_subprocess_exec(*cmd, **options)
+
+
+async def _kill_process_group(proc: asyncio.subprocess.Process) -> None:
+    if proc.returncode is None:
+        try:
+            if os.name == "posix":
+                os.killpg(proc.pid, signal.SIGKILL)
+            else:
+                proc.kill()
+        except ProcessLookupError:
+            pass
+    await proc.wait()
+
+
+def _log_failure(name: str, action: str, description: str, **details: Any) -> None:
+    log_event({
+        "evt": action,
+        "target": name,
+        "from": "api",
+        "command": description,
+        **details,
+    })
+
+
+async def _log_result(name: str, action: str, description: str, returncode: int, stdout: str, stderr: str) -> None:
     log_payload = {
         "evt": action,
         "target": name,
         "from": "api",
         "command": description,
-        "rc": result.returncode,
+        "rc": returncode,
     }
     if stdout:
         log_payload["stdout"] = trim_text(stdout)
     if stderr:
         log_payload["stderr"] = trim_text(stderr)
     log_event(log_payload)
+    publish(action, target=name, ok=returncode == 0, returncode=returncode)
+    if returncode == 0:
+        # A runtime-store write (a SQLite transaction there): keep it off the loop.
+        await run_in_threadpool(expect_transition, name)
 
-    if result.returncode != 0:
-        raise HTTPException(
-            500,
-            detail={
-                "error": f"{action} command failed",
-                "returncode": result.returncode,
-                "stdout": trim_text(stdout, 1000),
-                "stderr": trim_text(stderr, 1000),
-            },
-        )
+
+async def run_target_command(
+    name: str,
+    action: str,
+    spec: CommandSpec,
+    on_start: Optional[Callable[[], None]] = None,
+) -> Dict[str, Any]:
+    # Runs the command to completion and reports its outcome; only failures
+    # to start or time out raise. Shared by the request path and jobs.
+    cmd, use_shell, timeout, description = spec
+    # Key the gate, logs and events on the stored name so "PC1" and "pc1"
+    # share one lock and one event stream.
+    name = _normalize_name(name)
+    gate = _get_gate()
+    async with gate.lock_for(name), gate.semaphore:
+        if on_start is not None:
+            on_start()
+        try:
+            proc = await _spawn(cmd, use_shell)
+        except OSError as exc:
+            _log_failure(name, action, description, error="oserror", message=str(exc))
+            raise HTTPException(500, detail=f"{action} command failed to start") from exc
+        try:
+            with timed("command"):
+                raw_stdout, raw_stderr = await asyncio.wait_for(proc.communicate(), timeout)
+        except asyncio.TimeoutError as exc:
+            await _kill_process_group(proc)
+            _log_failure(name, action, description, error="timeout", timeout=timeout)
+            raise HTTPException(504, detail=f"{action} command timed out") from exc
+        except BaseException:
+            await _kill_process_group(proc)
+            raise
+
+    stdout = raw_stdout.decode("utf-8", errors="replace")
+    stderr = raw_stderr.decode("utf-8", errors="replace")
+    returncode = proc.returncode if proc.returncode is not None else -1
+    await _log_result(name, action, description, returncode, stdout, stderr)
     return {
-        "ok": True,
+        "ok": returncode == 0,
         "action": action,
         "target": name,
-        "returncode": result.returncode,
+        "returncode": returncode,
         "stdout": stdout,
         "stderr": stderr,
         "command": description,
     }
+
+
+async def execute_target_command(name: str, action: str) -> Dict[str, Any]:
+    # A repeated request joins the command already running for this target,
+    # or reuses its result for COALESCE_WINDOW seconds after it finished.
+    async def _execute() -> Dict[str, Any]:
+        return await run_target_command(name, action, prepare_target_command(name, action))
+
+    result, shared = await get_flight().do(
+        (action, _normalize_name(name)), _execute, linger=get_settings().coalesce_window
+    )
+    if shared:
+        result = {**result, "coalesced": True}
+    if result["returncode"] != 0:
+        raise HTTPException(
+            500,
+            detail={
+                "error": f"{action} command failed",
+                "returncode": result["returncode"],
+                "stdout": trim_text(result["stdout"], 1000),
+                "stderr": trim_text(result["stderr"], 1000),
+            },
+        )
+    return result
+
+
+def _ndjson(payload: Dict[str, Any]) -> str:
+    return json.dumps(payload, ensure_ascii=False) + "\n"
+
+
+async def _pump(stream: asyncio.StreamReader, kind: str, sink: "asyncio.Queue[Tuple[str, Optional[str]]]") -> None:
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    while True:
+        chunk = await stream.read(STREAM_CHUNK_SIZE)
+        text = decoder.decode(chunk, final=not chunk)
+        if text:
+            await sink.put((kind, text))
+        if not chunk:
+            break
+    await sink.put((kind, None))
+
+
+async def stream_target_command(name: str, action: str, spec: CommandSpec) -> AsyncIterator[str]:
+    # NDJSON lines: start, stdout/stderr chunks as they arrive, then exit
+    # (or error). Validation happens in prepare_target_command beforehand so
+    # 4xx errors are still returned as plain HTTP responses.
+    cmd, use_shell, timeout, description = spec
+    name = _normalize_name(name)
+    gate = _get_gate()
+    async with gate.lock_for(name), gate.semaphore:
+        try:
+            proc = await _spawn(cmd, use_shell)
+        except OSError as exc:
+            _log_failure(name, action, description, error="oserror", message=str(exc))
+            yield _ndjson({"type": "error", "error": "oserror", "message": str(exc)})
+            return
+        yield _ndjson({"type": "start", "action": action, "target": name, "command": description})
+        assert proc.stdout is not None and proc.stderr is not None
+        chunks: "asyncio.Queue[Tuple[str, Optional[str]]]" = asyncio.Queue()
+        pumps = [
+            asyncio.create_task(_pump(proc.stdout, "stdout", chunks)),
+            asyncio.create_task(_pump(proc.stderr, "stderr", chunks)),
+        ]
+        collected: Dict[str, List[str]] = {"stdout": [], "stderr": []}
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        open_streams = 2
+        try:
+            while open_streams:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise asyncio.TimeoutError
+                kind, text = await asyncio.wait_for(chunks.get(), remaining)
+                if text is None:
+                    open_streams -= 1
+                    continue
+                collected[kind].append(text)
+                yield _ndjson({"type": kind, "data": text})
+            remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+            await asyncio.wait_for(proc.wait(), remaining)
+        except asyncio.TimeoutError:
+            await _kill_process_group(proc)
+            _log_failure(name, action, description, error="timeout", timeout=timeout)
+            yield _ndjson({"type": "error", "error": "timeout", "timeout": timeout})
+            return
+        finally:
+            # Also reached when the client disconnects mid-stream.
+            for pump in pumps:
+                pump.cancel()
+            await _kill_process_group(proc)
+
+    returncode = proc.returncode if proc.returncode is not None else -1
+    await _log_result(name, action, description, returncode, "".join(collected["stdout"]), "".join(collected["stderr"]))
+    yield _ndjson({"type": "exit", "ok": returncode == 0, "returncode": returncode})
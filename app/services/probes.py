@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Any, Awaitable, Dict, Iterable, List, Optional, Tuple
+
+from ..core.metrics import timed
+from ..core.settings import get_settings
+from .pinger import ping_host
+
+PROBE_METHODS = ("icmp", "tcp", "both")
+
+ProbeResult = Tuple[Optional[float], Optional[str]]
+
+
+async def _tcp_connect(ip: str, port: int, timeout: float) -> ProbeResult:
+    # A completed handshake or a RST both prove the host is up; only silence
+    # (timeout) or an unreachable error counts as down.
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    try:
+        transport, _ = await asyncio.wait_for(loop.create_connection(asyncio.Protocol, ip, port), timeout)
+    except ConnectionRefusedError:
+        pass
+    except (OSError, asyncio.TimeoutError):
+        return None, None
+    else:
+        transport.abort()
+    return round((time.perf_counter() - started) * 1000.0, 3), f"tcp/{port}"
+
+
+async def _icmp(ip: str, timeout: float) -> ProbeResult:
+    rtt_ms = await ping_host(ip, timeout)
+    return rtt_ms, "icmp" if rtt_ms is not None else None
+
+
+async def _first_success(attempts: List[Awaitable[ProbeResult]]) -> ProbeResult:
+    pending = {asyncio.ensure_future(attempt) for attempt in attempts}
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if not task.cancelled() and task.exception() is None and task.result()[0] is not None:
+                    return task.result()
+        return None, None
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def tcp_probe(ip: str, ports: Iterable[int], timeout: float) -> ProbeResult:
+    # All ports are tried at once; the first one that answers wins.
+    ports = list(dict.fromkeys(ports))
+    if not ip or not ports:
+        return None, None
+    with timed("tcp_probe"):
+        return await _first_success([_tcp_connect(ip, port, timeout) for port in ports])
+
+
+async def probe_host(ip: str, method: str, ports: Iterable[int], timeout: float) -> ProbeResult:
+    # Returns (latency in ms, what answered: "icmp" or "tcp/<port>"), or
+    # (None, None) when the host is down.
+    if method == "tcp":
+        return await tcp_probe(ip, ports, timeout)
+    if method == "both":
+        return await _first_success([_icmp(ip, timeout), tcp_probe(ip, ports, timeout)])
+    return await _icmp(ip, timeout)
+
+
+async def probe_target(target: Dict[str, Any]) -> ProbeResult:
+    settings = get_settings()
+    method = target.get("probe") or settings.probe_method
+    ports = target.get("probe_ports") or settings.probe_ports
+    return await probe_host(target.get("ip") or "", method, ports, settings.ping_timeout)
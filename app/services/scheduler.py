@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import random
+from typing import Callable, Dict, Iterable, List, Optional
+
+
+class ProbeScheduler:
+    # Per-target probe cadence. A target whose state has not changed backs
+    # off exponentially from ``base`` up to ``maximum``; a state change snaps
+    # it back to ``base``, and a target inside its fast window (just woken,
+    # shut down or rebooted) is probed every ``fast`` seconds. Every interval
+    # is spread by +/- ``jitter`` so a fleet does not settle into bursts.
+    # Times are the caller's monotonic clock.
+    def __init__(
+        self,
+        base: float,
+        maximum: float,
+        fast: float,
+        jitter: float = 0.1,
+        rng: Callable[[], float] = random.random,
+    ) -> None:
+        self.base = max(base, 0.1)
+        self.maximum = max(maximum, self.base)
+        self.fast = max(min(fast, self.base), 0.1)
+        self.jitter = min(max(jitter, 0.0), 0.5)
+        self.rng = rng
+        self._due: Dict[str, float] = {}
+        self._interval: Dict[str, float] = {}
+        self._last: Dict[str, float] = {}
+        self._online: Dict[str, Optional[bool]] = {}
+
+    def _spread(self, interval: float) -> float:
+        return interval * (1.0 + self.jitter * (2.0 * self.rng() - 1.0))
+
+    def sync(self, names: Iterable[str], now: float) -> None:
+        # New targets start at a random point of the base interval; removed
+        # ones are forgotten.
+        wanted = set(names)
+        for name in list(self._due):
+            if name not in wanted:
+                for table in (self._due, self._interval, self._last, self._online):
+                    table.pop(name, None)
+        for name in wanted:
+            if name not in self._due:
+                self._due[name] = now + self.rng() * self.base
+                self._interval[name] = self.base
+
+    def due(self, now: float, fast: Iterable[str] = ()) -> List[str]:
+        for name in fast:
+            if name in self._due:
+                self._due[name] = min(self._due[name], self._last.get(name, now) + self.fast)
+        return sorted((name for name, when in self._due.items() if when <= now), key=self._due.__getitem__)
+
+    def observe(self, name: str, online: Optional[bool], now: float, fast: bool = False) -> float:
+        if name not in self._due:
+            return 0.0
+        previous = self._online.get(name)
+        if fast:
+            interval = self.fast
+        elif name not in self._online or previous != online:
+            interval = self.base
+        else:
+            interval = min(self._interval[name] * 2.0, self.maximum)
+        self._online[name] = online
+        self._interval[name] = interval
+        self._last[name] = now
+        self._due[name] = now + self._spread(interval)
+        return interval
+
+    def next_due(self) -> Optional[float]:
+        return min(self._due.values()) if self._due else None
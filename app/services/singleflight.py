@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import asyncio
+import time
+import weakref
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+from ..core.metrics import Counter, register
+
+COALESCED = register(
+    Counter(
+        "wol_coalesced_calls_total",
+        "Calls that joined an in-flight or just-finished identical operation.",
+        labels=("operation",),
+    )
+)
+
+
+class SingleFlight:
+    # Calls with the same key share one execution. With ``linger`` the result
+    # is also handed to callers arriving within that many seconds after it
+    # finished; failures are never reused.
+    def __init__(self) -> None:
+        self._calls: Dict[Hashable, "asyncio.Task[Any]"] = {}
+        self._recent: Dict[Hashable, Tuple[float, Any]] = {}
+
+    def _settle(self, key: Hashable, task: "asyncio.Task[Any]", linger: float) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if linger > 0 and not task.cancelled() and task.exception() is None:
+            self._recent[key] = (time.monotonic() + linger, task.result())
+
+    async def do(
+        self,
+        key: Tuple[str, str],
+        factory: Callable[[], Awaitable[Any]],
+        linger: float = 0.0,
+    ) -> Tuple[Any, bool]:
+        # Returns (result, shared); shared results must not be mutated.
+        recent = self._recent.get(key)
+        if recent is not None:
+            if recent[0] > time.monotonic():
+                COALESCED.inc(key[0])
+                return recent[1], True
+            del self._recent[key]
+        task = self._calls.get(key)
+        shared = task is not None
+        if task is None:
+            task = asyncio.get_running_loop().create_task(factory())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._settle(key, done, linger))
+        else:
+            COALESCED.inc(key[0])
+        # Shielded so one caller disconnecting does not cancel the others.
+        return await asyncio.shield(task), shared
+
+
+_FLIGHTS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, SingleFlight]" = weakref.WeakKeyDictionary()
+
+
+def get_flight() -> SingleFlight:
+    loop = asyncio.get_running_loop()
+    flight = _FLIGHTS.get(loop)
+    if flight is None:
+        flight = _FLIGHTS[loop] = SingleFlight()
+    return flight
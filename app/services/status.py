@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Dict, Iterable, List, Optional
+
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+
+from ..core.settings import get_settings
+from .logs import log_event
+from .probes import probe_target
+from .singleflight import get_flight
+from .targets import _normalize_name, get_runtime, list_targets, record_status, status_timing
+
+
+def _status_payload(name: str, runtime: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "target": name,
+        "online": runtime.get("online"),
+        "rtt_ms": runtime.get("rtt_ms"),
+        "method": runtime.get("probe_method"),
+        "checked_at": runtime.get("last_status_at"),
+    }
+
+
+async def check_target(target: Dict[str, Any], silent: bool = True) -> Dict[str, Any]:
+    name = target["name"]
+    ip = target.get("ip") or ""
+
+    async def _probe() -> Dict[str, Any]:
+        rtt_ms, method = await probe_target(target)
+        return await run_in_threadpool(record_status, name, rtt_ms is not None, ip, rtt_ms, method)
+
+    # Concurrent checks of one target (several dashboards, the monitor) share a probe.
+    runtime, _ = await get_flight().do(("probe", name), _probe)
+    if not silent:
+        log_event({"evt": "status", "target": name, "online": runtime["online"], "rtt_ms": runtime["rtt_ms"]})
+    return _status_payload(name, runtime)
+
+
+def _default_max_age(interval: Optional[float]) -> float:
+    # A cached status stays fresh until the monitor's next probe of the
+    # target is overdue, so a backed-off target is not re-probed on the
+    # request path. The slack covers the monitor's 1s tick and the probe.
+    settings = get_settings()
+    if interval is None or settings.status_interval <= 0:
+        return settings.status_max_age
+    bound = interval * (1.0 + settings.status_jitter) + 1.0 + settings.ping_timeout
+    return max(settings.status_max_age, bound)
+
+
+def _is_fresh(name: str, max_age: Optional[float]) -> bool:
+    age, interval = status_timing(name)
+    if age is None:
+        return False
+    if max_age is None:
+        max_age = _default_max_age(interval)
+    return age <= max_age
+
+
+def _fresh_payloads(targets: Iterable[Dict[str, Any]], max_age: Optional[float]) -> Dict[str, Dict[str, Any]]:
+    # Runtime-store reads; callers run this in the threadpool.
+    return {
+        target["name"]: _status_payload(target["name"], get_runtime(target["name"]))
+        for target in targets
+        if _is_fresh(target["name"], max_age)
+    }
+
+
+async def get_status(
+    target: Dict[str, Any], max_age: Optional[float] = None, silent: bool = True
+) -> Dict[str, Any]:
+    fresh = await run_in_threadpool(_fresh_payloads, [target], max_age)
+    if fresh:
+        return fresh[target["name"]]
+    return await check_target(target, silent=silent)
+
+
+def _select_targets(names: Optional[Iterable[str]]) -> List[Dict[str, Any]]:
+    targets = list_targets()
+    if names is None:
+        return targets
+    wanted = list(dict.fromkeys(_normalize_name(name) for name in names if name.strip()))
+    by_name = {target["name"]: target for target in targets}
+    missing = [name for name in wanted if name not in by_name]
+    if missing:
+        raise HTTPException(404, detail={"error": "unknown target", "targets": missing})
+    return [by_name[name] for name in wanted]
+
+
+async def check_targets(
+    names: Optional[Iterable[str]] = None,
+    silent: bool = True,
+    max_age: Optional[float] = None,
+    cached: bool = False,
+) -> List[Dict[str, Any]]:
+    # Without ``max_age`` every target is probed, unless ``cached`` asks for
+    # each target's default freshness.
+    settings = get_settings()
+    selected = await run_in_threadpool(_select_targets, names)
+    use_cache = cached or max_age is not None
+    fresh = await run_in_threadpool(_fresh_payloads, selected, max_age) if use_cache else {}
+    semaphore = asyncio.Semaphore(max(settings.status_concurrency, 1))
+
+    async def _bounded(target: Dict[str, Any]) -> Dict[str, Any]:
+        if target["name"] in fresh:
+            return fresh[target["name"]]
+        async with semaphore:
+            return await check_target(target, silent=silent)
+
+    return list(await asyncio.gather(*(_bounded(target) for target in selected)))
@@ -1,25 +1,63 @@
 ﻿from __future__ import annotations
 
 import ipaddress
-import json
-import platform
 import re
-import subprocess
-import threading
+import time
 from datetime import datetime, timezone
-from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from contextlib import contextmanager
+from typing import Any, Dict, Hashable, Iterable, Iterator, List, Optional, Set, Tuple
 
 from fastapi import HTTPException
 
-from ..config import TARGETS_FILE, env
+from ..config import env
+from ..core.metrics import PROBES, TimedLock, timed
+from ..core.settings import get_settings
+from ..storage import TargetStore, get_runtime_store, get_target_store
+from .events import publish
 from .logs import log_event
+from .neighbors import lookup_mac
 
 NAME_PATTERN = re.compile(r"^[a-z0-9][a-z0-9-]{1,31}$")
 MAC_PATTERN = re.compile(r"^([0-9A-Fa-f]{2}:){5}[0-9A-Fa-f]{2}$")
-
-_TARGETS_LOCK = threading.Lock()
-_RUNTIME_STATE: Dict[str, Dict[str, Any]] = {}
+TAG_PATTERN = re.compile(r"^[a-z0-9][a-z0-9_-]{0,31}$")
+PROBE_METHODS = ("icmp", "tcp", "both")
+# Stored fields that may leave the server; shutdown/reboot commands never do.
+EXPORT_FIELDS = ("name", "ip", "mac", "tags", "probe", "probe_ports", "created_at", "updated_at")
+
+_TARGETS_LOCK = TimedLock("targets")
+# Set while this process holds the store's cross-process lock.
+_STORE_LOCKED = False
+_MAC_VERIFIED: Dict[str, float] = {}
+# Runtime fields refreshed by every probe; changing them alone does not move
+# the /api/targets ETag (live values come from /api/status and SSE).
+_QUIET_RUNTIME = frozenset({"last_status_at", "rtt_ms", "probe_method", "mac_verified_at"})
+
+
+class _TargetRegistry:
+    # Normalized targets kept in memory; reloaded only when the store's
+    # signature (file inode/mtime/size, SQLite targets version) no longer
+    # matches what was last read or written.
+    def __init__(self) -> None:
+        self.signature: Optional[Hashable] = None
+        self.targets: List[Dict[str, Any]] = []
+        self.index: Dict[str, Dict[str, Any]] = {}
+        self.groups: Dict[str, List[str]] = {}
+
+    def replace(self, targets: List[Dict[str, Any]], signature: Optional[Hashable]) -> None:
+        self.targets = list(targets)
+        self.index = {target["name"]: target for target in self.targets}
+        groups: Dict[str, List[str]] = {}
+        for target in self.targets:
+            for tag in target.get("tags", ()):
+                groups.setdefault(tag, []).append(target["name"])
+        self.groups = groups
+        self.signature = signature
+
+    def is_current(self, signature: Optional[Hashable]) -> bool:
+        return signature is not None and signature == self.signature
+
+
+_REGISTRY = _TargetRegistry()
 
 
 def _now_ts() -> str:
@@ -60,6 +98,69 @@ def _normalize_mac(mac: Optional[str]) -> Optional[str]:
     return value
 
 
+def _normalize_tags(tags: Any, strict: bool = True) -> List[str]:
+    # Accepts a list or a comma separated string; returns sorted unique tags.
+    if tags is None:
+        return []
+    if isinstance(tags, str):
+        tags = tags.split(",")
+    if not isinstance(tags, (list, tuple)):
+        if strict:
+            raise HTTPException(400, detail="tags must be a list of strings")
+        return []
+    normalized = set()
+    for tag in tags:
+        candidate = str(tag).strip().lower()
+        if not candidate:
+            continue
+        if not TAG_PATTERN.fullmatch(candidate):
+            if strict:
+                raise HTTPException(400, detail=f"invalid tag: {candidate}")
+            continue
+        normalized.add(candidate)
+    return sorted(normalized)
+
+
+def _normalize_probe(method: Any, ports: Any, strict: bool = True) -> Tuple[Optional[str], List[int]]:
+    # Per-target liveness probe; None/[] fall back to PROBE_METHOD/PROBE_PORTS.
+    normalized_method = str(method).strip().lower() if method else None
+    if normalized_method is not None and normalized_method not in PROBE_METHODS:
+        if strict:
+            raise HTTPException(400, detail=f"probe must be one of {', '.join(PROBE_METHODS)}")
+        normalized_method = None
+    if ports is None:
+        return normalized_method, []
+    if isinstance(ports, (str, int)):
+        ports = str(ports).split(",")
+    if not isinstance(ports, (list, tuple)):
+        if strict:
+            raise HTTPException(400, detail="probe_ports must be a list of ports")
+        return normalized_method, []
+    normalized_ports: List[int] = []
+    for port in ports:
+        candidate = str(port).strip()
+        if not candidate:
+            continue
+        if not candidate.isdigit() or not 0 < int(candidate) < 65536:
+            if strict:
+                raise HTTPException(400, detail=f"invalid port: {candidate}")
+            continue
+        if int(candidate) not in normalized_ports:
+            normalized_ports.append(int(candidate))
+    return normalized_method, normalized_ports
+
+
+def _apply_probe(target: Dict[str, Any], method: Optional[str], ports: List[int]) -> None:
+    if method:
+        target["probe"] = method
+    else:
+        target.pop("probe", None)
+    if ports:
+        target["probe_ports"] = ports
+    else:
+        target.pop("probe_ports", None)
+
+
 def _initial_targets_from_env() -> List[Dict[str, Any]]:
     label = env("PC_LABEL")
     ip = env("PC_IP")
@@ -88,13 +189,6 @@ def _initial_targets_from_env() -> List[Dict[str, Any]]:
         return []
 
 
-def _ensure_file() -> None:
-    TARGETS_FILE.parent.mkdir(parents=True, exist_ok=True)
-    if not TARGETS_FILE.exists():
-        state = {"targets": _initial_targets_from_env()}
-        TARGETS_FILE.write_text(json.dumps(state, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
-
-
 def _normalize_loaded_target(target: Dict[str, Any]) -> Optional[Dict[str, Any]]:
     if not isinstance(target, dict):
         return None
@@ -119,6 +213,12 @@ def _normalize_loaded_target(target: Dict[str, Any]) -> Optional[Dict[str, Any]]
         sanitized["mac"] = normalized_mac
     else:
         sanitized.pop("mac", None)
+    tags = _normalize_tags(target.get("tags"), strict=False)
+    if tags:
+        sanitized["tags"] = tags
+    else:
+        sanitized.pop("tags", None)
+    _apply_probe(sanitized, *_normalize_probe(target.get("probe"), target.get("probe_ports"), strict=False))
     ts = _now_ts()
     sanitized.setdefault("created_at", ts)
     sanitized.setdefault("updated_at", ts)
@@ -161,30 +261,75 @@ def _normalize_state(data: Any) -> Tuple[Dict[str, Any], bool]:
     return {"targets": ordered}, changed
 
 
+def _store_signature() -> Optional[Hashable]:
+    return get_target_store().signature()
+
+
+def _read_state(store: TargetStore) -> Tuple[Dict[str, Any], bool]:
+    if not store.exists():
+        state, _ = _normalize_state({"targets": _initial_targets_from_env()})
+        return state, True
+    raw = store.read()
+    if raw is None:
+        return {"targets": []}, True
+    return _normalize_state(raw)
+
+
+@timed("targets_load")
 def _load_state_locked() -> Dict[str, Any]:
-    _ensure_file()
-    text = TARGETS_FILE.read_text(encoding="utf-8")
-    if not text.strip():
-        state = {"targets": []}
-        _save_state_locked(state)
+    store = get_target_store()
+    # Taken before the read: if a write lands in between, the registry keeps
+    # the older signature and simply reloads on the next lookup.
+    signature = store.signature()
+    if _REGISTRY.is_current(signature):
+        return {"targets": list(_REGISTRY.targets)}
+    state, dirty = _read_state(store)
+    if not dirty:
+        _REGISTRY.replace(state["targets"], signature)
         return state
-    try:
-        raw = json.loads(text)
-    except Exception:
-        state = {"targets": []}
+    if _STORE_LOCKED:
         _save_state_locked(state)
         return state
-    state, changed = _normalize_state(raw)
-    if changed:
-        _save_state_locked(state)
-    return state
+    # Writing the normalized list back needs the cross-process lock; read
+    # again under it since another worker may have saved in the meantime.
+    with _store_locked():
+        return _load_state_locked()
+
+
+@timed("targets_save")
+def _save_state_locked(
+    state: Dict[str, Any],
+    upserted: Iterable[Dict[str, Any]] = (),
+    deleted: Iterable[str] = (),
+) -> None:
+    store = get_target_store()
+    store.write(state["targets"], upserted=upserted, deleted=deleted)
+    _REGISTRY.replace(state["targets"], store.signature())
+
+
+@contextmanager
+def _store_locked() -> Iterator[None]:
+    # Caller holds _TARGETS_LOCK, which also guards _STORE_LOCKED.
+    global _STORE_LOCKED
+    with get_target_store().lock():
+        _STORE_LOCKED = True
+        try:
+            yield
+        finally:
+            _STORE_LOCKED = False
 
 
-def _save_state_locked(state: Dict[str, Any]) -> None:
-    serialized = json.dumps(state, ensure_ascii=False, indent=2) + "\n"
-    temp_path = TARGETS_FILE.with_name(TARGETS_FILE.name + ".tmp")
-    Path(temp_path).write_text(serialized, encoding="utf-8")
-    Path(temp_path).replace(TARGETS_FILE)
+@contextmanager
+def _mutating() -> Iterator[None]:
+    # Read-modify-write of the target list; the store lock keeps other
+    # workers from interleaving their own save with ours.
+    with _TARGETS_LOCK, _store_locked():
+        yield
+
+
+def _lookup_locked(name: str) -> Optional[Dict[str, Any]]:
+    _load_state_locked()
+    return _REGISTRY.index.get(name)
 
 
 def _find_index(targets: List[Dict[str, Any]], name: str) -> int:
@@ -194,39 +339,71 @@ def _find_index(targets: List[Dict[str, Any]], name: str) -> int:
     return -1
 
 
-def _update_runtime(name: str, **fields: Any) -> None:
-    entry = _RUNTIME_STATE.setdefault(name, {})
-    entry.update(fields)
+def _update_runtime(name: str, **fields: Any) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    return get_runtime_store().update(name, fields, quiet=_QUIET_RUNTIME)
+
+
+def _public_runtime(runtime: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: value for key, value in runtime.items() if not key.startswith("_")}
+
+
+def _public_target(target: Dict[str, Any], runtime: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    info = {
+        "name": target.get("name"),
+        "ip": target.get("ip"),
+        "mac": target.get("mac"),
+        "tags": list(target.get("tags", ())),
+        "probe": target.get("probe"),
+        "probe_ports": list(target.get("probe_ports", ())),
+        "created_at": target.get("created_at"),
+        "updated_at": target.get("updated_at"),
+    }
+    if runtime is None:
+        runtime = get_runtime_store().get(target["name"])
+    if runtime:
+        info.update(_public_runtime(runtime))
+    info["has_mac"] = bool(target.get("mac"))
+    return info
 
 
 def list_targets() -> List[Dict[str, Any]]:
     with _TARGETS_LOCK:
         state = _load_state_locked()
-        results = []
-        for target in state["targets"]:
-            info = {
-                "name": target.get("name"),
-                "ip": target.get("ip"),
-                "mac": target.get("mac"),
-                "created_at": target.get("created_at"),
-                "updated_at": target.get("updated_at"),
-            }
-            runtime = _RUNTIME_STATE.get(target["name"])
-            if runtime:
-                info.update(runtime)
-            info["has_mac"] = bool(target.get("mac"))
-            results.append(info)
-        return results
+    runtime = get_runtime_store().snapshot()
+    return [_public_target(target, runtime.get(target["name"], {})) for target in state["targets"]]
+
+
+def targets_generation() -> Tuple[Optional[Hashable], int]:
+    # Built only from state every worker shares: the store's signature and
+    # the runtime generation, which moves on visible changes such as the
+    # online flag or a wake, but not on every probe timestamp.
+    with _TARGETS_LOCK:
+        _load_state_locked()
+        signature = _REGISTRY.signature
+    return signature, get_runtime_store().generation()
 
 
 def get_target(name: str) -> Optional[Dict[str, Any]]:
     normalized = _normalize_name(name)
     with _TARGETS_LOCK:
-        state = _load_state_locked()
-        for target in state["targets"]:
-            if target.get("name") == normalized:
-                return dict(target)
-    return None
+        target = _lookup_locked(normalized)
+        return dict(target) if target is not None else None
+
+
+def list_groups() -> Dict[str, List[str]]:
+    with _TARGETS_LOCK:
+        _load_state_locked()
+        return {tag: list(names) for tag, names in sorted(_REGISTRY.groups.items())}
+
+
+def get_group_members(tag: str) -> List[str]:
+    normalized = str(tag).strip().lower()
+    with _TARGETS_LOCK:
+        _load_state_locked()
+        members = _REGISTRY.groups.get(normalized)
+    if not members:
+        raise HTTPException(404, detail="unknown group")
+    return list(members)
 
 
 def get_target_or_404(name: str) -> Dict[str, Any]:
@@ -240,10 +417,12 @@ def create_target(payload: Dict[str, Any]) -> Dict[str, Any]:
     name = _normalize_name(str(payload.get("name", "")))
     ip = _validate_ip(str(payload.get("ip", "")))
     mac = _normalize_mac(payload.get("mac"))
+    tags = _normalize_tags(payload.get("tags"))
+    probe, probe_ports = _normalize_probe(payload.get("probe"), payload.get("probe_ports"))
     ts = _now_ts()
-    with _TARGETS_LOCK:
+    with _mutating():
         state = _load_state_locked()
-        if any(item.get("name") == name for item in state["targets"]):
+        if name in _REGISTRY.index:
             raise HTTPException(409, detail="duplicate target name")
         new_target: Dict[str, Any] = {
             "name": name,
@@ -253,20 +432,216 @@ def create_target(payload: Dict[str, Any]) -> Dict[str, Any]:
         }
         if mac:
             new_target["mac"] = mac
+        if tags:
+            new_target["tags"] = tags
+        _apply_probe(new_target, probe, probe_ports)
         state["targets"].append(new_target)
         state["targets"] = list(sorted(state["targets"], key=lambda t: t["name"]))
-        _save_state_locked(state)
+        _save_state_locked(state, upserted=[new_target])
     log_event({"evt": "target-create", "target": name, "ip": ip, "mac": mac})
+    publish("target-create", target=name, data=_public_target(new_target))
     return new_target
 
 
+def suggest_name(ip: str) -> str:
+    return "host-" + ip.replace(".", "-")
+
+
+def import_targets(items: List[Dict[str, Any]]) -> Dict[str, Any]:
+    # Bulk create: one load, one save and one log line for the whole batch.
+    # Invalid or duplicate entries are reported back instead of failing it.
+    prepared: List[Dict[str, Any]] = []
+    skipped: List[Dict[str, Any]] = []
+    for item in items:
+        try:
+            ip = _validate_ip(str(item.get("ip", "")))
+            name = _normalize_name(str(item.get("name") or suggest_name(ip)))
+            mac = _normalize_mac(item.get("mac"))
+            tags = _normalize_tags(item.get("tags"))
+            probe, probe_ports = _normalize_probe(item.get("probe"), item.get("probe_ports"))
+        except HTTPException as exc:
+            skipped.append({"ip": item.get("ip"), "name": item.get("name"), "error": exc.detail})
+            continue
+        target: Dict[str, Any] = {"name": name, "ip": ip}
+        if mac:
+            target["mac"] = mac
+        if tags:
+            target["tags"] = tags
+        _apply_probe(target, probe, probe_ports)
+        prepared.append(target)
+
+    created: List[Dict[str, Any]] = []
+    ts = _now_ts()
+    with _mutating():
+        state = _load_state_locked()
+        names = set(_REGISTRY.index)
+        ips = {target["ip"] for target in state["targets"]}
+        for target in prepared:
+            if target["name"] in names:
+                skipped.append({"ip": target["ip"], "name": target["name"], "error": "duplicate target name"})
+                continue
+            if target["ip"] in ips:
+                skipped.append({"ip": target["ip"], "name": target["name"], "error": "duplicate ip"})
+                continue
+            target["created_at"] = target["updated_at"] = ts
+            names.add(target["name"])
+            ips.add(target["ip"])
+            created.append(target)
+        if created:
+            state["targets"] = list(sorted(state["targets"] + created, key=lambda t: t["name"]))
+            _save_state_locked(state, upserted=created)
+    if created:
+        log_event({"evt": "target-import", "targets": [target["name"] for target in created]})
+        for target in created:
+            publish("target-create", target=target["name"], data=_public_target(target, {}))
+    return {"created": created, "skipped": skipped}
+
+
+def _normalize_bulk_item(item: Dict[str, Any]) -> Dict[str, Any]:
+    # Only the fields present in ``item`` are returned; "" or [] clears one.
+    fields: Dict[str, Any] = {"name": _normalize_name(str(item.get("name") or ""))}
+    if item.get("ip") is not None:
+        fields["ip"] = _validate_ip(str(item["ip"]))
+    if "mac" in item:
+        fields["mac"] = _normalize_mac(item["mac"])
+    if "tags" in item:
+        fields["tags"] = _normalize_tags(item["tags"])
+    if "probe" in item or "probe_ports" in item:
+        probe, probe_ports = _normalize_probe(item.get("probe"), item.get("probe_ports"))
+        if "probe" in item:
+            fields["probe"] = probe
+        if "probe_ports" in item:
+            fields["probe_ports"] = probe_ports
+    return fields
+
+
+def _merge_fields(target: Dict[str, Any], fields: Dict[str, Any]) -> None:
+    for key, value in fields.items():
+        if value or key in ("name", "ip"):
+            target[key] = value
+        else:
+            target.pop(key, None)
+
+
+def bulk_apply(upserts: List[Dict[str, Any]], deletes: List[str]) -> Dict[str, Any]:
+    # Validates every row, then applies the whole batch with a single save.
+    # Any invalid row rejects the batch (400) with the per-row report.
+    results: List[Dict[str, Any]] = []
+    normalized: List[Optional[Dict[str, Any]]] = []
+    seen: Set[str] = set()
+    failed = False
+    for index, item in enumerate(upserts):
+        try:
+            fields = _normalize_bulk_item(item)
+            if fields["name"] in seen:
+                raise HTTPException(400, detail="duplicate name in batch")
+        except HTTPException as exc:
+            failed = True
+            normalized.append(None)
+            results.append(
+                {"row": index, "op": "upsert", "name": item.get("name"), "status": "error", "error": exc.detail}
+            )
+            continue
+        seen.add(fields["name"])
+        normalized.append(fields)
+        results.append({"row": index, "op": "upsert", "name": fields["name"]})
+    delete_names: List[str] = []
+    for index, name in enumerate(deletes, start=len(upserts)):
+        try:
+            candidate = _normalize_name(str(name))
+            if candidate in seen:
+                raise HTTPException(400, detail="name is both upserted and deleted")
+        except HTTPException as exc:
+            failed = True
+            results.append({"row": index, "op": "delete", "name": name, "status": "error", "error": exc.detail})
+            continue
+        seen.add(candidate)
+        delete_names.append(candidate)
+        results.append({"row": index, "op": "delete", "name": candidate})
+
+    ts = _now_ts()
+    with _mutating():
+        state = _load_state_locked()
+        by_name = {target["name"]: dict(target) for target in state["targets"]}
+        changed: List[Dict[str, Any]] = []
+        removed: List[str] = []
+        for result, fields in zip(results, normalized):
+            if fields is None:
+                continue
+            current = by_name.get(fields["name"])
+            if current is None:
+                if "ip" not in fields:
+                    failed = True
+                    result.update(status="error", error="ip is required for new targets")
+                    continue
+                current = {"created_at": ts}
+                _merge_fields(current, fields)
+                result["status"] = "created"
+            else:
+                before = dict(current)
+                _merge_fields(current, fields)
+                if current == before:
+                    result["status"] = "unchanged"
+                    continue
+                result["status"] = "updated"
+            current["updated_at"] = ts
+            by_name[current["name"]] = current
+            changed.append(current)
+        for result in results[len(upserts):]:
+            if result.get("status") == "error":
+                continue
+            if by_name.pop(result["name"], None) is None:
+                result["status"] = "missing"
+                continue
+            result["status"] = "deleted"
+            removed.append(result["name"])
+        if failed:
+            for result in results:
+                if result.get("status") != "error":
+                    result["status"] = "rejected"
+            raise HTTPException(400, detail={"error": "batch rejected", "results": results})
+        if changed or removed:
+            state["targets"] = sorted(by_name.values(), key=lambda t: t["name"])
+            _save_state_locked(state, upserted=changed, deleted=removed)
+            runtime = get_runtime_store()
+            for name in removed:
+                runtime.delete(name)
+                _MAC_VERIFIED.pop(name, None)
+
+    counts: Dict[str, int] = {}
+    for result in results:
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+    if changed or removed:
+        log_event({"evt": "target-bulk", **counts})
+        statuses = {result["name"]: result["status"] for result in results[: len(upserts)]}
+        for target in changed:
+            event = "target-create" if statuses.get(target["name"]) == "created" else "target-update"
+            publish(event, target=target["name"], data=_public_target(target))
+        for name in removed:
+            publish("target-delete", target=name)
+    return {"counts": counts, "results": results}
+
+
+def export_targets() -> List[Dict[str, Any]]:
+    # Public fields only, in the shape /api/targets/bulk accepts back.
+    with _TARGETS_LOCK:
+        state = _load_state_locked()
+    return [
+        {field: target[field] for field in EXPORT_FIELDS if target.get(field) is not None}
+        for target in state["targets"]
+    ]
+
+
 def update_target(original_name: str, payload: Dict[str, Any]) -> Dict[str, Any]:
     normalized_original = _normalize_name(original_name)
     new_name = payload.get("name")
     ip = payload.get("ip")
     mac = payload.get("mac") if "mac" in payload else None
+    tags = _normalize_tags(payload["tags"]) if payload.get("tags") is not None else None
+    probe_given = "probe" in payload or "probe_ports" in payload
+    probe, probe_ports = _normalize_probe(payload.get("probe"), payload.get("probe_ports"))
 
-    with _TARGETS_LOCK:
+    with _mutating():
         state = _load_state_locked()
         index = _find_index(state["targets"], normalized_original)
         if index == -1:
@@ -275,9 +650,7 @@ def update_target(original_name: str, payload: Dict[str, Any]) -> Dict[str, Any]
 
         if new_name is not None:
             normalized_new = _normalize_name(str(new_name))
-            if normalized_new != normalized_original and any(
-                item.get("name") == normalized_new for item in state["targets"]
-            ):
+            if normalized_new != normalized_original and normalized_new in _REGISTRY.index:
                 raise HTTPException(409, detail="duplicate target name")
             target["name"] = normalized_new
         else:
@@ -293,82 +666,187 @@ def update_target(original_name: str, payload: Dict[str, Any]) -> Dict[str, Any]
             else:
                 target.pop("mac", None)
 
+        if tags is not None:
+            if tags:
+                target["tags"] = tags
+            else:
+                target.pop("tags", None)
+
+        if probe_given:
+            if "probe" not in payload:
+                probe = target.get("probe")
+            if "probe_ports" not in payload:
+                probe_ports = list(target.get("probe_ports", ()))
+            _apply_probe(target, probe, probe_ports)
+
         target["updated_at"] = _now_ts()
 
         state["targets"][index] = target
         state["targets"] = list(sorted(state["targets"], key=lambda t: t["name"]))
-        _save_state_locked(state)
+        renamed = [normalized_original] if normalized_original != normalized_new else []
+        _save_state_locked(state, upserted=[target], deleted=renamed)
 
         if normalized_original != normalized_new:
-            if normalized_original in _RUNTIME_STATE:
-                _RUNTIME_STATE[normalized_new] = _RUNTIME_STATE.pop(normalized_original)
+            get_runtime_store().rename(normalized_original, normalized_new)
+            if normalized_original in _MAC_VERIFIED:
+                _MAC_VERIFIED[normalized_new] = _MAC_VERIFIED.pop(normalized_original)
     log_event({"evt": "target-update", "target": normalized_original, "updated": target.get("name")})
+    publish("target-update", target=normalized_original, data=_public_target(target))
     return target
 
 
 def delete_target(name: str) -> None:
     normalized = _normalize_name(name)
-    with _TARGETS_LOCK:
+    with _mutating():
         state = _load_state_locked()
         index = _find_index(state["targets"], normalized)
         if index == -1:
             raise HTTPException(404, detail="unknown target")
         removed = state["targets"].pop(index)
-        _save_state_locked(state)
-        _RUNTIME_STATE.pop(normalized, None)
+        _save_state_locked(state, deleted=[normalized])
+        get_runtime_store().delete(normalized)
+        _MAC_VERIFIED.pop(normalized, None)
     log_event({"evt": "target-delete", "target": normalized, "ip": removed.get("ip")})
+    publish("target-delete", target=normalized)
 
 
 def set_target_mac(name: str, mac: str) -> Dict[str, Any]:
     normalized_mac = _normalize_mac(mac)
     normalized_name = _normalize_name(name)
-    with _TARGETS_LOCK:
+    with _mutating():
+        current = _lookup_locked(normalized_name)
+        if current is None:
+            raise HTTPException(404, detail="unknown target")
+        if current.get("mac") == normalized_mac:
+            return dict(current)
         state = _load_state_locked()
         index = _find_index(state["targets"], normalized_name)
-        if index == -1:
-            raise HTTPException(404, detail="unknown target")
         target = dict(state["targets"][index])
-        if target.get("mac") == normalized_mac:
-            return target
         target["mac"] = normalized_mac
         target["updated_at"] = _now_ts()
         state["targets"][index] = target
-        _save_state_locked(state)
+        _save_state_locked(state, upserted=[target])
     log_event({"evt": "target-mac-set", "target": normalized_name, "mac": normalized_mac})
+    publish("target-update", target=normalized_name, data=_public_target(target))
     return target
 
 
+@timed("mac_discovery")
 def discover_mac_for_ip(ip: str) -> Optional[str]:
-    system = platform.system().lower()
-    commands: List[List[str]] = []
-    if "windows" in system:
-        commands.append(["arp", "-a", ip])
-    else:
-        commands.append(["ip", "neigh", "show", ip])
-        commands.append(["arp", "-n", ip])
-    for cmd in commands:
-        try:
-            result = subprocess.run(cmd, capture_output=True, text=True, check=False, timeout=3)
-        except Exception:
-            continue
-        output = f"{result.stdout}\n{result.stderr}".replace("-", ":").strip()
-        match = MAC_PATTERN.search(output)
-        if match:
-            return match.group(0).upper()
-    return None
-
-
-def record_status(name: str, online: bool, ip: Optional[str] = None) -> None:
-    _update_runtime(name, last_status_at=_now_ts(), online=online)
+    return lookup_mac(ip)
+
+
+def record_status(
+    name: str,
+    online: bool,
+    ip: Optional[str] = None,
+    rtt_ms: Optional[float] = None,
+    method: Optional[str] = None,
+) -> Dict[str, Any]:
+    PROBES.inc(name, "success" if online else "failure")
+    previous, runtime = _update_runtime(
+        name,
+        last_status_at=_now_ts(),
+        online=online,
+        rtt_ms=rtt_ms,
+        probe_method=method,
+        _checked=time.time(),
+    )
+    if previous.get("online") != online:
+        publish(
+            "status",
+            target=name,
+            online=online,
+            rtt_ms=rtt_ms,
+            probe_method=method,
+            last_status_at=runtime["last_status_at"],
+        )
     if online and ip:
         try:
-            mac = discover_mac_for_ip(ip)
-            if mac:
-                set_target_mac(name, mac)
+            _learn_mac(name, ip)
         except HTTPException:
             pass
+    return _public_runtime(runtime)
+
+
+def _learn_mac(name: str, ip: str) -> None:
+    # Reads the in-memory registry without the lock; only a changed MAC
+    # goes through set_target_mac and touches targets.json.
+    current = _REGISTRY.index.get(name)
+    if current is None:
+        current = get_target(name)
+        if current is None:
+            return
+    stored = current.get("mac")
+    verified = _MAC_VERIFIED.get(name)
+    interval = get_settings().mac_verify_interval
+    if stored and verified is not None and time.monotonic() - verified < interval:
+        return
+    mac = discover_mac_for_ip(ip)
+    if not mac:
+        return
+    _MAC_VERIFIED[name] = time.monotonic()
+    _update_runtime(name, mac_verified_at=_now_ts())
+    if mac != stored:
+        set_target_mac(name, mac)
+
+
+def get_runtime(name: str) -> Dict[str, Any]:
+    return _public_runtime(get_runtime_store().get(name))
+
+
+def runtime_snapshot() -> Dict[str, Dict[str, Any]]:
+    return {name: _public_runtime(entry) for name, entry in get_runtime_store().snapshot().items()}
+
+
+def status_timing(name: str) -> Tuple[Optional[float], Optional[float]]:
+    # Seconds since the last check and the monitor's current probe interval
+    # for the target. Wall clock rather than monotonic: the timestamp may
+    # come from another worker.
+    runtime = get_runtime_store().get(name)
+    checked = runtime.get("_checked")
+    age = None if checked is None else max(time.time() - checked, 0.0)
+    return age, runtime.get("_probe_interval")
+
+
+def record_probe_interval(name: str, interval: float) -> None:
+    # Internal key, so the runtime generation (ETags, SSE) does not move.
+    _update_runtime(name, _probe_interval=interval)
+
+
+def expect_transition(name: str) -> None:
+    # The monitor probes this target every STATUS_FAST_INTERVAL for a while.
+    window = get_settings().status_fast_window
+    _update_runtime(_normalize_name(name), _fast_until=time.time() + window)
+
+
+def list_probe_targets() -> List[Dict[str, Any]]:
+    # Just what the monitor's scheduler needs, without building public dicts.
+    with _TARGETS_LOCK:
+        state = _load_state_locked()
+    runtime = get_runtime_store().snapshot()
+    return [
+        {
+            "name": target["name"],
+            "ip": target.get("ip") or "",
+            "probe": target.get("probe"),
+            "probe_ports": target.get("probe_ports"),
+            "fast_until": runtime.get(target["name"], {}).get("_fast_until", 0.0),
+        }
+        for target in state["targets"]
+    ]
+
+
+def record_wake(name: str) -> Dict[str, Any]:
+    _, runtime = _update_runtime(
+        name, last_wake_at=_now_ts(), _fast_until=time.time() + get_settings().status_fast_window
+    )
+    publish("wake", target=name, last_wake_at=runtime["last_wake_at"])
+    return _public_runtime(runtime)
 
 
-def record_wake(name: str) -> None:
-    _update_runtime(name, last_wake_at=_now_ts())
+def record_wake_verification(name: str, **fields: Any) -> Dict[str, Any]:
+    _, runtime = _update_runtime(name, **fields)
+    publish("wake-verify", target=name, **fields)
+    return _public_runtime(runtime)
 
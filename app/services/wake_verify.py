@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+from ..core.settings import get_settings
+from .logs import log_event
+from .power import resend_wake, wake_target
+from .probes import probe_target
+from .singleflight import get_flight
+from .targets import _now_ts, get_target_or_404, record_status, record_wake_verification
+
+logger = logging.getLogger(__name__)
+
+INITIAL_DELAY = 1.0
+MAX_DELAY = 10.0
+
+_VERIFIERS: Dict[str, "asyncio.Task[None]"] = {}
+
+
+def is_verifying(name: str) -> bool:
+    task = _VERIFIERS.get(name)
+    return task is not None and not task.done()
+
+
+async def _verify(target: Dict[str, Any], woke_at: str, started: float) -> None:
+    name, ip = target["name"], target["ip"]
+    settings = get_settings()
+    deadline = started + settings.wake_verify_timeout
+    delay = INITIAL_DELAY
+    resent = False
+    # Recorded by the task itself so the runtime-store write stays off the
+    # loop and always lands before the outcome.
+    await run_in_threadpool(
+        record_wake_verification,
+        name,
+        woke_at=woke_at,
+        online_at=None,
+        time_to_online_ms=None,
+        wake_verify="pending",
+    )
+    while True:
+        rtt_ms, method = await probe_target(target)
+        now = time.monotonic()
+        if rtt_ms is not None:
+            elapsed_ms = round((now - started) * 1000.0, 1)
+            online_at = _now_ts()
+            await run_in_threadpool(record_status, name, True, ip, rtt_ms, method)
+            await run_in_threadpool(
+                record_wake_verification,
+                name,
+                woke_at=woke_at,
+                online_at=online_at,
+                time_to_online_ms=elapsed_ms,
+                wake_verify="online",
+            )
+            log_event({
+                "evt": "wake-online",
+                "target": name,
+                "woke_at": woke_at,
+                "online_at": online_at,
+                "time_to_online_ms": elapsed_ms,
+                "resent": resent,
+            })
+            return
+        if now >= deadline:
+            await run_in_threadpool(
+                record_wake_verification,
+                name,
+                woke_at=woke_at,
+                online_at=None,
+                time_to_online_ms=None,
+                wake_verify="timeout",
+            )
+            log_event({
+                "evt": "wake-timeout",
+                "target": name,
+                "woke_at": woke_at,
+                "timeout": settings.wake_verify_timeout,
+                "resent": resent,
+            })
+            return
+        if not resent and settings.wake_verify_resend > 0 and now - started >= settings.wake_verify_resend:
+            resent = True
+            try:
+                await run_in_threadpool(resend_wake, name)
+            except Exception:
+                logger.exception("wake re-send failed for %s", name)
+        await asyncio.sleep(min(delay, max(deadline - now, 0.0)))
+        delay = min(delay * 2, MAX_DELAY)
+
+
+def start_wake_verification(
+    name: str, ip: str, woke_at: str, probe: Optional[Dict[str, Any]] = None
+) -> bool:
+    # ``probe`` carries the target's probe/probe_ports settings, if any.
+    if is_verifying(name):
+        return False
+    target = {**(probe or {}), "name": name, "ip": ip}
+    task = asyncio.get_running_loop().create_task(_verify(target, woke_at, time.monotonic()))
+    _VERIFIERS[name] = task
+
+    def _forget(done: "asyncio.Task[None]") -> None:
+        if _VERIFIERS.get(name) is done:
+            del _VERIFIERS[name]
+
+    task.add_done_callback(_forget)
+    return True
+
+
+async def wake_with_verification(name: str, verify: Optional[bool] = None) -> Dict[str, Any]:
+    # The packet is sent on the request path; confirming that the host came
+    # up runs as a background task. Repeated clicks while a verification is
+    # still pending do not send another packet, and neither do clicks within
+    # COALESCE_WINDOW of the last wake: they get that wake's result.
+    settings = get_settings()
+    enabled = settings.wake_verify if verify is None else verify
+    target = get_target_or_404(name)
+    name = target["name"]
+    if enabled and is_verifying(name):
+        return {"ok": True, "sent": None, "target": name, "verifying": True}
+
+    async def _wake() -> Dict[str, Any]:
+        # MAC discovery, a target write and WOL_SPACING sleeps: keep them off the loop.
+        result = await run_in_threadpool(wake_target, name)
+        if enabled and target.get("ip"):
+            start_wake_verification(name, target["ip"], result["woke_at"], target)
+            result["verifying"] = True
+        return result
+
+    result, shared = await get_flight().do(("wake", name), _wake, linger=settings.coalesce_window)
+    return {**result, "coalesced": True} if shared else result
+
+
+async def cancel_wake_verifications() -> None:
+    tasks = list(_VERIFIERS.values())
+    for task in tasks:
+        task.cancel()
+    if tasks:
+        await asyncio.gather(*tasks, return_exceptions=True)
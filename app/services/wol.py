@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import socket
+import struct
+import subprocess
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from ..core.metrics import SUBPROCESS_SPAWNS
+
+ETH_P_WOL = 0x0842
+BROADCAST_MAC = b"\xff" * 6
+
+
+@lru_cache(maxsize=4096)
+def build_payload(mac: str) -> bytes:
+    mac_bytes = bytes.fromhex(mac.replace(":", "").replace("-", ""))
+    if len(mac_bytes) != 6:
+        raise ValueError(f"invalid mac address: {mac}")
+    return b"\xff" * 6 + mac_bytes * 16
+
+
+class MagicPacketSender:
+    # Keeps one broadcast UDP socket per broadcast address and one AF_PACKET
+    # socket per interface open for the life of the process, so waking many
+    # hosts is a single send loop instead of a socket lifecycle per packet.
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._udp: Dict[str, socket.socket] = {}
+        self._raw: Dict[str, Tuple[socket.socket, bytes]] = {}
+
+    def _udp_socket(self, broadcast: str) -> socket.socket:
+        sock = self._udp.get(broadcast)
+        if sock is None:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+            self._udp[broadcast] = sock
+        return sock
+
+    def _raw_socket(self, iface: str) -> Tuple[socket.socket, bytes]:
+        entry = self._raw.get(iface)
+        if entry is None:
+            sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_WOL))
+            try:
+                sock.bind((iface, ETH_P_WOL))
+                source = sock.getsockname()[4][:6]
+            except OSError:
+                sock.close()
+                raise
+            # Ethernet header is the same for every frame on this interface.
+            header = BROADCAST_MAC + source + struct.pack("!H", ETH_P_WOL)
+            entry = self._raw[iface] = (sock, header)
+        return entry
+
+    def _drop_udp(self, broadcast: str) -> None:
+        sock = self._udp.pop(broadcast, None)
+        if sock is not None:
+            sock.close()
+
+    def _drop_raw(self, iface: str) -> None:
+        entry = self._raw.pop(iface, None)
+        if entry is not None:
+            entry[0].close()
+
+    def send_udp(
+        self,
+        macs: Sequence[str],
+        broadcast: str,
+        ports: Iterable[int] = (9,),
+        repeats: int = 1,
+        spacing: float = 0.0,
+    ) -> int:
+        payloads = [build_payload(mac) for mac in macs]
+        destinations = [(broadcast, port) for port in ports]
+        sent = 0
+        for round_index in range(max(repeats, 1)):
+            if round_index and spacing:
+                # Outside the lock, so other wakes go out between our rounds.
+                time.sleep(spacing)
+            sent += self._udp_round(payloads, broadcast, destinations)
+        return sent
+
+    def _udp_round(self, payloads: List[bytes], broadcast: str, destinations: List[Tuple[str, int]]) -> int:
+        # Python has no sendmmsg binding; one round is a tight sendto loop
+        # over the reused socket with no sleeps or syscalls in between.
+        with self._lock:
+            for attempt in range(2):
+                sent = 0
+                try:
+                    sock = self._udp_socket(broadcast)
+                    for payload in payloads:
+                        for destination in destinations:
+                            sock.sendto(payload, destination)
+                            sent += 1
+                    return sent
+                except OSError:
+                    # A stale socket (interface went away, address changed)
+                    # is rebuilt once before giving up.
+                    self._drop_udp(broadcast)
+                    if attempt:
+                        raise
+        return 0
+
+    def send_raw(
+        self,
+        macs: Sequence[str],
+        iface: str,
+        repeats: int = 1,
+        spacing: float = 0.0,
+    ) -> int:
+        payloads = [build_payload(mac) for mac in macs]
+        sent = 0
+        for round_index in range(max(repeats, 1)):
+            if round_index and spacing:
+                time.sleep(spacing)
+            sent += self._raw_round(payloads, iface)
+        return sent
+
+    def _raw_round(self, payloads: List[bytes], iface: str) -> int:
+        with self._lock:
+            for attempt in range(2):
+                sent = 0
+                try:
+                    sock, header = self._raw_socket(iface)
+                    for payload in payloads:
+                        sock.send(header + payload)
+                        sent += 1
+                    return sent
+                except PermissionError:
+                    raise
+                except OSError:
+                    self._drop_raw(iface)
+                    if attempt:
+                        raise
+        return 0
+
+    def close(self) -> None:
+        with self._lock:
+            for broadcast in list(self._udp):
+                self._drop_udp(broadcast)
+            for iface in list(self._raw):
+                self._drop_raw(iface)
+
+
+def etherwake(macs: Sequence[str], iface: str) -> None:
+    for mac in macs:
+        SUBPROCESS_SPAWNS.inc("etherwake")
+        rc = subprocess.call(["/usr/sbin/etherwake", "-i", iface, mac])
+        if rc != 0:
+            raise OSError(f"etherwake exited with {rc}")
+
+
+_SENDER = MagicPacketSender()
+
+
+def get_sender() -> MagicPacketSender:
+    return _SENDER
+
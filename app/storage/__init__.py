@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+from functools import lru_cache
+
+from ..core.settings import get_settings
+from .base import EventStore, LogQuery, LogRecord, RuntimeStore, TargetStore, decode_cursor, encode_cursor, parse_ts
+from .files import FileEventStore, FileTargetStore
+from .memory import MemoryRuntimeStore
+from .sqlite import SqliteDatabase, SqliteEventStore, SqliteRuntimeStore, SqliteTargetStore
+
+__all__ = [
+    "EventStore",
+    "FileEventStore",
+    "FileTargetStore",
+    "LogQuery",
+    "LogRecord",
+    "MemoryRuntimeStore",
+    "RuntimeStore",
+    "SqliteDatabase",
+    "SqliteEventStore",
+    "SqliteRuntimeStore",
+    "SqliteTargetStore",
+    "TargetStore",
+    "decode_cursor",
+    "encode_cursor",
+    "get_event_store",
+    "get_runtime_store",
+    "get_target_store",
+    "parse_ts",
+]
+
+
+@lru_cache()
+def _sqlite_database() -> SqliteDatabase:
+    return SqliteDatabase(get_settings().sqlite_path)
+
+
+@lru_cache()
+def get_target_store() -> TargetStore:
+    settings = get_settings()
+    if settings.storage_backend == "sqlite":
+        return SqliteTargetStore(_sqlite_database())
+    return FileTargetStore(settings.targets_path)
+
+
+@lru_cache()
+def get_event_store() -> EventStore:
+    settings = get_settings()
+    if settings.storage_backend == "sqlite":
+        return SqliteEventStore(_sqlite_database())
+    return FileEventStore(settings.log_path)
+
+
+@lru_cache()
+def get_runtime_store() -> RuntimeStore:
+    # "sqlite" shares status and wake state between uvicorn workers.
+    if get_settings().runtime_backend == "sqlite":
+        return SqliteRuntimeStore(_sqlite_database())
+    return MemoryRuntimeStore()
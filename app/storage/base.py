@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import base64
+import binascii
+import json
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from typing import Any, Collection, ContextManager, Dict, Hashable, Iterable, List, NamedTuple, Optional, Tuple
+
+
+class LogRecord(NamedTuple):
+    ts: datetime
+    line: str
+    evt: Optional[str]
+    target: Optional[str]
+
+
+class LogQuery(NamedTuple):
+    limit: int
+    target: Optional[str] = None
+    evt: Optional[str] = None
+    since: Optional[datetime] = None
+    until: Optional[datetime] = None
+    cursor: Optional[Dict[str, Any]] = None
+
+
+def parse_ts(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    for fmt in ("%Y-%m-%dT%H:%M:%S%z", "%Y-%m-%dT%H:%M:%S.%f%z"):
+        try:
+            parsed = datetime.strptime(value, fmt)
+            return parsed.astimezone(timezone.utc)
+        except ValueError:
+            continue
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+
+def encode_cursor(data: Dict[str, Any]) -> str:
+    raw = json.dumps(data, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def visible_change(
+    previous: Dict[str, Any], fields: Dict[str, Any], quiet: Collection[str]
+) -> bool:
+    return any(
+        not key.startswith("_") and key not in quiet and previous.get(key) != value
+        for key, value in fields.items()
+    )
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, ValueError) as exc:
+        raise ValueError("invalid cursor") from exc
+    if not isinstance(data, dict):
+        raise ValueError("invalid cursor")
+    return data
+
+
+class TargetStore(ABC):
+    @abstractmethod
+    def exists(self) -> bool:
+        ...
+
+    @abstractmethod
+    def signature(self) -> Optional[Hashable]:
+        # Changes whenever the stored targets may have changed, including
+        # edits made outside this process.
+        ...
+
+    @abstractmethod
+    def read(self) -> Any:
+        # Raw stored data, or None when the store is empty or unreadable.
+        ...
+
+    @abstractmethod
+    def write(
+        self,
+        targets: List[Dict[str, Any]],
+        upserted: Iterable[Dict[str, Any]] = (),
+        deleted: Iterable[str] = (),
+    ) -> None:
+        # ``targets`` is the full new state; stores that can apply changes
+        # incrementally use ``upserted``/``deleted`` when either is given.
+        ...
+
+    @abstractmethod
+    def lock(self) -> ContextManager[Any]:
+        # Cross-process lock held around read-modify-write of the targets.
+        ...
+
+
+class RuntimeStore(ABC):
+    # Volatile per-target state (online, rtt, last wake, ...). Keys starting
+    # with "_" are internal bookkeeping and never exposed by the API.
+    @abstractmethod
+    def get(self, name: str) -> Dict[str, Any]:
+        ...
+
+    @abstractmethod
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def update(
+        self, name: str, fields: Dict[str, Any], quiet: Collection[str] = ()
+    ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        # Merges ``fields`` and returns (previous, current) copies. The
+        # generation moves only if a public key outside ``quiet`` changed.
+        ...
+
+    @abstractmethod
+    def delete(self, name: str) -> None:
+        ...
+
+    @abstractmethod
+    def rename(self, old: str, new: str) -> None:
+        ...
+
+    @abstractmethod
+    def generation(self) -> int:
+        # Increases with every visible change; shared by all users of the store.
+        ...
+
+    def relay(self, origin: str, events: List[Dict[str, Any]], after: Optional[int]) -> Tuple[List[Dict[str, Any]], int]:
+        # Shares published events between workers: stores ``events`` from
+        # ``origin`` and returns the ones other origins stored after ``after``
+        # (None: start from the current end). Process-local stores have no peers.
+        return [], 0
+
+
+class EventStore(ABC):
+    def prepare(self) -> None:
+        pass
+
+    @abstractmethod
+    def append(self, records: List[LogRecord], fsync: bool = False) -> None:
+        ...
+
+    @abstractmethod
+    def query(self, query: LogQuery) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        ...
+
+    @abstractmethod
+    def prune(self, cutoff: Optional[datetime]) -> None:
+        # Drops events older than ``cutoff`` (None: housekeeping only).
+        ...
+
+    def generation(self) -> Optional[Hashable]:
+        # Changes whenever appended or pruned; None disables conditional GETs.
+        return None
+
+    def size_bytes(self) -> Optional[int]:
+        return None
+
+    @abstractmethod
+    def iter_all(self) -> Iterable[LogRecord]:
+        # Every stored event, oldest first (used for migrations).
+        ...
@@ -0,0 +1,427 @@
+from __future__ import annotations
+
+import gzip
+import json
+import os
+import re
+import shutil
+import threading
+from collections import deque
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from ..core.locks import FileLock
+from .base import EventStore, LogQuery, LogRecord, TargetStore, parse_ts
+
+Segment = Tuple[date, Path]
+
+READ_BLOCK_SIZE = 64 * 1024
+
+
+def _fsync_dir(path: Path) -> None:
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class FileTargetStore(TargetStore):
+    # The whole target list as one JSON document, replaced atomically.
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._lock = FileLock(path.with_name(path.name + ".lock"))
+
+    def lock(self) -> FileLock:
+        return self._lock
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def signature(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            stat = self.path.stat()
+        except OSError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def read(self) -> Any:
+        try:
+            text = self.path.read_text(encoding="utf-8")
+        except FileNotFoundError:
+            return None
+        if not text.strip():
+            return None
+        try:
+            return json.loads(text)
+        except Exception:
+            return None
+
+    def write(
+        self,
+        targets: List[Dict[str, Any]],
+        upserted: Iterable[Dict[str, Any]] = (),
+        deleted: Iterable[str] = (),
+    ) -> None:
+        serialized = json.dumps({"targets": targets}, ensure_ascii=False, indent=2) + "\n"
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Unique per process so concurrent workers never share a temp file.
+        temp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        # One durable write per save: data is fsynced before the rename and
+        # the directory entry after it, so a crash leaves old or new, never half.
+        with temp_path.open("w", encoding="utf-8") as stream:
+            stream.write(serialized)
+            stream.flush()
+            os.fsync(stream.fileno())
+        temp_path.replace(self.path)
+        _fsync_dir(self.path.parent)
+
+
+def _reverse_lines(stream: BinaryIO, end: Optional[int] = None) -> Iterator[Tuple[int, bytes]]:
+    # Yields (offset, line) pairs from the end of the stream towards the start.
+    position = stream.seek(0, os.SEEK_END) if end is None else end
+    remainder = b""
+    while position > 0:
+        size = min(READ_BLOCK_SIZE, position)
+        position -= size
+        stream.seek(position)
+        chunk = stream.read(size) + remainder
+        lines = chunk.split(b"\n")
+        remainder = lines.pop(0)
+        offset = position + len(remainder) + 1
+        starts = []
+        for line in lines:
+            starts.append(offset)
+            offset += len(line) + 1
+        for start, line in zip(reversed(starts), reversed(lines)):
+            if line.strip():
+                yield start, line
+    if remainder.strip():
+        yield 0, remainder
+
+
+def _tail_lines(
+    stream: BinaryIO, end: Optional[int], keep: int, accept: Callable[[bytes], bool]
+) -> List[Tuple[int, bytes]]:
+    # Gzip streams cannot seek backwards cheaply, so they are read forward
+    # once, keeping only the newest ``keep`` accepted lines (newest first).
+    kept: Deque[Tuple[int, bytes]] = deque(maxlen=keep)
+    offset = 0
+    for raw_line in stream:
+        start = offset
+        offset += len(raw_line)
+        if end is not None and start >= end:
+            break
+        line = raw_line.rstrip(b"\n")
+        if line.strip() and accept(line):
+            kept.append((start, line))
+    return list(reversed(kept))
+
+
+def _normalize_entry(data: Dict[str, Any], ts: Optional[datetime]) -> Dict[str, Any]:
+    if ts is not None:
+        data["ts"] = ts.astimezone().isoformat(timespec="seconds")
+    return data
+
+
+class FileEventStore(EventStore):
+    # Append-only JSONL split into one segment per local day next to
+    # ``log_path``; closed days are gzipped and retention drops whole files.
+    def __init__(self, log_path: Path) -> None:
+        self.log_path = log_path
+        self._legacy_checked = False
+        # Workers append to the same segments; compression runs in one of them.
+        self._write_lock = FileLock(log_path.with_name(log_path.stem + ".lock"))
+        self._compress_lock = FileLock(log_path.with_name(log_path.stem + ".compress.lock"))
+
+    def segment_path(self, day: date) -> Path:
+        return self.log_path.with_name(f"{self.log_path.stem}-{day.isoformat()}{self.log_path.suffix}")
+
+    def _segment_pattern(self) -> "re.Pattern[str]":
+        stem, suffix = re.escape(self.log_path.stem), re.escape(self.log_path.suffix)
+        return re.compile(rf"^{stem}-(\d{{4}}-\d{{2}}-\d{{2}}){suffix}(\.gz)?$")
+
+    def list_segments(self) -> List[Segment]:
+        # Oldest first. A day that has both a .gz and a plain file (late lines
+        # not merged yet) lists the .gz first: it holds the earlier lines.
+        if not self.log_path.parent.exists():
+            return []
+        pattern = self._segment_pattern()
+        segments: List[Tuple[date, int, Path]] = []
+        for path in self.log_path.parent.iterdir():
+            match = pattern.match(path.name)
+            if not match:
+                continue
+            try:
+                day = date.fromisoformat(match.group(1))
+            except ValueError:
+                continue
+            segments.append((day, 0 if match.group(2) else 1, path))
+        return [(day, path) for day, _part, path in sorted(segments)]
+
+    def _open_segment(self, path: Path, fallback: bool = True) -> Optional[BinaryIO]:
+        # ``fallback``: a plain segment compressed since it was listed is read
+        # from its .gz, unless that .gz is being read on its own anyway.
+        try:
+            if path.suffix == ".gz":
+                return gzip.open(path, "rb")  # type: ignore[return-value]
+            return path.open("rb")
+        except FileNotFoundError:
+            compressed = path.with_name(path.name + ".gz")
+            if fallback and path.suffix != ".gz" and compressed.exists():
+                return self._open_segment(compressed)
+            return None
+
+    def _append_lines(self, day: date, lines: List[str], fsync: bool = False) -> None:
+        segment = self.segment_path(day)
+        segment.parent.mkdir(parents=True, exist_ok=True)
+        data = "".join(line + "\n" for line in lines).encode("utf-8")
+        compressed = segment.with_name(segment.name + ".gz")
+        # Callers hold the write lock. A day that is already compressed gets
+        # a new gzip member rather than a plain file next to its .gz.
+        if compressed.exists() and not segment.exists():
+            with compressed.open("ab") as raw:
+                with gzip.GzipFile(fileobj=raw, mode="ab") as stream:
+                    stream.write(data)
+                if fsync:
+                    raw.flush()
+                    os.fsync(raw.fileno())
+            return
+        with segment.open("ab") as raw:
+            raw.write(data)
+            if fsync:
+                raw.flush()
+                os.fsync(raw.fileno())
+
+    def prepare(self) -> None:
+        # Split a pre-segmentation single JSONL file into daily segments once.
+        if self._legacy_checked:
+            return
+        self._legacy_checked = True
+        if not self.log_path.is_file():
+            return
+        with self._write_lock:
+            if self.log_path.is_file():
+                self._migrate_legacy()
+
+    def _migrate_legacy(self) -> None:
+        buckets: Dict[date, List[str]] = {}
+        fallback_day = datetime.fromtimestamp(self.log_path.stat().st_mtime).date()
+        with self.log_path.open("r", encoding="utf-8") as stream:
+            for raw_line in stream:
+                line = raw_line.strip()
+                if not line:
+                    continue
+                try:
+                    data = json.loads(line)
+                except Exception:
+                    continue
+                ts = parse_ts(data.get("ts"))
+                day = ts.astimezone().date() if ts is not None else fallback_day
+                buckets.setdefault(day, []).append(line)
+        for day in sorted(buckets):
+            self._append_lines(day, buckets[day])
+        self.log_path.unlink()
+
+    def append(self, records: List[LogRecord], fsync: bool = False) -> None:
+        by_day: Dict[date, List[str]] = {}
+        for record in records:
+            by_day.setdefault(record.ts.astimezone().date(), []).append(record.line)
+        with self._write_lock:
+            for day, lines in by_day.items():
+                self._append_lines(day, lines, fsync=fsync)
+
+    def query(self, query: LogQuery) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        segments = [(day, 0 if path.suffix == ".gz" else 1, path) for day, path in self.list_segments()]
+        # Cursors name the day, the part (0: .gz, 1: plain tail) and an offset.
+        resume: Optional[Tuple[date, int, int]] = None
+        if query.cursor is not None:
+            try:
+                day = date.fromisoformat(query.cursor["d"])
+                offset = int(query.cursor["o"])
+                part = int(query.cursor["p"]) if "p" in query.cursor else None
+            except (KeyError, TypeError, ValueError) as exc:
+                raise ValueError("invalid cursor") from exc
+            parts = [segment_part for segment_day, segment_part, _path in segments if segment_day == day]
+            if part is None:
+                part = max(parts, default=0)
+            elif parts and part not in parts:
+                # The plain tail was compressed since the cursor was issued.
+                # On its own it became the .gz at the same offsets; merged
+                # into an older .gz its offsets are unknown, so that day is
+                # read again from its end (repeating lines rather than skipping).
+                part = max(parts)
+                if query.cursor.get("g"):
+                    offset = -1
+            resume = (day, part, offset)
+        # Cheap byte-level pre-filter before paying for json.loads.
+        needles = [
+            json.dumps(value, ensure_ascii=False).encode("utf-8")
+            for value in (query.target, query.evt)
+            if value
+        ]
+
+        def match(line: bytes) -> Optional[Tuple[Dict[str, Any], Optional[datetime]]]:
+            if any(needle not in line for needle in needles):
+                return None
+            try:
+                data = json.loads(line)
+            except Exception:
+                return None
+            if query.target and data.get("target") != query.target:
+                return None
+            if query.evt and data.get("evt") != query.evt:
+                return None
+            ts = parse_ts(data.get("ts"))
+            if ts is not None and query.until is not None and ts > query.until:
+                return None
+            return data, ts
+
+        def accept(line: bytes) -> bool:
+            found = match(line)
+            return found is not None and (query.since is None or found[1] is None or found[1] >= query.since)
+
+        entries: List[Dict[str, Any]] = []
+        compressed_days = {day for day, part, _path in segments if part == 0}
+        for day, part, path in reversed(segments):
+            if resume is not None and (day, part) > resume[:2]:
+                continue
+            if query.until is not None and day > query.until.astimezone().date():
+                continue
+            if query.since is not None and day < query.since.astimezone().date():
+                break
+            stream = self._open_segment(path, fallback=day not in compressed_days)
+            if stream is None:
+                continue
+            end = resume[2] if resume is not None and (day, part) == resume[:2] and resume[2] >= 0 else None
+            with stream:
+                if isinstance(stream, gzip.GzipFile):
+                    # One extra line tells whether another page follows.
+                    lines: Iterable[Tuple[int, bytes]] = _tail_lines(
+                        stream, end, query.limit - len(entries) + 1, accept
+                    )
+                else:
+                    lines = _reverse_lines(stream, end)
+                for offset, line in lines:
+                    if len(entries) >= query.limit:
+                        cursor = {"d": day.isoformat(), "p": part, "o": offset + len(line) + 1}
+                        if part and day in compressed_days:
+                            cursor["g"] = 1
+                        return entries, cursor
+                    found = match(line)
+                    if found is None:
+                        continue
+                    data, ts = found
+                    if ts is not None and query.since is not None and ts < query.since:
+                        return entries, None
+                    entries.append(_normalize_entry(data, ts))
+        return entries, None
+
+    def _compress_segment(self, path: Path) -> None:
+        # Gzip members concatenate, so a plain file next to an existing .gz
+        # (late lines) is appended to it instead of replacing it.
+        target = path.with_name(path.name + ".gz")
+        temp = path.with_name(path.name + ".gz.tmp")
+        merged = path.with_name(path.name + ".gz.merge")
+        try:
+            # The bulk of the copy runs without blocking writers; whatever they
+            # appended meanwhile is picked up under the write lock below.
+            temp.unlink(missing_ok=True)
+            with path.open("rb") as source, gzip.open(temp, "ab") as sink:
+                shutil.copyfileobj(source, sink)
+                copied = source.tell()
+            with self._write_lock:
+                with path.open("rb") as source:
+                    source.seek(copied)
+                    tail = source.read()
+                if tail:
+                    with gzip.open(temp, "ab") as sink:
+                        sink.write(tail)
+                if target.exists():
+                    # Existing members are copied under the lock, so nothing
+                    # appended to the .gz meanwhile can be lost.
+                    shutil.copyfile(target, merged)
+                    with merged.open("ab") as sink, temp.open("rb") as source:
+                        shutil.copyfileobj(source, sink)
+                    merged.replace(target)
+                    temp.unlink()
+                else:
+                    temp.replace(target)
+                path.unlink()
+        except FileNotFoundError:
+            temp.unlink(missing_ok=True)
+            merged.unlink(missing_ok=True)
+
+    def compress_closed_segments(self, today: date) -> None:
+        if not self._compress_lock.acquire(blocking=False):
+            return
+        try:
+            for day, path in self.list_segments():
+                if day < today and path.suffix != ".gz":
+                    self._compress_segment(path)
+        finally:
+            self._compress_lock.release()
+
+    def prune(self, cutoff: Optional[datetime]) -> None:
+        if cutoff is not None:
+            cutoff_day = cutoff.astimezone().date()
+            for day, path in self.list_segments():
+                if day >= cutoff_day:
+                    break
+                path.unlink(missing_ok=True)
+        # Closed segments are only read from now on; gzip them off the caller's path.
+        today = datetime.now().astimezone().date()
+        threading.Thread(
+            target=self.compress_closed_segments, args=(today,), name="log-compress", daemon=True
+        ).start()
+
+    def generation(self) -> Tuple[Tuple[str, int, int], ...]:
+        # Appends grow the newest segment (or a closed day's .gz); prune and
+        # compression rename files. Both files of a day are included.
+        entries = []
+        for _day, path in self.list_segments():
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((path.name, stat.st_size, stat.st_mtime_ns))
+        return tuple(entries)
+
+    def size_bytes(self) -> Optional[int]:
+        total = 0
+        for _day, path in self.list_segments():
+            try:
+                total += path.stat().st_size
+            except OSError:
+                continue
+        return total
+
+    def iter_all(self) -> Iterable[LogRecord]:
+        # Read-only: a legacy single file is read in place, not split.
+        segments = self.list_segments()
+        compressed = {path.with_suffix("") for _day, path in segments if path.suffix == ".gz"}
+        sources: List[Path] = [self.log_path] if self.log_path.is_file() else []
+        sources.extend(path for _day, path in segments)
+        for path in sources:
+            stream = self._open_segment(path, fallback=path not in compressed)
+            if stream is None:
+                continue
+            with stream:
+                for raw_line in stream:
+                    line = raw_line.decode("utf-8", errors="replace").strip()
+                    if not line:
+                        continue
+                    try:
+                        data = json.loads(line)
+                    except Exception:
+                        continue
+                    ts = parse_ts(data.get("ts"))
+                    if ts is None:
+                        continue
+                    yield LogRecord(ts, line, data.get("evt"), data.get("target"))
@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Collection, Dict, Tuple
+
+from .base import RuntimeStore, visible_change
+
+
+class MemoryRuntimeStore(RuntimeStore):
+    # Process-local; the default for single-worker deployments.
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        # Starts from the clock so a restarted process never reuses a value.
+        self._generation = time.time_ns()
+
+    def get(self, name: str) -> Dict[str, Any]:
+        return dict(self._entries.get(name) or {})
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {name: dict(entry) for name, entry in self._entries.items()}
+
+    def update(
+        self, name: str, fields: Dict[str, Any], quiet: Collection[str] = ()
+    ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.setdefault(name, {})
+            previous = dict(entry)
+            entry.update(fields)
+            if visible_change(previous, fields, quiet):
+                self._generation += 1
+            return previous, dict(entry)
+
+    def delete(self, name: str) -> None:
+        with self._lock:
+            if self._entries.pop(name, None) is not None:
+                self._generation += 1
+
+    def rename(self, old: str, new: str) -> None:
+        with self._lock:
+            if old in self._entries:
+                self._entries[new] = self._entries.pop(old)
+                self._generation += 1
+
+    def generation(self) -> int:
+        return self._generation
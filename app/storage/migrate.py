@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from ..core.settings import get_settings
+from .base import LogRecord
+from .files import FileEventStore, FileTargetStore
+from .sqlite import SqliteDatabase, SqliteEventStore, SqliteTargetStore
+
+BATCH_SIZE = 5000
+
+
+def migrate_files_to_sqlite(
+    targets_path: Path,
+    log_path: Path,
+    sqlite_path: Path,
+) -> Dict[str, int]:
+    # Imported lazily: the targets service pulls in the whole app.
+    from ..services.targets import _normalize_state
+
+    db = SqliteDatabase(sqlite_path)
+    counts = {"targets": 0, "events": 0}
+
+    raw = FileTargetStore(targets_path).read()
+    if raw is not None:
+        state, _ = _normalize_state(raw)
+        SqliteTargetStore(db).write(state["targets"])
+        counts["targets"] = len(state["targets"])
+
+    # The source files are only read; rerunning skips events already copied.
+    sink = SqliteEventStore(db)
+    batch: List[LogRecord] = []
+    for record in FileEventStore(log_path).iter_all():
+        batch.append(record)
+        if len(batch) >= BATCH_SIZE:
+            counts["events"] += _append_new(db, sink, batch)
+            batch = []
+    if batch:
+        counts["events"] += _append_new(db, sink, batch)
+    return counts
+
+
+def _append_new(db: SqliteDatabase, sink: SqliteEventStore, batch: List[LogRecord]) -> int:
+    conn = db.connection()
+    fresh = [
+        record
+        for record in batch
+        if conn.execute(
+            "SELECT 1 FROM events WHERE ts = ? AND data = ? LIMIT 1", (record.ts.timestamp(), record.line)
+        ).fetchone()
+        is None
+    ]
+    if fresh:
+        sink.append(fresh)
+    return len(fresh)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Copy targets.json and JSONL logs into SQLite")
+    parser.add_argument("--targets", type=Path, default=settings.targets_path)
+    parser.add_argument("--logs", type=Path, default=settings.log_path)
+    parser.add_argument("--db", type=Path, default=settings.sqlite_path)
+    args = parser.parse_args(argv)
+    counts = migrate_files_to_sqlite(args.targets, args.logs, args.db)
+    print(f"migrated {counts['targets']} targets and {counts['events']} events into {args.db}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Collection, Dict, Iterable, List, Optional, Tuple
+
+from ..core.locks import FileLock
+from .base import EventStore, LogQuery, LogRecord, RuntimeStore, TargetStore, visible_change
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS targets (
+    name TEXT PRIMARY KEY,
+    ip TEXT NOT NULL,
+    mac TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_targets_ip ON targets (ip);
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts REAL NOT NULL,
+    target TEXT,
+    evt TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_events_ts ON events (ts);
+CREATE INDEX IF NOT EXISTS idx_events_target_ts ON events (target, ts);
+CREATE INDEX IF NOT EXISTS idx_events_evt_ts ON events (evt, ts);
+CREATE TABLE IF NOT EXISTS runtime (
+    name TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS relay (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created REAL NOT NULL,
+    origin TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+"""
+
+# Relayed events only need to outlive one poll of every worker.
+RELAY_RETENTION = 60.0
+
+
+class SqliteDatabase:
+    # One WAL-mode connection per thread; readers never block the writer.
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with self._init_lock:
+                if not self._initialized:
+                    conn.executescript(SCHEMA)
+                    self._initialized = True
+            self._local.conn = conn
+        return conn
+
+    def transaction(self) -> "_Transaction":
+        return _Transaction(self.connection())
+
+
+class _Transaction:
+    def __init__(self, conn: sqlite3.Connection) -> None:
+        self.conn = conn
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+
+
+_BUMP_TARGETS_VERSION = (
+    "INSERT INTO meta (key, value) VALUES ('targets_version', '1') "
+    "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1"
+)
+
+
+class SqliteTargetStore(TargetStore):
+    def __init__(self, db: SqliteDatabase) -> None:
+        self.db = db
+        self._lock = FileLock(Path(str(db.path) + ".targets.lock"))
+
+    def lock(self) -> FileLock:
+        return self._lock
+
+    def exists(self) -> bool:
+        row = self.db.connection().execute("SELECT value FROM meta WHERE key = 'targets'").fetchone()
+        return row is not None
+
+    def signature(self) -> Optional[int]:
+        # Bumped in the same transaction as every target write, so all threads
+        # and workers see one value per committed state.
+        row = self.db.connection().execute("SELECT value FROM meta WHERE key = 'targets_version'").fetchone()
+        return int(row[0]) if row else None
+
+    def read(self) -> Any:
+        rows = self.db.connection().execute("SELECT data FROM targets ORDER BY name").fetchall()
+        return {"targets": [json.loads(data) for (data,) in rows]}
+
+    def write(
+        self,
+        targets: List[Dict[str, Any]],
+        upserted: Iterable[Dict[str, Any]] = (),
+        deleted: Iterable[str] = (),
+    ) -> None:
+        upserted = list(upserted)
+        deleted = list(deleted)
+        incremental = bool(upserted or deleted)
+        rows = [
+            (target["name"], target["ip"], target.get("mac"), json.dumps(target, ensure_ascii=False))
+            for target in (upserted if incremental else targets)
+        ]
+        conn = self.db.connection()
+        # Target edits are rare and precious; commit them with a full sync.
+        conn.execute("PRAGMA synchronous=FULL")
+        try:
+            self._write_rows(rows, deleted, incremental)
+        finally:
+            conn.execute("PRAGMA synchronous=NORMAL")
+
+    def _write_rows(self, rows: List[Tuple[Any, ...]], deleted: List[str], incremental: bool) -> None:
+        with self.db.transaction() as conn:
+            if incremental:
+                conn.executemany("DELETE FROM targets WHERE name = ?", [(name,) for name in deleted])
+            else:
+                conn.execute("DELETE FROM targets")
+            conn.executemany(
+                "INSERT INTO targets (name, ip, mac, data) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET ip = excluded.ip, mac = excluded.mac, data = excluded.data",
+                rows,
+            )
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('targets', '1')")
+            conn.execute(_BUMP_TARGETS_VERSION)
+
+
+_BUMP_RUNTIME_GENERATION = (
+    "INSERT INTO meta (key, value) VALUES ('runtime_generation', '1') "
+    "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1"
+)
+
+
+class SqliteRuntimeStore(RuntimeStore):
+    # Shared by every worker that opens the same database file.
+    def __init__(self, db: SqliteDatabase) -> None:
+        self.db = db
+
+    def get(self, name: str) -> Dict[str, Any]:
+        row = self.db.connection().execute("SELECT data FROM runtime WHERE name = ?", (name,)).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        rows = self.db.connection().execute("SELECT name, data FROM runtime").fetchall()
+        return {name: json.loads(data) for name, data in rows}
+
+    def update(
+        self, name: str, fields: Dict[str, Any], quiet: Collection[str] = ()
+    ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        with self.db.transaction() as conn:
+            row = conn.execute("SELECT data FROM runtime WHERE name = ?", (name,)).fetchone()
+            previous = json.loads(row[0]) if row else {}
+            current = {**previous, **fields}
+            conn.execute(
+                "INSERT INTO runtime (name, data) VALUES (?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET data = excluded.data",
+                (name, json.dumps(current, ensure_ascii=False)),
+            )
+            if visible_change(previous, fields, quiet):
+                conn.execute(_BUMP_RUNTIME_GENERATION)
+        return previous, current
+
+    def delete(self, name: str) -> None:
+        with self.db.transaction() as conn:
+            conn.execute("DELETE FROM runtime WHERE name = ?", (name,))
+            conn.execute(_BUMP_RUNTIME_GENERATION)
+
+    def rename(self, old: str, new: str) -> None:
+        with self.db.transaction() as conn:
+            conn.execute("DELETE FROM runtime WHERE name = ?", (new,))
+            conn.execute("UPDATE runtime SET name = ? WHERE name = ?", (new, old))
+            conn.execute(_BUMP_RUNTIME_GENERATION)
+
+    def generation(self) -> int:
+        row = self.db.connection().execute("SELECT value FROM meta WHERE key = 'runtime_generation'").fetchone()
+        return int(row[0]) if row else 0
+
+    def relay(self, origin: str, events: List[Dict[str, Any]], after: Optional[int]) -> Tuple[List[Dict[str, Any]], int]:
+        if events:
+            now = time.time()
+            with self.db.transaction() as conn:
+                conn.executemany(
+                    "INSERT INTO relay (created, origin, data) VALUES (?, ?, ?)",
+                    [(now, origin, json.dumps(event, ensure_ascii=False)) for event in events],
+                )
+                conn.execute("DELETE FROM relay WHERE created < ?", (now - RELAY_RETENTION,))
+        conn = self.db.connection()
+        if after is None:
+            (last,) = conn.execute("SELECT coalesce(max(id), 0) FROM relay").fetchone()
+            return [], last
+        rows = conn.execute(
+            "SELECT id, origin, data FROM relay WHERE id > ? ORDER BY id", (after,)
+        ).fetchall()
+        last = rows[-1][0] if rows else after
+        return [json.loads(data) for _id, row_origin, data in rows if row_origin != origin], last
+
+
+class SqliteEventStore(EventStore):
+    def __init__(self, db: SqliteDatabase) -> None:
+        self.db = db
+
+    def append(self, records: List[LogRecord], fsync: bool = False) -> None:
+        rows = [(record.ts.timestamp(), record.target, record.evt, record.line) for record in records]
+        conn = self.db.connection()
+        if fsync:
+            conn.execute("PRAGMA synchronous=FULL")
+        try:
+            with self.db.transaction() as tx:
+                tx.executemany("INSERT INTO events (ts, target, evt, data) VALUES (?, ?, ?, ?)", rows)
+        finally:
+            if fsync:
+                conn.execute("PRAGMA synchronous=NORMAL")
+
+    def query(self, query: LogQuery) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        clauses: List[str] = []
+        params: List[Any] = []
+        if query.target:
+            clauses.append("target = ?")
+            params.append(query.target)
+        if query.evt:
+            clauses.append("evt = ?")
+            params.append(query.evt)
+        if query.since is not None:
+            clauses.append("ts >= ?")
+            params.append(query.since.timestamp())
+        if query.until is not None:
+            clauses.append("ts <= ?")
+            params.append(query.until.timestamp())
+        if query.cursor is not None:
+            try:
+                cursor_ts, cursor_id = float(query.cursor["t"]), int(query.cursor["i"])
+            except (KeyError, TypeError, ValueError) as exc:
+                raise ValueError("invalid cursor") from exc
+            clauses.append("(ts < ? OR (ts = ? AND id < ?))")
+            params.extend([cursor_ts, cursor_ts, cursor_id])
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self.db.connection().execute(
+            f"SELECT id, ts, data FROM events {where} ORDER BY ts DESC, id DESC LIMIT ?",
+            [*params, query.limit + 1],
+        ).fetchall()
+        entries: List[Dict[str, Any]] = []
+        for _id, ts, data in rows[: query.limit]:
+            try:
+                entry = json.loads(data)
+            except Exception:
+                continue
+            entry["ts"] = datetime.fromtimestamp(ts, tz=timezone.utc).astimezone().isoformat(timespec="seconds")
+            entries.append(entry)
+        next_cursor = None
+        if len(rows) > query.limit:
+            last_id, last_ts, _data = rows[query.limit - 1]
+            next_cursor = {"t": last_ts, "i": last_id}
+        return entries, next_cursor
+
+    def prune(self, cutoff: Optional[datetime]) -> None:
+        if cutoff is None:
+            return
+        with self.db.transaction() as conn:
+            conn.execute("DELETE FROM events WHERE ts < ?", (cutoff.timestamp(),))
+
+    def generation(self) -> Tuple[int, int]:
+        # Ids only grow, so the newest and oldest id capture appends and prunes.
+        row = self.db.connection().execute("SELECT coalesce(max(id), 0), coalesce(min(id), 0) FROM events").fetchone()
+        return (row[0], row[1])
+
+    def size_bytes(self) -> Optional[int]:
+        # Whole database file plus WAL; events dominate it.
+        total = 0
+        for suffix in ("", "-wal"):
+            try:
+                total += Path(str(self.db.path) + suffix).stat().st_size
+            except OSError:
+                continue
+        return total
+
+    def iter_all(self) -> Iterable[LogRecord]:
+        rows = self.db.connection().execute("SELECT ts, target, evt, data FROM events ORDER BY ts, id")
+        for ts, target, evt, data in rows:
+            yield LogRecord(datetime.fromtimestamp(ts, tz=timezone.utc), data, evt, target)
@@ -0,0 +1,344 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gc
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+# Offline benchmarks for the hot API paths. Each scenario builds a synthetic
+# fleet (targets + fake neighbour table) and event log in a temp directory,
+# points the app at it through the usual env vars and drives the ASGI app
+# in-process with httpx, so no network or ICMP privileges are needed.
+#
+#   python -m benchmarks.run --fleet 10,1000 --log-lines 10000 --output bench.json
+#   python -m benchmarks.run --compare bench.json --output new.json
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+LOG_DAYS = 14
+RETENTION_DAYS = 7
+
+
+def _percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    index = min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def _summary(samples: List[float]) -> Dict[str, float]:
+    return {
+        "n": len(samples),
+        "p50_ms": round(_percentile(samples, 0.50) * 1000.0, 4),
+        "p95_ms": round(_percentile(samples, 0.95) * 1000.0, 4),
+        "p99_ms": round(_percentile(samples, 0.99) * 1000.0, 4),
+        "mean_ms": round(sum(samples) / len(samples) * 1000.0, 4),
+        "max_ms": round(max(samples) * 1000.0, 4),
+    }
+
+
+def _host(index: int) -> Dict[str, str]:
+    return {
+        "name": f"host-{index:05d}",
+        "ip": f"10.{(index >> 16) & 255}.{(index >> 8) & 255}.{index & 255}",
+        "mac": "02:00:" + ":".join(f"{(index >> shift) & 255:02X}" for shift in (24, 16, 8, 0)),
+    }
+
+
+def write_fleet(directory: Path, size: int) -> Path:
+    hosts = [_host(index) for index in range(1, size + 1)]
+    ts = "2025-01-01T00:00:00+00:00"
+    targets = [{**host, "created_at": ts, "updated_at": ts} for host in hosts]
+    path = directory / "targets.json"
+    path.write_text(json.dumps({"targets": targets}, indent=2) + "\n", encoding="utf-8")
+    # Stand-in for /proc/net/arp so MAC learning never shells out.
+    lines = ["IP address       HW type     Flags       HW address            Mask     Device"]
+    lines += [f"{host['ip']:<16} 0x1         0x2         {host['mac']}     *        eth0" for host in hosts]
+    (directory / "arp").write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return path
+
+
+def write_logs(store: Any, lines: int, fleet: int) -> None:
+    from app.storage import FileEventStore, LogRecord
+
+    today = datetime.now(timezone.utc).astimezone()
+    per_day = max(lines // LOG_DAYS, 1)
+    rng = random.Random(1)
+    written = 0
+    for offset in range(LOG_DAYS - 1, -1, -1):
+        day_start = (today - timedelta(days=offset)).replace(hour=0, minute=0, second=0, microsecond=0)
+        count = per_day if offset else lines - written
+        records = []
+        for index in range(count):
+            ts = day_start + timedelta(seconds=index * 86400 // max(count, 1))
+            if ts > today:
+                ts = today
+            name = f"host-{rng.randint(1, max(fleet, 1)):05d}"
+            evt = {
+                "evt": "status" if index % 10 else "wake",
+                "target": name,
+                "online": True,
+                "ts": ts.isoformat(timespec="seconds"),
+            }
+            records.append(LogRecord(ts, json.dumps(evt), evt["evt"], name))
+            if len(records) >= 50000:
+                store.append(records)
+                records = []
+        if records:
+            store.append(records)
+        written += count
+    if isinstance(store, FileEventStore):
+        store.compress_closed_segments(today.date())
+
+
+class FakePinger:
+    # ~90% of hosts answer; latency is simulated by yielding to the loop.
+    async def ping(self, ip: str, timeout: float = 1.0) -> Optional[float]:
+        await asyncio.sleep(0)
+        return None if ip.endswith("7") else 0.3
+
+    async def ping_many(self, ips: Any, timeout: float = 1.0, concurrency: Optional[int] = None) -> Dict[str, Any]:
+        return {ip: await self.ping(ip, timeout) for ip in ips}
+
+
+class Scenario:
+    def __init__(self, workdir: Path, fleet: int, log_lines: int, backend: str) -> None:
+        self.workdir = workdir
+        self.fleet = fleet
+        self.log_lines = log_lines
+        self.backend = backend
+
+    def setup(self) -> None:
+        targets_path = write_fleet(self.workdir, self.fleet)
+        os.environ.update({
+            "TARGETS_PATH": str(targets_path),
+            "LOG_PATH": str(self.workdir / "logs" / "wol-web.jsonl"),
+            "SQLITE_PATH": str(self.workdir / "wol-web.db"),
+            "STORAGE_BACKEND": self.backend,
+            "LOG_RETENTION_DAYS": str(RETENTION_DAYS),
+            "STATUS_INTERVAL": "0",
+            "PC_LABEL": "",
+        })
+        from app import storage
+        from app.core.settings import get_settings
+        from app.services import logs, neighbors, pinger, targets
+
+        logs.stop_log_writer()
+        get_settings.cache_clear()
+        for cached in (
+            storage.get_target_store,
+            storage.get_event_store,
+            storage.get_runtime_store,
+            storage._sqlite_database,
+        ):
+            cached.cache_clear()
+        targets._REGISTRY = targets._TargetRegistry()
+        targets._MAC_VERIFIED.clear()
+        neighbors._TABLE = neighbors.NeighborTable(self.workdir / "arp")
+        fake = FakePinger()
+        pinger.get_pinger = lambda: fake  # type: ignore[assignment]
+        if self.backend != "files":
+            state, _ = targets._normalize_state(json.loads(targets_path.read_text(encoding="utf-8")))
+            storage.get_target_store().write(state["targets"])
+        store = storage.get_event_store()
+        store.prepare()
+        write_logs(store, self.log_lines, self.fleet)
+        # Keep housekeeping out of the measured calls; it is timed separately.
+        logs._LAST_PRUNE_TS = time.time()
+
+    def teardown(self) -> None:
+        from app.services import logs
+
+        logs.stop_log_writer()
+
+
+async def _measure(
+    fn: Callable[[], Awaitable[Any]], iterations: int, warmup: int = 3, memory: bool = True
+) -> Dict[str, Any]:
+    for _ in range(warmup):
+        await fn()
+    gc.collect()
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        await fn()
+        samples.append(time.perf_counter() - started)
+    result: Dict[str, Any] = _summary(samples)
+    if memory:
+        # One extra traced call; tracing is too slow to leave on while timing.
+        tracemalloc.start()
+        await fn()
+        result["peak_kib"] = round(tracemalloc.get_traced_memory()[1] / 1024.0, 1)
+        tracemalloc.stop()
+    return result
+
+
+async def run_scenario(scenario: Scenario, iterations: int) -> List[Dict[str, Any]]:
+    import httpx
+
+    from app.main import create_app
+    from app.services import logs, targets
+
+    app = create_app()
+    rng = random.Random(7)
+    names = [f"host-{rng.randint(1, scenario.fleet):05d}" for _ in range(256)]
+    cursor = iter(names * (iterations + 64))
+    results: List[Dict[str, Any]] = []
+    base = {"fleet": scenario.fleet, "log_lines": scenario.log_lines, "backend": scenario.backend}
+
+    async def _direct_list() -> None:
+        targets.list_targets()
+
+    async def _direct_get() -> None:
+        targets.get_target(next(cursor))
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+        async def _api_targets() -> None:
+            (await client.get("/api/targets")).raise_for_status()
+
+        async def _api_status() -> None:
+            (await client.get("/api/status", params={"target": next(cursor), "max_age": 0})).raise_for_status()
+
+        async def _api_status_all() -> None:
+            (await client.get("/api/status/all", params={"max_age": 0})).raise_for_status()
+
+        async def _api_logs() -> None:
+            (await client.get("/api/logs", params={"limit": 200})).raise_for_status()
+
+        async def _api_logs_filtered() -> None:
+            params = {"limit": 200, "target": next(cursor)}
+            (await client.get("/api/logs", params=params)).raise_for_status()
+
+        heavy = max(min(iterations, 2000 // max(scenario.fleet // 100, 1)), 5)
+        plan = [
+            ("list_targets", _direct_list, iterations),
+            ("get_target", _direct_get, iterations),
+            ("GET /api/targets", _api_targets, heavy),
+            ("GET /api/status", _api_status, iterations),
+            ("GET /api/status/all", _api_status_all, heavy),
+            ("GET /api/logs?limit=200", _api_logs, iterations),
+            ("GET /api/logs?limit=200&target", _api_logs_filtered, max(iterations // 10, 5)),
+        ]
+        for name, fn, count in plan:
+            results.append({"name": name, **base, **await _measure(fn, count)})
+
+    # log_event throughput: enqueue N events and wait until they are on disk.
+    events = max(iterations * 50, 1000)
+    started = time.perf_counter()
+    for index in range(events):
+        logs.log_event({"evt": "bench", "target": f"host-{index % scenario.fleet + 1:05d}"})
+    enqueued = time.perf_counter() - started
+    logs.flush_logs()
+    total = time.perf_counter() - started
+    results.append({
+        "name": "log_event",
+        **base,
+        "n": events,
+        "enqueue_us": round(enqueued / events * 1e6, 3),
+        "events_per_s": round(events / total, 1),
+    })
+
+    # Retention pass over the generated history (destructive, so timed once).
+    from app.storage import get_event_store
+
+    store = get_event_store()
+    cutoff = datetime.now(timezone.utc) - timedelta(days=RETENTION_DAYS)
+    started = time.perf_counter()
+    logs._prune_logs_locked(store, cutoff)
+    results.append({"name": "prune", **base, "n": 1, "duration_ms": round((time.perf_counter() - started) * 1000.0, 3)})
+    return results
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def _key(result: Dict[str, Any]) -> str:
+    return f"{result['name']} [{result['backend']} fleet={result['fleet']} logs={result['log_lines']}]"
+
+
+def compare(previous: Dict[str, Any], current: Dict[str, Any]) -> List[str]:
+    before = {_key(result): result for result in previous.get("results", [])}
+    lines = []
+    for result in current["results"]:
+        old = before.get(_key(result))
+        if old is None:
+            continue
+        for metric in ("p50_ms", "p95_ms", "p99_ms", "events_per_s", "duration_ms"):
+            if metric in result and old.get(metric):
+                ratio = result[metric] / old[metric]
+                lines.append(f"{_key(result):<70} {metric:<13} {old[metric]:>12} -> {result[metric]:>12} ({ratio:.2f}x)")
+    return lines
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Offline performance benchmarks for wol-web")
+    parser.add_argument("--fleet", default="10,1000,10000", help="comma separated fleet sizes")
+    parser.add_argument("--log-lines", default="10000,100000", help="comma separated event log sizes")
+    parser.add_argument("--backend", default="files", choices=("files", "sqlite"))
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--output", type=Path, help="write JSON results here")
+    parser.add_argument("--compare", type=Path, help="previous JSON results to compare against")
+    args = parser.parse_args(argv)
+
+    fleets = [int(value) for value in args.fleet.split(",") if value.strip()]
+    log_sizes = [int(value) for value in args.log_lines.split(",") if value.strip()]
+    results: List[Dict[str, Any]] = []
+    for fleet in fleets:
+        for log_lines in log_sizes:
+            with tempfile.TemporaryDirectory(prefix="wol-bench-") as tmp:
+                scenario = Scenario(Path(tmp), fleet, log_lines, args.backend)
+                started = time.perf_counter()
+                scenario.setup()
+                setup_s = time.perf_counter() - started
+                try:
+                    scenario_results = asyncio.run(run_scenario(scenario, args.iterations))
+                finally:
+                    scenario.teardown()
+            for result in scenario_results:
+                print(f"{_key(result):<70} " + " ".join(
+                    f"{key}={value}" for key, value in result.items() if key not in ("name", "fleet", "log_lines", "backend")
+                ))
+            print(f"  (setup {setup_s:.1f}s)")
+            results.extend(scenario_results)
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "created_at": date.today().isoformat(),
+            "iterations": args.iterations,
+            "max_rss_kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        },
+        "results": results,
+    }
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+    if args.compare:
+        for line in compare(json.loads(args.compare.read_text(encoding="utf-8")), report):
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
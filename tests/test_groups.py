@@ -0,0 +1,23 @@
+import asyncio
+import time
+
+from app.services import groups
+
+
+def test_group_wake_fans_out_with_stagger(monkeypatch):
+    started = {}
+
+    def _wake(name):
+        started[name] = time.monotonic()
+        if name == "bad":
+            raise groups.HTTPException(400, detail="no mac")
+        return {"ok": True, "sent": "magic-packet", "target": name}
+
+    monkeypatch.setattr(groups, "get_group_members", lambda tag: ["a", "b", "bad"])
+    monkeypatch.setattr(groups, "wake_target", _wake)
+    monkeypatch.setattr(groups, "log_event", lambda evt: None)
+    summary = asyncio.run(groups.run_group_action("lab", "wake", concurrency=2, stagger=0.05))
+    assert (summary["total"], summary["succeeded"], summary["failed"]) == (3, 2, 1)
+    assert [result["target"] for result in summary["results"]] == ["a", "b", "bad"]
+    assert summary["results"][2]["status_code"] == 400
+    assert started["bad"] - started["a"] >= 0.09
@@ -0,0 +1,167 @@
+import dataclasses
+import json
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+
+from app.services import logs
+from app.storage import FileEventStore, files
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    logs.stop_log_writer()
+    path = tmp_path / "wol-web.jsonl"
+    settings = logs.get_settings()
+    monkeypatch.setattr(logs, "get_settings", lambda: dataclasses.replace(settings, log_path=path))
+    monkeypatch.setattr(logs, "_LAST_PRUNE_TS", 0.0)
+    store = FileEventStore(path)
+    monkeypatch.setattr(logs, "get_event_store", lambda: store)
+    yield store
+    logs.stop_log_writer()
+
+
+def _write_segment(store, day, events):
+    segment = store.segment_path(day)
+    segment.write_text("".join(json.dumps(evt) + "\n" for evt in events), encoding="utf-8")
+    return segment
+
+
+def test_events_go_to_daily_segment(store):
+    logs.log_event({"evt": "wake", "target": "alpha"})
+    logs.flush_logs()
+    today = datetime.now().astimezone().date()
+    assert store.segment_path(today).exists()
+    assert [entry["evt"] for entry in logs.read_logs(10)] == ["wake"]
+
+
+def test_prune_removes_whole_segments(store):
+    old_day = date.today() - timedelta(days=30)
+    old = _write_segment(store, old_day, [{"evt": "old", "ts": f"{old_day}T00:00:00+00:00"}])
+    recent = _write_segment(store, date.today(), [{"evt": "new"}])
+    store.prune(datetime.now(timezone.utc) - timedelta(days=7))
+    assert not old.exists()
+    assert recent.exists()
+
+
+def test_legacy_file_is_split_into_segments(store):
+    store.log_path.write_text(
+        json.dumps({"evt": "a", "ts": "2024-01-01T10:00:00+00:00"}) + "\n"
+        + json.dumps({"evt": "b", "ts": "2024-01-02T10:00:00+00:00"}) + "\n",
+        encoding="utf-8",
+    )
+    store.prepare()
+    assert not store.log_path.exists()
+    assert len(store.list_segments()) == 2
+
+
+def test_query_pages_backwards_with_filters(store, monkeypatch):
+    monkeypatch.setattr(files, "READ_BLOCK_SIZE", 64)
+    yesterday = date.today() - timedelta(days=1)
+    _write_segment(store, yesterday, [{"evt": "wake", "target": f"old{i}"} for i in range(5)])
+    _write_segment(store, date.today(), [{"evt": "wake", "target": f"new{i}"} for i in range(5)])
+    seen = []
+    cursor = None
+    while True:
+        page = logs.query_logs(3, cursor=cursor)
+        seen.extend(entry["target"] for entry in page["logs"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == [f"new{i}" for i in reversed(range(5))] + [f"old{i}" for i in reversed(range(5))]
+    assert [entry["target"] for entry in logs.query_logs(10, target="old3")["logs"]] == ["old3"]
+
+
+def test_late_lines_are_merged_into_compressed_segment(store):
+    day = date.today() - timedelta(days=2)
+    _write_segment(store, day, [{"evt": "early", "ts": f"{day}T10:00:00+00:00"}])
+    store.compress_closed_segments(date.today())
+    _write_segment(store, day, [{"evt": "late", "ts": f"{day}T23:59:59+00:00"}])
+    store.compress_closed_segments(date.today())
+    assert [path.name for _, path in store.list_segments()] == [store.segment_path(day).name + ".gz"]
+    assert [record.evt for record in store.iter_all()] == ["early", "late"]
+
+
+def test_query_pages_through_compressed_segment(store):
+    day = date.today() - timedelta(days=3)
+    _write_segment(store, day, [{"evt": "wake" if i % 2 else "sleep", "target": f"t{i}"} for i in range(9)])
+    store.compress_closed_segments(date.today())
+    seen = []
+    cursor = None
+    while True:
+        page = logs.query_logs(2, evt="wake", cursor=cursor)
+        seen.extend(entry["target"] for entry in page["logs"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == ["t7", "t5", "t3", "t1"]
+
+
+def test_failed_batch_is_retried_then_counted(store, monkeypatch):
+    attempts = []
+    real_append = store.append
+
+    def flaky_append(records, fsync=False):
+        attempts.append(len(records))
+        if len(attempts) == 1:
+            raise OSError("disk hiccup")
+        real_append(records, fsync=fsync)
+
+    monkeypatch.setattr(store, "append", flaky_append)
+    dropped = logs.DROPPED.value("write_error")
+    logs.log_event({"evt": "wake", "target": "alpha"})
+    logs.flush_logs()
+    assert attempts == [1, 1]
+    assert logs.DROPPED.value("write_error") == dropped
+    assert [entry["evt"] for entry in logs.read_logs(10)] == ["wake"]
+
+
+def test_day_with_gz_and_plain_tail_reads_both(store):
+    day = date.today() - timedelta(days=2)
+    _write_segment(store, day, [{"evt": "wake", "target": f"t{i}"} for i in range(3)])
+    store.compress_closed_segments(date.today())
+    _write_segment(store, day, [{"evt": "wake", "target": "late"}])
+    assert len(store.list_segments()) == 2
+    assert len(store.generation()) == 2
+    assert [entry["target"] for entry in logs.query_logs(10)["logs"]] == ["late", "t2", "t1", "t0"]
+    page = logs.query_logs(2)
+    assert [entry["target"] for entry in page["logs"]] == ["late", "t2"]
+    rest = logs.query_logs(2, cursor=page["next_cursor"])
+    assert [entry["target"] for entry in rest["logs"]] == ["t1", "t0"]
+
+
+def test_late_append_to_compressed_day_joins_the_gz(store):
+    day = date.today() - timedelta(days=2)
+    _write_segment(store, day, [{"evt": "early", "ts": f"{day}T10:00:00+00:00"}])
+    store.compress_closed_segments(date.today())
+    store.append([logs.LogRecord(
+        datetime.fromisoformat(f"{day}T23:59:59").astimezone(),
+        json.dumps({"evt": "late", "ts": f"{day}T23:59:59"}),
+        "late",
+        None,
+    )])
+    assert [path.suffix for _, path in store.list_segments()] == [".gz"]
+    assert [entry["evt"] for entry in logs.query_logs(10)["logs"]] == ["late", "early"]
+
+
+def test_full_queue_sheds_only_status_events(monkeypatch):
+    import queue as queue_module
+
+    writer = logs._LogWriter()
+    pending = queue_module.Queue(1)
+    pending.put("busy")
+    monkeypatch.setattr(writer, "_ensure_started", lambda: pending)
+    writer._queue = pending
+    dropped = logs.DROPPED.value("queue_full")
+    status = logs.LogRecord(datetime.now(timezone.utc), "{}", "status", "alpha")
+    writer.submit(status)
+    assert logs.DROPPED.value("queue_full") == dropped + 1
+
+    wake = logs.LogRecord(datetime.now(timezone.utc), "{}", "wake", "alpha")
+    waiter = logs.threading.Thread(target=writer.submit, args=(wake,))
+    waiter.start()
+    waiter.join(0.2)
+    assert waiter.is_alive()
+    assert pending.get() == "busy"
+    waiter.join(2.0)
+    assert pending.get_nowait() is wake
@@ -0,0 +1,28 @@
+from app.core import metrics
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = metrics.Histogram("test_seconds", "Test.", labels=("op",), buckets=(0.1, 1.0))
+    histogram.observe(0.05, "a")
+    histogram.observe(0.5, "a")
+    histogram.observe(5.0, "a")
+    lines = histogram.render()
+    assert 'test_seconds_bucket{op="a",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{op="a",le="1"} 2' in lines
+    assert 'test_seconds_bucket{op="a",le="+Inf"} 3' in lines
+    assert 'test_seconds_count{op="a"} 3' in lines
+
+
+def test_timed_decorator_and_lock_wait():
+    @metrics.timed("test_op")
+    def _work():
+        return 42
+
+    before = metrics.OPERATION_SECONDS.count("test_op")
+    assert _work() == 42
+    assert metrics.OPERATION_SECONDS.count("test_op") == before + 1
+    lock = metrics.TimedLock("test")
+    with lock:
+        assert lock.locked()
+    assert metrics.LOCK_WAIT.count("test") == 1
+    assert "wol_lock_wait_seconds_count{lock=\"test\"} 1" in metrics.render()
@@ -0,0 +1,52 @@
+from app.services.neighbors import NeighborTable, parse_proc_arp
+
+PROC_ARP = """IP address       HW type     Flags       HW address            Mask     Device
+192.168.0.10     0x1         0x2         aa:bb:cc:dd:ee:01     *        eth0
+192.168.0.11     0x1         0x0         00:00:00:00:00:00     *        eth0
+192.168.0.12     0x1         0x6         aa:bb:cc:dd:ee:02     *        eth0
+"""
+
+
+def test_parse_proc_arp_skips_incomplete_entries():
+    assert parse_proc_arp(PROC_ARP) == {
+        "192.168.0.10": "AA:BB:CC:DD:EE:01",
+        "192.168.0.12": "AA:BB:CC:DD:EE:02",
+    }
+
+
+def test_lookup_reads_table_once(tmp_path):
+    source = tmp_path / "arp"
+    source.write_text(PROC_ARP, encoding="utf-8")
+    table = NeighborTable(source)
+    assert table.lookup("192.168.0.10") == "AA:BB:CC:DD:EE:01"
+    source.unlink()
+    assert table.lookup("192.168.0.12") == "AA:BB:CC:DD:EE:02"
+
+
+def test_discovery_sweeps_subnet_and_harvests_macs(tmp_path, monkeypatch):
+    import asyncio
+
+    from app.services import discovery
+
+    source = tmp_path / "arp"
+    source.write_text(PROC_ARP, encoding="utf-8")
+    table = NeighborTable(source)
+    probed = []
+
+    async def _probe(ip, method, ports, timeout):
+        probed.append(ip)
+        await asyncio.sleep(0.05)
+        return (1.0, "icmp") if ip == "192.168.0.10" else (None, None)
+
+    monkeypatch.setattr(discovery, "probe_host", _probe)
+    monkeypatch.setattr(discovery, "get_neighbor_table", lambda: table)
+    monkeypatch.setattr(discovery, "list_targets", lambda: [{"name": "nas", "ip": "192.168.0.12"}])
+    monkeypatch.setattr(discovery, "log_event", lambda evt: None)
+
+    result = asyncio.run(discovery.discover_hosts("192.168.0.0/24"))
+    assert len(probed) == 254
+    assert result["duration_ms"] < 2000
+    assert [(c["ip"], c["online"], c["mac"], c["name"], c["known"]) for c in result["candidates"]] == [
+        ("192.168.0.10", True, "AA:BB:CC:DD:EE:01", "host-192-168-0-10", False),
+        ("192.168.0.12", False, "AA:BB:CC:DD:EE:02", "nas", True),
+    ]
@@ -0,0 +1,73 @@
+import asyncio
+import socket
+import struct
+
+from app.services import pinger, probes
+
+
+def test_echo_packet_checksum_validates():
+    packet = pinger._build_echo(0x1234, 7)
+    assert packet[0] == pinger.ICMP_ECHO_REQUEST
+    assert struct.unpack("!HH", packet[4:8]) == (0x1234, 7)
+    assert pinger._checksum(packet) == 0
+
+
+def test_subprocess_rtt_parsing():
+    output = b"64 bytes from 10.0.0.1: icmp_seq=1 ttl=64 time=0.512 ms"
+    assert pinger._parse_subprocess_rtt(output, 0.0) == 0.512
+
+
+def test_ping_empty_address_is_offline():
+    assert asyncio.run(pinger.ping_host("")) is None
+
+
+def test_pinger_of_finished_loop_is_closed():
+    async def _open():
+        instance = pinger.get_pinger()
+        instance._open_socket(asyncio.get_running_loop())
+        return instance
+
+    first = asyncio.run(_open())
+    asyncio.run(_open())
+    assert first._sock is None and first.mode is None
+
+
+def test_concurrent_status_checks_share_one_probe(monkeypatch):
+    from app.services import status
+
+    pings = []
+
+    async def _ping(ip, timeout):
+        pings.append(ip)
+        await asyncio.sleep(0.05)
+        return 1.0
+
+    monkeypatch.setattr(probes, "ping_host", _ping)
+    monkeypatch.setattr(
+        status, "record_status", lambda name, online, ip, rtt_ms, method: {"online": online, "rtt_ms": rtt_ms}
+    )
+
+    async def _burst():
+        target = {"name": "alpha", "ip": "10.0.0.1"}
+        return await asyncio.gather(*(status.check_target(target) for _ in range(5)))
+
+    results = asyncio.run(_burst())
+    assert pings == ["10.0.0.1"]
+    assert all(result["online"] for result in results)
+
+
+def test_tcp_probe_counts_refused_as_up():
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen()
+    closed = socket.socket()
+    closed.bind(("127.0.0.1", 0))
+    open_port, closed_port = listener.getsockname()[1], closed.getsockname()[1]
+    try:
+        rtt_ms, method = asyncio.run(probes.probe_host("127.0.0.1", "tcp", [open_port], 0.5))
+        assert rtt_ms is not None and method == f"tcp/{open_port}"
+        rtt_ms, method = asyncio.run(probes.probe_host("127.0.0.1", "tcp", [closed_port], 0.5))
+        assert rtt_ms is not None and method == f"tcp/{closed_port}"
+    finally:
+        listener.close()
+        closed.close()
@@ -0,0 +1,105 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+from app.services import jobs, power
+
+
+@pytest.fixture
+def commands(monkeypatch):
+    specs = {}
+    monkeypatch.setattr(power, "get_target_or_404", lambda name: {"name": name, **specs})
+    monkeypatch.setattr(power, "log_event", lambda evt: None)
+    monkeypatch.setattr(power, "publish", lambda *args, **kwargs: None)
+    return specs
+
+
+def test_timeout_kills_process_group(commands, tmp_path):
+    marker = tmp_path / "survived"
+    commands["shutdown"] = {"cmd": f"(sleep 1; touch {marker}) & sleep 30", "shell": True, "timeout": 0.3}
+    started = time.monotonic()
+    with pytest.raises(power.HTTPException) as exc:
+        asyncio.run(power.execute_target_command("alpha", "shutdown"))
+    assert exc.value.status_code == 504
+    assert time.monotonic() - started < 5
+    time.sleep(1.2)
+    assert not marker.exists()
+
+
+def test_stream_yields_output_then_exit(commands):
+    commands["reboot"] = {"cmd": ["sh", "-c", "echo one; echo two >&2; exit 3"]}
+
+    async def _collect():
+        spec = power.prepare_target_command("alpha", "reboot")
+        return [json.loads(line) async for line in power.stream_target_command("alpha", "reboot", spec)]
+
+    events = asyncio.run(_collect())
+    assert events[0]["type"] == "start"
+    assert {"type": "stdout", "data": "one\n"} in events
+    assert {"type": "stderr", "data": "two\n"} in events
+    assert events[-1] == {"type": "exit", "ok": False, "returncode": 3}
+
+
+def test_background_job_reports_result(commands, monkeypatch):
+    monkeypatch.setattr(jobs, "publish", lambda *args, **kwargs: None)
+    monkeypatch.setattr(jobs, "_JOBS", jobs.OrderedDict())
+    commands["shutdown"] = ["sh", "-c", "echo bye"]
+
+    async def _submit_and_wait():
+        job = jobs.submit_command_job("alpha", "shutdown")
+        assert job["state"] == "queued"
+        await asyncio.gather(*jobs._TASKS.values())
+        return jobs.get_job(job["id"])
+
+    job = asyncio.run(_submit_and_wait())
+    assert job["state"] == "succeeded"
+    assert job["returncode"] == 0
+    assert job["stdout"] == "bye"
+    assert job["duration_ms"] is not None
+    assert [entry["id"] for entry in jobs.list_jobs(target="alpha")] == [job["id"]]
+
+
+def test_repeated_command_joins_running_one(commands, tmp_path):
+    counter = tmp_path / "runs"
+    commands["reboot"] = {"cmd": f"echo x >> {counter}; sleep 0.2", "shell": True}
+
+    async def _double_click():
+        first = await asyncio.gather(*(power.execute_target_command("alpha", "reboot") for _ in range(3)))
+        late = await power.execute_target_command("alpha", "reboot")
+        return first, late
+
+    first, late = asyncio.run(_double_click())
+    assert counter.read_text().count("x") == 1
+    assert sum(1 for result in first if result.get("coalesced")) == 2
+    assert late["coalesced"] is True
+
+
+def test_command_gate_and_events_use_normalized_name(commands, monkeypatch):
+    published = []
+    monkeypatch.setattr(power, "publish", lambda action, **fields: published.append(fields["target"]))
+    monkeypatch.setattr(power, "expect_transition", lambda name: None)
+    commands["reboot"] = ["true"]
+
+    async def _run_both():
+        spec = power.prepare_target_command("Alpha", "reboot")
+        result = await power.run_target_command("Alpha", "reboot", spec)
+        lines = [json.loads(line) async for line in power.stream_target_command(" ALPHA", "reboot", spec)]
+        return result, lines, list(power._get_gate().locks)
+
+    result, lines, locks = asyncio.run(_run_both())
+    assert result["target"] == "alpha"
+    assert lines[0]["target"] == "alpha"
+    assert published == ["alpha", "alpha"]
+    assert locks == ["alpha"]
+
+
+def test_runtime_write_after_command_runs_off_the_loop(commands, monkeypatch):
+    import threading
+
+    threads = []
+    monkeypatch.setattr(power, "expect_transition", lambda name: threads.append(threading.get_ident()))
+    commands["shutdown"] = ["true"]
+    asyncio.run(power.run_target_command("alpha", "shutdown", power.prepare_target_command("alpha", "shutdown")))
+    assert threads and threads[0] != threading.get_ident()
@@ -0,0 +1,71 @@
+from app.services.scheduler import ProbeScheduler
+
+
+def _scheduler():
+    return ProbeScheduler(base=10, maximum=80, fast=2, jitter=0.0, rng=lambda: 0.0)
+
+
+def test_stable_target_backs_off_and_resets_on_change():
+    scheduler = _scheduler()
+    scheduler.sync(["alpha"], now=0)
+    assert scheduler.due(0) == ["alpha"]
+    intervals = [scheduler.observe("alpha", True, now=0) for _ in range(5)]
+    assert intervals == [10, 20, 40, 80, 80]
+    assert scheduler.observe("alpha", False, now=0) == 10
+
+
+def test_fast_window_pulls_probe_forward():
+    scheduler = _scheduler()
+    scheduler.sync(["alpha", "beta"], now=0)
+    for name in ("alpha", "beta"):
+        for _ in range(4):
+            scheduler.observe(name, True, now=0)
+    assert scheduler.due(5) == []
+    assert scheduler.due(5, fast={"beta"}) == ["beta"]
+    assert scheduler.observe("beta", True, now=5, fast=True) == 2
+    scheduler.sync(["beta"], now=5)
+    assert scheduler.next_due() == 7
+
+
+def test_jitter_spreads_intervals():
+    values = iter([0.0, 1.0])
+    scheduler = ProbeScheduler(base=10, maximum=80, fast=2, jitter=0.1, rng=lambda: next(values))
+    scheduler.sync(["alpha"], now=0)
+    scheduler.observe("alpha", True, now=0)
+    assert scheduler.next_due() == 11.0
+
+
+def test_monitor_shares_interval_only_when_it_changes(monkeypatch):
+    import asyncio
+
+    from app.services import monitor
+
+    recorded = []
+
+    async def _check(target, silent=True):
+        return {"online": True}
+
+    probe_target = {"name": "alpha", "ip": "10.0.0.1", "probe": None, "probe_ports": None, "fast_until": 0.0}
+    monkeypatch.setattr(monitor, "check_target", _check)
+    monkeypatch.setattr(monitor, "list_probe_targets", lambda: [probe_target])
+    monkeypatch.setattr(monitor, "record_probe_interval", lambda name, interval: recorded.append((name, interval)))
+
+    async def _sweeps():
+        status_monitor = monitor.StatusMonitor(10)
+        status_monitor.scheduler = ProbeScheduler(base=10, maximum=20, fast=2, jitter=0.0, rng=lambda: 0.0)
+        for _ in range(4):
+            await status_monitor.sweep()
+            status_monitor.scheduler._due["alpha"] = 0.0
+
+    asyncio.run(_sweeps())
+    assert recorded == [("alpha", 10), ("alpha", 20)]
+
+
+def test_status_freshness_follows_probe_interval(monkeypatch):
+    from app.services import status
+
+    timing = {"alpha": (100.0, 240.0), "beta": (100.0, None)}
+    monkeypatch.setattr(status, "status_timing", timing.__getitem__)
+    assert status._is_fresh("alpha", None)
+    assert not status._is_fresh("beta", None)
+    assert not status._is_fresh("alpha", 30.0)
@@ -0,0 +1,97 @@
+import json
+import threading
+from datetime import datetime, timedelta, timezone
+
+from app.core.locks import FileLock
+from app.storage import (
+    LogQuery,
+    LogRecord,
+    SqliteDatabase,
+    SqliteEventStore,
+    SqliteRuntimeStore,
+    SqliteTargetStore,
+)
+from app.storage.migrate import migrate_files_to_sqlite
+
+
+def _record(ts, target, evt="wake"):
+    return LogRecord(ts, json.dumps({"evt": evt, "target": target}), evt, target)
+
+
+def test_sqlite_targets_incremental_write(tmp_path):
+    store = SqliteTargetStore(SqliteDatabase(tmp_path / "wol.db"))
+    assert not store.exists()
+    store.write([{"name": "alpha", "ip": "10.0.0.1"}])
+    signature = store.signature()
+    store.write([], upserted=[{"name": "beta", "ip": "10.0.0.2"}], deleted=["alpha"])
+    assert store.signature() != signature
+    assert store.read() == {"targets": [{"name": "beta", "ip": "10.0.0.2"}]}
+
+
+def test_sqlite_target_signature_is_shared_across_threads(tmp_path):
+    store = SqliteTargetStore(SqliteDatabase(tmp_path / "wol.db"))
+    store.write([{"name": "alpha", "ip": "10.0.0.1"}])
+    seen = []
+    worker = threading.Thread(target=lambda: seen.append(store.signature()))
+    worker.start()
+    worker.join()
+    assert seen == [store.signature()]
+
+
+def test_sqlite_events_page_and_prune(tmp_path):
+    store = SqliteEventStore(SqliteDatabase(tmp_path / "wol.db"))
+    now = datetime.now(timezone.utc)
+    store.append([_record(now - timedelta(days=10), "old")])
+    store.append([_record(now + timedelta(seconds=i), f"t{i}") for i in range(5)])
+    page, cursor = store.query(LogQuery(limit=3))
+    assert [entry["target"] for entry in page] == ["t4", "t3", "t2"]
+    page, cursor = store.query(LogQuery(limit=3, cursor=cursor))
+    assert [entry["target"] for entry in page] == ["t1", "t0", "old"]
+    assert cursor is None
+    store.prune(now - timedelta(days=7))
+    assert [entry["target"] for entry in store.query(LogQuery(limit=10, target="old"))[0]] == []
+
+
+def test_migrate_files_to_sqlite(tmp_path):
+    targets_path = tmp_path / "targets.json"
+    targets_path.write_text(json.dumps({"targets": [{"name": "alpha", "ip": "10.0.0.1"}]}), encoding="utf-8")
+    log_path = tmp_path / "wol-web.jsonl"
+    log_path.write_text(json.dumps({"evt": "wake", "target": "alpha", "ts": "2024-01-01T10:00:00+00:00"}) + "\n")
+    counts = migrate_files_to_sqlite(targets_path, log_path, tmp_path / "wol.db")
+    assert counts == {"targets": 1, "events": 1}
+    assert log_path.exists()
+    assert migrate_files_to_sqlite(targets_path, log_path, tmp_path / "wol.db") == {"targets": 1, "events": 0}
+    db = SqliteDatabase(tmp_path / "wol.db")
+    assert SqliteTargetStore(db).read()["targets"][0]["ip"] == "10.0.0.1"
+    assert SqliteEventStore(db).query(LogQuery(limit=10, target="alpha"))[0][0]["evt"] == "wake"
+
+
+def test_runtime_shared_between_workers(tmp_path):
+    # Two databases on one file stand in for two worker processes.
+    first = SqliteRuntimeStore(SqliteDatabase(tmp_path / "wol.db"))
+    second = SqliteRuntimeStore(SqliteDatabase(tmp_path / "wol.db"))
+    first.update("alpha", {"online": True, "rtt_ms": 1.5})
+    previous, current = second.update("alpha", {"online": False})
+    assert previous == {"online": True, "rtt_ms": 1.5}
+    assert first.get("alpha") == current == {"online": False, "rtt_ms": 1.5}
+    first.rename("alpha", "beta")
+    assert second.snapshot() == {"beta": {"online": False, "rtt_ms": 1.5}}
+
+
+def test_file_lock_excludes_other_holders(tmp_path):
+    leader, follower = FileLock(tmp_path / "monitor.lock"), FileLock(tmp_path / "monitor.lock")
+    assert leader.acquire(blocking=False)
+    assert not follower.acquire(blocking=False)
+    leader.release()
+    assert follower.acquire(blocking=False)
+    follower.release()
+
+
+def test_relay_passes_events_between_workers(tmp_path):
+    first = SqliteRuntimeStore(SqliteDatabase(tmp_path / "wol.db"))
+    second = SqliteRuntimeStore(SqliteDatabase(tmp_path / "wol.db"))
+    _, cursor = second.relay("second", [], None)
+    first.relay("first", [{"type": "target-create", "target": "alpha"}], None)
+    events, cursor = second.relay("second", [{"type": "wake", "target": "beta"}], cursor)
+    assert events == [{"type": "target-create", "target": "alpha"}]
+    assert second.relay("second", [], cursor)[0] == []
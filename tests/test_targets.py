@@ -0,0 +1,199 @@
+import json
+
+import pytest
+
+from app.services import targets
+from app.storage import FileTargetStore, MemoryRuntimeStore
+
+
+@pytest.fixture
+def targets_file(tmp_path, monkeypatch):
+    path = tmp_path / "targets.json"
+    path.write_text(json.dumps({"targets": [{"name": "alpha", "ip": "10.0.0.1"}]}), encoding="utf-8")
+    store = FileTargetStore(path)
+    monkeypatch.setattr(targets, "get_target_store", lambda: store)
+    runtime = MemoryRuntimeStore()
+    monkeypatch.setattr(targets, "get_runtime_store", lambda: runtime)
+    monkeypatch.setattr(targets, "_REGISTRY", targets._TargetRegistry())
+    monkeypatch.setattr(targets, "log_event", lambda evt: None)
+    return path
+
+
+@pytest.fixture
+def saves(targets_file, monkeypatch):
+    # Counts store writes after the initial load has normalized the file.
+    targets.list_targets()
+    calls = []
+    original = targets._save_state_locked
+
+    def _counting_save(*args, **kwargs):
+        calls.append(1)
+        original(*args, **kwargs)
+
+    monkeypatch.setattr(targets, "_save_state_locked", _counting_save)
+    return calls
+
+
+def test_lookup_served_from_memory(targets_file, monkeypatch):
+    assert targets.get_target("alpha")["ip"] == "10.0.0.1"
+
+    def _fail(*args, **kwargs):
+        raise AssertionError("targets.json re-read while unchanged")
+
+    monkeypatch.setattr(type(targets_file), "read_text", _fail)
+    assert targets.get_target("alpha")["ip"] == "10.0.0.1"
+    assert [t["name"] for t in targets.list_targets()] == ["alpha"]
+
+
+def test_hand_edit_is_picked_up(targets_file):
+    assert targets.get_target("beta") is None
+    data = json.loads(targets_file.read_text(encoding="utf-8"))
+    data["targets"].append({"name": "beta", "ip": "10.0.0.2"})
+    targets_file.write_text(json.dumps(data), encoding="utf-8")
+    assert targets.get_target("beta")["ip"] == "10.0.0.2"
+
+
+def test_write_during_reload_is_not_masked(targets_file, monkeypatch):
+    targets.list_targets()
+    store = targets.get_target_store()
+    original_read = store.read
+
+    def _read_then_edit():
+        raw = original_read()
+        edited = json.loads(targets_file.read_text(encoding="utf-8"))
+        edited["targets"].append({"name": "late", "ip": "10.0.0.9", "created_at": "x", "updated_at": "x"})
+        targets_file.write_text(json.dumps(edited), encoding="utf-8")
+        return raw
+
+    data = json.loads(targets_file.read_text(encoding="utf-8"))
+    data["targets"].append({"name": "beta", "ip": "10.0.0.2", "created_at": "x", "updated_at": "x"})
+    targets_file.write_text(json.dumps(data), encoding="utf-8")
+    monkeypatch.setattr(store, "read", _read_then_edit)
+    assert targets.get_target("late") is None
+    monkeypatch.setattr(store, "read", original_read)
+    assert targets.get_target("late")["ip"] == "10.0.0.9"
+
+
+def test_read_path_normalizes_under_store_lock(targets_file, monkeypatch):
+    held = []
+    original = targets._save_state_locked
+
+    def _checked_save(*args, **kwargs):
+        held.append(targets._STORE_LOCKED)
+        original(*args, **kwargs)
+
+    monkeypatch.setattr(targets, "_save_state_locked", _checked_save)
+    assert [t["name"] for t in targets.list_targets()] == ["alpha"]
+    assert held == [True]
+    assert targets._STORE_LOCKED is False
+    assert "created_at" in json.loads(targets_file.read_text(encoding="utf-8"))["targets"][0]
+
+
+def test_create_updates_registry(targets_file):
+    targets.create_target({"name": "gamma", "ip": "10.0.0.3", "mac": "aa-bb-cc-dd-ee-ff"})
+    assert targets.get_target("gamma")["mac"] == "AA:BB:CC:DD:EE:FF"
+    with pytest.raises(targets.HTTPException):
+        targets.create_target({"name": "gamma", "ip": "10.0.0.4"})
+
+
+def test_status_learns_mac_once(targets_file, monkeypatch):
+    calls = []
+
+    def _discover(ip):
+        calls.append(ip)
+        return "AA:BB:CC:DD:EE:01"
+
+    monkeypatch.setattr(targets, "discover_mac_for_ip", _discover)
+    monkeypatch.setattr(targets, "_MAC_VERIFIED", {})
+    targets.record_status("alpha", True, "10.0.0.1")
+    assert targets.get_target("alpha")["mac"] == "AA:BB:CC:DD:EE:01"
+    signature = targets._store_signature()
+    targets.record_status("alpha", True, "10.0.0.1")
+    assert calls == ["10.0.0.1"]
+    assert targets._store_signature() == signature
+
+
+def test_tags_build_groups(targets_file):
+    targets.create_target({"name": "rack1", "ip": "10.0.1.1", "tags": ["Rack-A", "lab"]})
+    targets.update_target("alpha", {"tags": "lab"})
+    assert targets.get_target("rack1")["tags"] == ["lab", "rack-a"]
+    assert targets.list_groups() == {"lab": ["alpha", "rack1"], "rack-a": ["rack1"]}
+    with pytest.raises(targets.HTTPException):
+        targets.get_group_members("missing")
+
+
+def test_targets_etag_revalidates(targets_file):
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    client = TestClient(app)
+    first = client.get("/api/targets")
+    etag = first.headers["etag"]
+    assert client.get("/api/targets", headers={"If-None-Match": etag}).status_code == 304
+    targets.record_status("alpha", False)
+    changed = client.get("/api/targets", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    etag = changed.headers["etag"]
+    targets.record_status("alpha", False, rtt_ms=None, method="icmp")
+    assert client.get("/api/targets", headers={"If-None-Match": etag}).status_code == 304
+    for index in range(40):
+        targets.create_target({"name": f"host-{index:02d}", "ip": f"10.0.2.{index + 1}"})
+    large = client.get("/api/targets", headers={"Accept-Encoding": "gzip"})
+    assert large.headers["content-encoding"] == "gzip"
+    assert large.headers["etag"].startswith("W/")
+    assert len(large.json()["targets"]) == 41
+    revalidated = client.get("/api/targets", headers={"Accept-Encoding": "gzip", "If-None-Match": large.headers["etag"]})
+    assert revalidated.status_code == 304
+    refused = client.get("/api/targets", headers={"Accept-Encoding": "gzip;q=0, identity"})
+    assert "content-encoding" not in refused.headers
+
+
+def test_import_writes_once_and_reports_skips(saves):
+    result = targets.import_targets([
+        {"ip": "10.0.0.2", "mac": "aa:bb:cc:dd:ee:02"},
+        {"ip": "10.0.0.3", "name": "gamma"},
+        {"ip": "10.0.0.1"},
+        {"ip": "not-an-ip"},
+    ])
+    assert [target["name"] for target in result["created"]] == ["host-10-0-0-2", "gamma"]
+    assert [entry["error"] for entry in result["skipped"]] == ["invalid ip address", "duplicate ip"]
+    assert len(saves) == 1
+    assert targets.get_target("host-10-0-0-2")["mac"] == "AA:BB:CC:DD:EE:02"
+
+
+def test_bulk_applies_batch_with_one_save(saves):
+    upserts = [{"name": f"node-{index:03d}", "ip": f"10.1.{index // 250}.{index % 250 + 1}"} for index in range(300)]
+    upserts.append({"name": "alpha", "tags": ["lab"]})
+    result = targets.bulk_apply(upserts, ["ghost"])
+    assert result["counts"] == {"created": 300, "updated": 1, "missing": 1}
+    assert len(saves) == 1
+    assert targets.get_target("alpha")["tags"] == ["lab"]
+
+    with pytest.raises(targets.HTTPException) as exc:
+        targets.bulk_apply([{"name": "beta", "ip": "10.9.9.9"}, {"name": "bad name", "ip": "10.0.0.9"}], ["alpha"])
+    assert [row.get("status") for row in exc.value.detail["results"]] == ["rejected", "error", "rejected"]
+    assert targets.get_target("beta") is None
+    assert targets.get_target("alpha") is not None
+    assert len(saves) == 1
+
+
+def test_export_streams_jsonl_and_csv(targets_file):
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    targets.update_target("alpha", {"tags": ["lab", "rack-a"]})
+    client = TestClient(app)
+    state = json.loads(targets_file.read_text(encoding="utf-8"))
+    state["targets"][0]["shutdown"] = {"command": ["poweroff"]}
+    targets_file.write_text(json.dumps(state), encoding="utf-8")
+    lines = client.get("/api/targets/export").text.splitlines()
+    exported = json.loads(lines[0])
+    assert exported["tags"] == ["lab", "rack-a"]
+    assert "shutdown" not in exported
+    assert targets.bulk_apply([exported], [])["counts"] == {"unchanged": 1}
+    rows = client.get("/api/targets/export?format=csv").text.splitlines()
+    assert rows[0].startswith("name,ip,mac,tags")
+    assert rows[1].startswith('alpha,10.0.0.1,,"lab,rack-a"')
@@ -0,0 +1,53 @@
+import asyncio
+
+import pytest
+
+from app.services import wake_verify
+
+
+@pytest.fixture
+def recorded(monkeypatch):
+    events = []
+    monkeypatch.setattr(wake_verify, "INITIAL_DELAY", 0.01)
+    monkeypatch.setattr(wake_verify, "record_status", lambda *args: None)
+    monkeypatch.setattr(wake_verify, "record_wake_verification", lambda name, **fields: events.append(fields))
+    monkeypatch.setattr(wake_verify, "log_event", lambda evt: events.append(evt))
+    return events
+
+
+def test_verification_records_time_to_online(recorded, monkeypatch):
+    replies = iter([None, None, 0.4])
+
+    async def _probe(target):
+        rtt_ms = next(replies)
+        return rtt_ms, "icmp" if rtt_ms is not None else None
+
+    monkeypatch.setattr(wake_verify, "probe_target", _probe)
+
+    async def _run():
+        assert wake_verify.start_wake_verification("alpha", "10.0.0.1", "2025-01-01T00:00:00+00:00")
+        assert not wake_verify.start_wake_verification("alpha", "10.0.0.1", "2025-01-01T00:00:00+00:00")
+        await wake_verify._VERIFIERS["alpha"]
+
+    asyncio.run(_run())
+    online = [evt for evt in recorded if evt.get("evt") == "wake-online"]
+    assert len(online) == 1
+    assert online[0]["time_to_online_ms"] >= 20
+    assert recorded[-2]["wake_verify"] == "online"
+    assert not wake_verify.is_verifying("alpha")
+
+
+def test_wake_runs_off_the_event_loop(recorded, monkeypatch):
+    import threading
+
+    threads = []
+
+    def _wake(name):
+        threads.append(threading.get_ident())
+        return {"ok": True, "sent": "python", "target": name, "woke_at": "2025-01-01T00:00:00+00:00"}
+
+    monkeypatch.setattr(wake_verify, "get_target_or_404", lambda name: {"name": name, "ip": ""})
+    monkeypatch.setattr(wake_verify, "wake_target", _wake)
+    result = asyncio.run(wake_verify.wake_with_verification("alpha", verify=False))
+    assert result["ok"]
+    assert threads and threads[0] != threading.get_ident()
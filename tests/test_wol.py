@@ -0,0 +1,32 @@
+import socket
+
+from app.services import wol
+
+
+def test_udp_sender_reuses_socket_and_repeats():
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.bind(("127.0.0.1", 0))
+    receiver.settimeout(1.0)
+    port = receiver.getsockname()[1]
+    sender = wol.MagicPacketSender()
+    try:
+        macs = ["AA:BB:CC:DD:EE:01", "AA:BB:CC:DD:EE:02"]
+        assert sender.send_udp(macs, "127.0.0.1", ports=[port], repeats=2) == 4
+        sock = sender._udp["127.0.0.1"]
+        sender.send_udp(macs[:1], "127.0.0.1", ports=[port])
+        assert sender._udp["127.0.0.1"] is sock
+        packets = [receiver.recv(256) for _ in range(5)]
+    finally:
+        sender.close()
+        receiver.close()
+    assert packets[0] == b"\xff" * 6 + bytes.fromhex("AABBCCDDEE01") * 16
+    assert packets.count(wol.build_payload(macs[1])) == 2
+
+
+def test_spacing_sleeps_outside_the_sender_lock(monkeypatch):
+    sender = wol.MagicPacketSender()
+    held = []
+    monkeypatch.setattr(sender, "_udp_round", lambda payloads, broadcast, destinations: len(payloads))
+    monkeypatch.setattr(wol.time, "sleep", lambda _s: held.append(sender._lock.locked()))
+    assert sender.send_udp(["AA:BB:CC:DD:EE:01"], "127.0.0.1", repeats=3, spacing=0.5) == 3
+    assert held == [False, False]
@@ -0,0 +1,85 @@
+'use client';
+
+import { useEffect, useState } from 'react';
+import type { Dispatch, SetStateAction } from 'react';
+
+import { apiUrl } from '../_lib/api';
+import type { Target, TargetEvent } from '../_lib/types';
+
+const EVENT_TYPES: TargetEvent['type'][] = [
+  'snapshot',
+  'status',
+  'wake',
+  'wake-verify',
+  'shutdown',
+  'reboot',
+  'target-create',
+  'target-update',
+  'target-delete'
+];
+
+function sortTargets(list: Target[]): Target[] {
+  return [...list].sort((a, b) => a.name.localeCompare(b.name));
+}
+
+function applyEvent(prev: Target[], event: TargetEvent): Target[] {
+  switch (event.type) {
+    case 'snapshot':
+      return Array.isArray(event.targets) ? event.targets : [];
+    case 'status':
+      return prev.map((target) =>
+        target.name === event.target
+          ? { ...target, online: event.online, rtt_ms: event.rtt_ms, last_status_at: event.last_status_at }
+          : target
+      );
+    case 'wake':
+      return prev.map((target) =>
+        target.name === event.target ? { ...target, last_wake_at: event.last_wake_at } : target
+      );
+    case 'wake-verify': {
+      const { type: _type, target: name, ...fields } = event;
+      return prev.map((target) => (target.name === name ? { ...target, ...fields } : target));
+    }
+    case 'target-create':
+      return sortTargets([...prev.filter((target) => target.name !== event.data.name), event.data]);
+    case 'target-update':
+      return sortTargets([
+        ...prev.filter((target) => target.name !== event.target && target.name !== event.data.name),
+        event.data
+      ]);
+    case 'target-delete':
+      return prev.filter((target) => target.name !== event.target);
+    default:
+      return prev;
+  }
+}
+
+export function useTargetEvents(setTargets: Dispatch<SetStateAction<Target[]>>) {
+  const [connected, setConnected] = useState(false);
+
+  useEffect(() => {
+    if (typeof window === 'undefined' || typeof EventSource === 'undefined') {
+      return;
+    }
+    const source = new EventSource(apiUrl('api/events'));
+    const handle = (message: MessageEvent<string>) => {
+      try {
+        const event = JSON.parse(message.data) as TargetEvent;
+        setTargets((prev) => applyEvent(prev, event));
+      } catch (error) {
+        console.warn('event parse error', error);
+      }
+    };
+    EVENT_TYPES.forEach((type) => source.addEventListener(type, handle as EventListener));
+    source.onopen = () => setConnected(true);
+    // EventSource reconnects on its own and the server re-sends a snapshot.
+    source.onerror = () => setConnected(false);
+    return () => {
+      EVENT_TYPES.forEach((type) => source.removeEventListener(type, handle as EventListener));
+      source.close();
+      setConnected(false);
+    };
+  }, [setTargets]);
+
+  return { connected };
+}
@@ -2,9 +2,13 @@ import type { RequestError } from './types';
 
 const API_BASE = process.env.NEXT_PUBLIC_API_BASE ?? '';
 
-export async function request<T = unknown>(path: string, init: RequestInit & { body?: unknown } = {}): Promise<T> {
+export function apiUrl(path: string): string {
   const normalizedPath = path.startsWith('/') ? path : `/${path}`;
-  const url = `${API_BASE}${normalizedPath}`;
+  return `${API_BASE}${normalizedPath}`;
+}
+
+export async function request<T = unknown>(path: string, init: RequestInit & { body?: unknown } = {}): Promise<T> {
+  const url = apiUrl(path);
   const headers = new Headers(init.headers);
   let body = init.body;
 
@@ -5,8 +5,17 @@ export type Target = {
   ip?: string;
   mac?: string;
   has_mac?: boolean;
+  tags?: string[];
+  probe?: 'icmp' | 'tcp' | 'both' | null;
+  probe_ports?: number[];
+  probe_method?: string | null;
   online?: boolean | null;
+  rtt_ms?: number | null;
   last_wake_at?: string | null;
+  woke_at?: string | null;
+  online_at?: string | null;
+  time_to_online_ms?: number | null;
+  wake_verify?: 'pending' | 'online' | 'timeout' | null;
   last_status_at?: string | null;
   updated_at?: string | null;
   created_at?: string | null;
@@ -16,6 +25,34 @@ export type TargetsResponse = {
   targets?: Target[];
 };
 
+export type TargetStatus = {
+  target: string;
+  online: boolean | null;
+  rtt_ms?: number | null;
+  method?: string | null;
+  checked_at?: string | null;
+};
+
+export type StatusAllResponse = {
+  statuses?: TargetStatus[];
+};
+
+export type TargetEvent =
+  | { type: 'snapshot'; targets: Target[] }
+  | { type: 'status'; target: string; online: boolean; rtt_ms?: number | null; last_status_at?: string | null }
+  | { type: 'wake'; target: string; last_wake_at?: string | null }
+  | {
+      type: 'wake-verify';
+      target: string;
+      woke_at?: string | null;
+      online_at?: string | null;
+      time_to_online_ms?: number | null;
+      wake_verify?: Target['wake_verify'];
+    }
+  | { type: 'shutdown' | 'reboot'; target: string; ok: boolean; returncode?: number }
+  | { type: 'target-create' | 'target-update'; target: string; data: Target }
+  | { type: 'target-delete'; target: string };
+
 export type LogStatus = 'pending' | 'success' | 'error';
 
 export type LogEntry = {
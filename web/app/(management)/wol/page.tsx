@@ -13,6 +13,7 @@ import { PortalBanner, WolHeader } from './_components/WolHeader';
 import { TargetModal } from './_components/TargetModal';
 import { TargetsCard } from './_components/TargetsCard';
 import { ToastContainer } from './_components/ToastContainer';
+import { useTargetEvents } from './_hooks/useTargetEvents';
 import { useToastQueue } from './_hooks/useToastQueue';
 import { ACTION_ENDPOINTS, PORTAL_URL } from './_lib/constants';
 import { request } from './_lib/api';
@@ -20,6 +21,7 @@ import type {
   LogEntry,
   PowerAction,
   RequestError,
+  StatusAllResponse,
   Target,
   TargetFormState,
   TargetsResponse
@@ -69,6 +71,8 @@ export default function WolPage() {
     targetsRef.current = targets;
   }, [targets]);
 
+  const { connected: eventsConnected } = useTargetEvents(setTargets);
+
   const loadTargets = useCallback(async ({ silent = false }: RequestOptions = {}) => {
     if (loadingTargetsRef.current) return;
     loadingTargetsRef.current = true;
@@ -93,13 +97,12 @@ export default function WolPage() {
     }
     statusRefreshingRef.current = true;
     const silentParam = log ? 'false' : 'true';
+    const maxAgeParam = log ? '&max_age=0' : '';
     try {
-      for (const target of targetsRef.current) {
-        try {
-          await request(`api/status?target=${encodeURIComponent(target.name)}&silent=${silentParam}`);
-        } catch (error) {
-          console.warn('status error', target.name, error);
-        }
+      try {
+        await request<StatusAllResponse>(`api/status/all?silent=${silentParam}${maxAgeParam}`);
+      } catch (error) {
+        console.warn('status error', error);
       }
       await loadTargets({ silent: true });
       if (log) {
@@ -115,14 +118,15 @@ export default function WolPage() {
   }, [loadTargets]);
 
   useEffect(() => {
-    if (!targets.length) {
+    if (eventsConnected || !targets.length) {
       return;
     }
+    // Fallback while the event stream is unavailable: read the backend's cached statuses.
     const interval = window.setInterval(() => {
-      refreshStatuses({ log: false });
+      loadTargets({ silent: true });
     }, 15_000);
     return () => window.clearInterval(interval);
-  }, [targets.length, refreshStatuses]);
+  }, [eventsConnected, targets.length, loadTargets]);
 
   const filteredTargets = useMemo(() => {
     const term = filter.trim().toLowerCase();